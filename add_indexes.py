@@ -0,0 +1,37 @@
+import sys
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from sqlalchemy import inspect
+from app.database.connection import engine
+from app.models.attendance import Base
+
+def add_indexes():
+    """
+    Command-line script to create indexes declared on the models but missing from an
+    existing database. create_all() only adds indexes when it creates the table itself.
+    """
+    print("--- Add Missing Indexes ---")
+
+    inspector = inspect(engine)
+    created = 0
+    try:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda i: i.name):
+                if index.name in existing:
+                    continue
+                print(f"Creating {index.name} on {table.name}...")
+                index.create(bind=engine)
+                created += 1
+    except Exception as e:
+        print(f"\n❌ An unexpected error occurred: {e}")
+        return
+
+    print(f"\n✅ Success! {created} index(es) created." if created else "\n✅ All indexes already exist.")
+
+if __name__ == "__main__":
+    add_indexes()
@@ -8,7 +8,7 @@ sys.path.append('.')
 from sqlalchemy.orm import Session
 from app.database.connection import SessionLocal, engine
 from app.models.attendance import Teacher, User  # Import both for the check
-from app.services.auth_service import get_password_hash
+from app.services.auth_service import get_password_hash, normalize_email
 
 def add_teacher():
     """
@@ -22,7 +22,7 @@ def add_teacher():
     try:
         # --- 1. Get User Input ---
         name = input("Enter teacher's full name: ").strip()
-        email = input("Enter teacher's email address: ").strip().lower()
+        email = normalize_email(input("Enter teacher's email address: "))
         
         if not name or not email:
             print("\n❌ Error: Name and email cannot be empty.")
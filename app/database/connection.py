@@ -1,15 +1,181 @@
-from sqlalchemy import create_engine
+import time
+
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 from .. import config
+from ..utils import metrics
+from . import query_stats
 
-# --- ENGINE CREATION CHANGE ---
-# Create the SQLAlchemy engine for MySQL
-# The 'connect_args' argument for SQLite has been removed.
-engine = create_engine(
-    config.DATABASE_URL
+# --- Pool metrics ---
+POOL_WAIT_SECONDS = metrics.Histogram(
+    "smart_presence_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool.",
+    ("engine",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+POOL_CHECKED_OUT = metrics.Gauge(
+    "smart_presence_db_pool_checked_out",
+    "Connections currently checked out of the pool.",
+    ("engine",),
 )
 
+
+class _TimedPoolMixin:
+    """Records how long each pool checkout waited for a connection."""
+
+    metrics_name = "primary"
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - start, engine=self.metrics_name)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# Async drivers used for each backend by the async engine
+ASYNC_DRIVERS = {
+    "mysql": "aiomysql",
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+# A plain in-memory SQLite URL is rewritten to a named shared-cache database so the
+# sync and async engines of one process see the same tables.
+SHARED_MEMORY_SQLITE_URL = "sqlite:///file:smart_presence_memdb?mode=memory&cache=shared&uri=true"
+
+
+def _is_sqlite_memory(url) -> bool:
+    return url.database in (None, "", ":memory:") or "mode=memory" in str(url)
+
+
+def _normalize_url(database_url: str) -> str:
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return SHARED_MEMORY_SQLITE_URL
+    return database_url
+
+
+def to_async_url(database_url: str) -> str:
+    """Derives the async driver URL, e.g. mysql+pymysql://... -> mysql+aiomysql://..."""
+    url = make_url(_normalize_url(database_url))
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for '{url.get_backend_name()}'.")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def _engine_options(url, timed_pool) -> dict:
+    """Pool and connect options shared by the sync and async engines."""
+    if url.get_backend_name() == "sqlite":
+        if _is_sqlite_memory(url):
+            # One shared connection so every session sees the same in-memory database
+            return {"poolclass": StaticPool}
+        return {
+            "connect_args": {"timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+            "poolclass": timed_pool,
+            "pool_size": config.DB_POOL_SIZE,
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "pool_timeout": config.DB_POOL_TIMEOUT,
+            "pool_pre_ping": config.DB_POOL_PRE_PING,
+        }
+    return {
+        "poolclass": timed_pool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def _install_listeners(sync_engine, url, name: str):
+    """Per-connection settings (SQLite pragmas, statement timeout) and pool metrics."""
+    if url.get_backend_name() == "sqlite":
+        @event.listens_for(sync_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if not _is_sqlite_memory(url):
+                cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+    elif config.DB_STATEMENT_TIMEOUT_MS > 0:
+        @event.listens_for(sync_engine, "connect")
+        def _set_statement_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if sync_engine.dialect.name == "mysql":
+                # Applies to read-only SELECT statements (MySQL 5.7.8+)
+                cursor.execute(f"SET SESSION max_execution_time = {config.DB_STATEMENT_TIMEOUT_MS}")
+            elif sync_engine.dialect.name == "postgresql":
+                cursor.execute(f"SET statement_timeout = {config.DB_STATEMENT_TIMEOUT_MS}")
+            cursor.close()
+
+    if isinstance(sync_engine.pool, _TimedPoolMixin):
+        sync_engine.pool.metrics_name = name
+
+    query_stats.install(sync_engine)
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKED_OUT.inc(engine=name)
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        POOL_CHECKED_OUT.dec(engine=name)
+
+
+def create_db_engine(database_url: str, name: str = "primary"):
+    """
+    Creates an engine configured from app.config (pool size, overflow, recycle,
+    pre-ping, statement timeout). SQLite URLs get thread-safe settings and pragmas.
+    """
+    database_url = _normalize_url(database_url)
+    url = make_url(database_url)
+    options = _engine_options(url, TimedQueuePool)
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = dict(options.get("connect_args", {}), check_same_thread=False)
+    engine = create_engine(database_url, **options)
+    _install_listeners(engine, url, name)
+    return engine
+
+
+def create_async_db_engine(database_url: str, name: str = "primary_async"):
+    """
+    Async counterpart of create_db_engine(), using the same pool settings and pragmas.
+    Requires the backend's async driver (aiomysql or aiosqlite) to be installed.
+    """
+    url = make_url(database_url)
+    engine = create_async_engine(database_url, **_engine_options(url, TimedAsyncAdaptedQueuePool))
+    _install_listeners(engine.sync_engine, url, name)
+    return engine
+
+
+# Create the SQLAlchemy engine from config (MySQL by default, SQLite for tests/benchmarks)
+engine = create_db_engine(config.DATABASE_URL)
+
+# An in-memory database starts empty on every boot, so the app creates its schema itself
+IN_MEMORY_DATABASE = _is_sqlite_memory(engine.url)
+
 # Create a session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -25,4 +191,99 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- Async engine and session (for async routes) ---
+# Created on first use so that the async driver is only required by processes that need it.
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_db_engine(config.ASYNC_DATABASE_URL or to_async_url(config.DATABASE_URL))
+    return _async_engine
+
+def get_async_sessionmaker():
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        # expire_on_commit=False keeps loaded attributes usable after commit without lazy IO
+        _AsyncSessionLocal = async_sessionmaker(bind=get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _AsyncSessionLocal
+
+async def get_async_db():
+    """
+    FastAPI dependency to get an AsyncSession for a request.
+    Queries are awaited, so the event loop keeps serving other requests meanwhile.
+    """
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+# --- Read replica (read-only routes) ---
+# Without READ_DATABASE_URL the read dependencies return primary sessions. A browser
+# that wrote recently (see mark_recent_write) keeps reading from the primary so it
+# sees its own changes despite replication lag.
+RECENT_WRITE_COOKIE = "recent_write"
+READ_REPLICA_ENABLED = bool(config.READ_DATABASE_URL or config.ASYNC_READ_DATABASE_URL)
+
+read_engine = create_db_engine(config.READ_DATABASE_URL, name="replica") if config.READ_DATABASE_URL else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine) if config.READ_DATABASE_URL else SessionLocal
+
+_async_read_engine = None
+_AsyncReadSessionLocal = None
+
+def get_async_read_sessionmaker():
+    global _async_read_engine, _AsyncReadSessionLocal
+    if not READ_REPLICA_ENABLED:
+        return get_async_sessionmaker()
+    if _AsyncReadSessionLocal is None:
+        _async_read_engine = create_async_db_engine(
+            config.ASYNC_READ_DATABASE_URL or to_async_url(config.READ_DATABASE_URL), name="replica_async"
+        )
+        _AsyncReadSessionLocal = async_sessionmaker(bind=_async_read_engine, autoflush=False, expire_on_commit=False)
+    return _AsyncReadSessionLocal
+
+def mark_recent_write(response):
+    """Sends reads from this browser to the primary for READ_YOUR_WRITES_SECONDS."""
+    if config.READ_YOUR_WRITES_SECONDS > 0:
+        response.set_cookie(
+            RECENT_WRITE_COOKIE, str(int(time.time()) + config.READ_YOUR_WRITES_SECONDS),
+            max_age=config.READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax"
+        )
+
+def writes_data(request: Request):
+    """
+    Route dependency for handlers that write to the primary. After such a request succeeds,
+    read_your_writes_middleware marks the browser (mark_recent_write); read-only POSTs such
+    as frame recognition leave it on the replica.
+    """
+    request.state.writes_data = True
+
+def wrote_recently(request: Request) -> bool:
+    try:
+        return int(request.cookies.get(RECENT_WRITE_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+def read_sessionmaker(request: Request):
+    """The session factory for a read-only request: the replica, or the primary right after a write."""
+    return SessionLocal if wrote_recently(request) else ReadSessionLocal
+
+def get_read_db(request: Request):
+    """
+    FastAPI dependency for read-only routes: a session on the read replica
+    (or on the primary right after this browser wrote something).
+    """
+    db = read_sessionmaker(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    """Async counterpart of get_read_db() for async read-only routes."""
+    factory = get_async_sessionmaker() if wrote_recently(request) else get_async_read_sessionmaker()
+    async with factory() as db:
+        yield db
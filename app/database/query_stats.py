@@ -0,0 +1,158 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from .. import config
+from ..utils import metrics
+
+# --- Per-request SQL instrumentation ---
+# Cursor events on every engine count statements and time spent in the database.
+# The totals are attributed to the current request through a context variable that
+# the HTTP middleware sets (it is inherited by threadpool calls and async sessions),
+# then exposed as X-DB-* response headers in development and as metrics. The metrics
+# are recorded when the body has been sent, so they include queries run while a
+# response streams; the headers are sent first and only count the queries before it.
+# Statements slower than SLOW_QUERY_MS are printed with their EXPLAIN plan.
+
+DB_QUERIES_PER_REQUEST = metrics.Histogram(
+    "smart_presence_db_queries_per_request",
+    "SQL statements executed while serving one request.",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250),
+)
+DB_SECONDS_PER_REQUEST = metrics.Histogram(
+    "smart_presence_db_seconds_per_request",
+    "Time spent executing SQL statements while serving one request.",
+    ("route",),
+)
+SLOW_QUERIES = metrics.Counter(
+    "smart_presence_db_slow_queries_total",
+    "SQL statements slower than SLOW_QUERY_MS.",
+    ("route",),
+)
+
+
+class RequestQueryStats:
+    __slots__ = ("scope", "count", "seconds")
+
+    def __init__(self, scope: dict = None):
+        self.scope = scope if scope is not None else {}
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        """The matched route template (set on the ASGI scope by the router), e.g. /teacher/class/{subject_id}."""
+        return getattr(self.scope.get("route"), "path", "unmatched")
+
+
+_current = contextvars.ContextVar("request_query_stats", default=None)
+
+# Active query_budget() collectors; process-wide so they also see statements run
+# by test clients that serve the app from another thread
+_budgets = []
+_budgets_lock = threading.Lock()
+
+
+def begin_request(scope: dict) -> RequestQueryStats:
+    stats = RequestQueryStats(scope)
+    _current.set(stats)
+    return stats
+
+
+def current() -> RequestQueryStats:
+    return _current.get()
+
+
+def observe_request(stats: RequestQueryStats):
+    DB_QUERIES_PER_REQUEST.observe(stats.count, route=stats.route)
+    DB_SECONDS_PER_REQUEST.observe(stats.seconds, route=stats.route)
+
+
+async def observe_after_body(body_iterator, stats: RequestQueryStats):
+    """
+    Passes a response body through and records the request's totals once it is sent.
+    A streamed body (e.g. exports) runs its queries after the endpoint has returned,
+    and they still count for the request.
+    """
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        observe_request(stats)
+
+
+def _explain(conn, statement: str, parameters) -> str:
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join("    " + " | ".join(str(col) for col in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_stats_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    if _budgets:
+        with _budgets_lock:
+            for budget in _budgets:
+                budget.append((statement, elapsed))
+
+    if config.SLOW_QUERY_MS and elapsed * 1000 >= config.SLOW_QUERY_MS:
+        route = stats.route if stats is not None else "background"
+        SLOW_QUERIES.inc(route=route)
+        plan = ""
+        if not executemany and statement.lstrip().upper().startswith("SELECT"):
+            try:
+                plan = "\n" + _explain(conn, statement, parameters)
+            except Exception as e:
+                plan = f"\n    (EXPLAIN failed: {e})"
+        print(f"!!! SLOW QUERY ({elapsed * 1000:.1f} ms, route {route}): {' '.join(statement.split())}{plan}")
+
+
+def install(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "block"):
+    """
+    Fails with QueryBudgetExceeded if more than `max_queries` statements run inside
+    the block, listing them. Meant for tests and scripts, e.g.:
+
+        with query_budget(4, "GET /teacher/my-classes"):
+            client.get("/teacher/my-classes")
+    """
+    statements = []
+    with _budgets_lock:
+        _budgets.append(statements)
+    try:
+        yield statements
+    finally:
+        with _budgets_lock:
+            _budgets.remove(statements)
+    if len(statements) > max_queries:
+        listing = "\n".join(f"  {i + 1}. ({seconds * 1000:.1f} ms) {' '.join(sql.split())}" for i, (sql, seconds) in enumerate(statements))
+        raise QueryBudgetExceeded(f"{label} ran {len(statements)} queries (budget {max_queries}):\n{listing}")
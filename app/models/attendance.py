@@ -1,8 +1,9 @@
-from sqlalchemy import (Column, Integer, String, DateTime, Time, Date, Text, Float, ForeignKey,
+from sqlalchemy import (Column, Integer, String, DateTime, Time, Date, Text, Float, ForeignKey, Index,
                         Enum as SQLAlchemyEnum)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database.connection import Base
+import datetime
 import enum
 
 # --- Enums ---
@@ -17,11 +18,13 @@ class UserRole(str, enum.Enum):
 class User(Base):
     __tablename__ = "user"
     userID = Column(Integer, primary_key=True, index=True)
-    name = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=False, index=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     role = Column(SQLAlchemyEnum(UserRole), nullable=False)
     __mapper_args__ = {"polymorphic_identity": "user", "polymorphic_on": role}
+    # Keyset pagination of one role ordered by userID (admin user list)
+    __table_args__ = (Index("ix_user_role_userID", "role", "userID"),)
 
 class Student(User):
     __tablename__ = "student"
@@ -62,8 +65,39 @@ class AttendanceRecord(Base):
     subjectID = Column(Integer, ForeignKey("subject.subjectID"), nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     isPresent = Column(String(255), default='True')
+    # Day the attendance counts for; a student is marked at most once per subject and day
+    date = Column(Date, default=datetime.date.today)
     student = relationship("Student", back_populates="attendances")
     subject = relationship("Subject", back_populates="attendance_records")
+    # Date-range reports scan these instead of the whole table (see report_service)
+    __table_args__ = (
+        Index("ix_attendance_subject_date_student", "subjectID", "date", "studentID"),
+        Index("ix_attendance_student_date", "studentID", "date"),
+        Index("uq_attendance_student_subject_date", "studentID", "subjectID", "date", unique=True),
+    )
+
+# --- Attendance Rollups ---
+# Maintained in the same transaction as attendance marking (see rollup_service), so
+# reports read a handful of rows instead of scanning attendance_record.
+class SubjectDailyAttendance(Base):
+    __tablename__ = "subject_daily_attendance"
+    subjectID = Column(Integer, ForeignKey("subject.subjectID"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    present_count = Column(Integer, nullable=False, default=0)
+
+class StudentSubjectAttendance(Base):
+    __tablename__ = "student_subject_attendance"
+    studentID = Column(Integer, ForeignKey("student.studentID"), primary_key=True)
+    subjectID = Column(Integer, ForeignKey("subject.subjectID"), primary_key=True, index=True)
+    present_count = Column(Integer, nullable=False, default=0)
+    last_present = Column(Date)
+
+# --- Dashboard Counters ---
+# Running totals (e.g. users per role) kept up to date by stats_service.
+class DashboardCounter(Base):
+    __tablename__ = "dashboard_counter"
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
 
 class ClassSchedule(Base):
     __tablename__ = "class_schedule"
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, Request, HTTPException, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Depends, Request, HTTPException, Form, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
+from ..utils.templating import templates
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from collections import defaultdict
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select
+from typing import Optional
 import datetime
 
-from ..database.connection import get_db
-from ..services.auth_service import get_current_user_from_cookie, get_password_hash
-from ..models.attendance import User, Student, Teacher, AttendanceRecord, Subject, ClassSchedule, DayOfWeek
+from ..database.connection import get_db, get_read_db, get_async_read_db, writes_data
+from ..services.auth_service import get_current_user_from_cookie, get_password_hash_async, normalize_email
+from ..services import import_service, profiler_service, stats_service, timetable_service, user_directory_service
+from ..models.attendance import User, Teacher, AttendanceRecord, Subject, ClassSchedule, DayOfWeek, UserRole
 
 
 async def ensure_admin_user(current_user: User = Depends(get_current_user_from_cookie)):
@@ -22,8 +25,6 @@ router = APIRouter(
     dependencies=[Depends(ensure_admin_user)]
 )
 
-templates = Jinja2Templates(directory="app/templates")
-
 # Constants
 TOTAL_PERIODS = 8
 DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
@@ -44,23 +45,39 @@ async def admin_root():
     return RedirectResponse(url="/admin/dashboard")
 
 @router.get("/dashboard", response_class=HTMLResponse)
-async def get_admin_dashboard(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
-    user_counts = {
-        'total': db.query(User).count(),
-        'students': db.query(Student).count(),
-        'teachers': db.query(Teacher).count(),
-    }
+async def get_admin_dashboard(request: Request, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user_from_cookie)):
+    user_counts = await stats_service.get_dashboard_stats(db)
     return templates.TemplateResponse("admin/dashboard.html", {"request": request, "user": current_user, "user_counts": user_counts})
 
 # User Management
 @router.get("/manage-users", response_class=HTMLResponse)
-async def manage_users_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
-    all_users = db.query(User).filter(User.role != None, User.role != '').order_by(User.userID).all()
-    return templates.TemplateResponse("admin/manage_users.html", {"request": request, "users": all_users, "user": current_user})
+async def manage_users_page(request: Request, current_user: User = Depends(get_current_user_from_cookie)):
+    # Rows are loaded page by page from /admin/api/users
+    return templates.TemplateResponse("admin/manage_users.html", {"request": request, "user": current_user, "roles": [r.value for r in UserRole]})
+
+@router.post("/import-users", dependencies=[Depends(writes_data)])
+async def import_users_upload(file: UploadFile = File(...), dry_run: bool = Form(False)):
+    """
+    Bulk-imports students and teachers from a CSV (role, name, email, password, rollNumber, class).
+    Returns counts and a per-row error report; valid rows are imported even if others fail.
+    """
+    report = await run_in_threadpool(import_service.import_users_from_file, file.file, dry_run)
+    return report.as_dict()
+
+@router.get("/api/users")
+async def list_users_api(
+    db: AsyncSession = Depends(get_async_read_db),
+    after: int = 0,
+    limit: int = user_directory_service.DEFAULT_PAGE_SIZE,
+    role: Optional[UserRole] = None,
+    q: Optional[str] = None
+):
+    """Keyset-paginated user list: pass the previous page's next_after as `after`."""
+    return await user_directory_service.list_users(db, after=after, limit=limit, role=role, q=q)
 
 # Academics Management (Teachers & Subjects)
 @router.get("/manage-academics", response_class=HTMLResponse)
-async def get_academics_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
+async def get_academics_page(request: Request, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user_from_cookie)):
     all_teachers = db.query(Teacher).order_by(Teacher.name).all()
     all_subjects = db.query(Subject).order_by(Subject.subjectName).all()
     return templates.TemplateResponse(
@@ -73,7 +90,7 @@ async def get_academics_page(request: Request, db: Session = Depends(get_db), cu
         }
     )
 
-@router.post("/add-teacher-and-subject")
+@router.post("/add-teacher-and-subject", dependencies=[Depends(writes_data)])
 async def handle_add_teacher_and_subject(
     db: Session = Depends(get_db),
     teacher_name: str = Form(...),
@@ -82,12 +99,13 @@ async def handle_add_teacher_and_subject(
     subject_name: str = Form(...),
     subject_description: str = Form(None)
 ):
+    teacher_email = normalize_email(teacher_email)
     if db.query(User).filter(User.email == teacher_email).first():
         raise HTTPException(status_code=400, detail="A user with this email already exists.")
     if db.query(Subject).filter(Subject.subjectName == subject_name).first():
         raise HTTPException(status_code=400, detail="A subject with this name already exists.")
     
-    new_teacher = Teacher(name=teacher_name, email=teacher_email, hashed_password=get_password_hash(password))
+    new_teacher = Teacher(name=teacher_name, email=teacher_email, hashed_password=await get_password_hash_async(password))
     db.add(new_teacher)
     db.flush()
 
@@ -100,7 +118,7 @@ async def handle_add_teacher_and_subject(
     db.commit()
     return RedirectResponse(url="/admin/manage-academics", status_code=303)
 
-@router.post("/assign-teacher")
+@router.post("/assign-teacher", dependencies=[Depends(writes_data)])
 async def handle_assign_teacher(db: Session = Depends(get_db), subject_id: int = Form(...), teacher_id: int = Form(...)):
     subject = db.query(Subject).filter(Subject.subjectID == subject_id).first()
     if not subject:
@@ -108,17 +126,15 @@ async def handle_assign_teacher(db: Session = Depends(get_db), subject_id: int =
     
     subject.teacherID = teacher_id
     db.commit()
+    timetable_service.invalidate()
     return RedirectResponse(url="/admin/manage-academics", status_code=303)
 
 # Timetable Management
 @router.get("/manage-timetable", response_class=HTMLResponse)
-async def get_timetable_management_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
-    all_teachers = db.query(Teacher).order_by(Teacher.name).all()
-    all_subjects = db.query(Subject).order_by(Subject.subjectName).all()
-    schedules = db.query(ClassSchedule).all()
-    timetable_data = defaultdict(dict)
-    for s in schedules:
-        timetable_data[s.day_of_week.value][s.period] = s
+async def get_timetable_management_page(request: Request, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user_from_cookie)):
+    all_teachers = (await db.execute(select(Teacher).order_by(Teacher.name))).scalars().all()
+    all_subjects = (await db.execute(select(Subject).order_by(Subject.subjectName))).scalars().all()
+    timetable_data = await timetable_service.get_admin_grid(db)
 
     return templates.TemplateResponse(
         "admin/manage_timetable.html",
@@ -129,7 +145,7 @@ async def get_timetable_management_page(request: Request, db: Session = Depends(
         }
     )
 
-@router.post("/manage-timetable")
+@router.post("/manage-timetable", dependencies=[Depends(writes_data)])
 async def handle_create_schedule(db: Session = Depends(get_db), teacher_id: int = Form(...), subject_id: int = Form(...), day_of_week: str = Form(...), period: int = Form(...), location: str = Form(None)):
     subject = db.query(Subject).filter(Subject.subjectID == subject_id).first()
     if not subject:
@@ -152,4 +168,45 @@ async def handle_create_schedule(db: Session = Depends(get_db), teacher_id: int
         db.add(new_schedule)
     
     db.commit()
-    return RedirectResponse(url="/admin/manage-timetable", status_code=303)
\ No newline at end of file
+    timetable_service.invalidate()
+    return RedirectResponse(url="/admin/manage-timetable", status_code=303)
+
+# Profiling
+@router.post("/profiler/start")
+async def start_profiler(
+    duration_seconds: float = Form(30),
+    max_requests: int = Form(None),
+    interval_ms: int = Form(profiler_service.DEFAULT_INTERVAL_MS),
+    native: bool = Form(False)
+):
+    """
+    Starts a sampling profiler on every worker for a duration (capped) or a number of requests.
+    With native=true and py-spy installed, native frames (e.g. OpenCV) are included.
+    """
+    try:
+        session = profiler_service.start_session(duration_seconds, max_requests, interval_ms, native)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": "Profiling started.", "session": session}
+
+@router.post("/profiler/stop")
+async def stop_profiler():
+    session = profiler_service.stop_session()
+    if not session:
+        raise HTTPException(status_code=404, detail="No profiling session found.")
+    return {"message": "Profiling stopped.", "session": session}
+
+@router.get("/profiler/status")
+async def get_profiler_status():
+    return profiler_service.get_status()
+
+@router.get("/profiler/download/{session_id}", response_class=PlainTextResponse)
+async def download_profile(session_id: str):
+    """Downloads the merged collapsed-stack profile, usable with flamegraph.pl or speedscope."""
+    profile = profiler_service.collect_profile(session_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return PlainTextResponse(
+        profile,
+        headers={"Content-Disposition": f'attachment; filename="profile-{session_id}.folded"'}
+    )
@@ -1,86 +1,228 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
-from sqlalchemy.orm import Session
-import numpy as np
-import cv2
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import datetime
 
-from ..database.connection import get_db
-from ..services import attendance_service
-from ..utils import image_utils
-from ..models.attendance import Student
 from .. import config
+from ..database.connection import get_async_db, get_async_read_db, read_sessionmaker, writes_data
+from ..services import attendance_service, export_service, report_service
+from ..services.auth_service import get_current_user_from_cookie
+from ..utils import image_utils
+from ..models.attendance import Student, Subject, User, UserRole
+from ..utils import metrics
 
 router = APIRouter(
     prefix="/attendance",
     tags=["Attendance"]
 )
 
-@router.post("/mark")
+@router.post("/mark", dependencies=[Depends(writes_data)])
 async def mark_attendance_endpoint(
     subject: str = Form(...),
     image_file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Mark attendance by recognizing faces in an uploaded image.
     - **subject**: The subject for which attendance is being taken.
     - **image_file**: An image containing faces of students.
     """
+    timings = metrics.StageTimings("/attendance/mark", attendance_service.DETECTOR_BACKEND)
     if not image_file.content_type.startswith("image/"):
+        timings.reject("not_image")
         raise HTTPException(status_code=400, detail="File provided is not an image.")
         
     try:
-        cv2_image = await image_utils.to_cv2_image(image_file)
-        result = attendance_service.mark_attendance(db=db, subject=subject, image=cv2_image)
+        with timings.stage("upload"):
+            contents = await image_file.read()
+        with timings.stage("decode"):
+            cv2_image = image_utils.decode_image(contents)
+        if cv2_image is None:
+            timings.reject("undecodable")
+            raise HTTPException(status_code=400, detail="The uploaded image could not be decoded.")
+        result = await attendance_service.mark_attendance(db=db, subject=subject, image=cv2_image, timings=timings)
         return result
     except HTTPException as e:
         raise e
     except Exception as e:
+        timings.reject("error")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    finally:
+        timings.observe()
 
 
 @router.get("/summary/{subject}")
-def get_attendance_summary_endpoint(subject: str, db: Session = Depends(get_db)):
+async def get_attendance_summary_endpoint(subject: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Get a summary of attendance for a specific subject.
     """
-    summary = attendance_service.get_attendance_summary(db=db, subject=subject)
+    summary = await attendance_service.get_attendance_summary(db=db, subject=subject)
     if not summary:
         raise HTTPException(status_code=404, detail=f"No student or attendance data found for subject '{subject}'.")
     return summary
 
+
+# --- Reports and exports (teachers see their own subjects, admins see all) ---
+
+def _report_scope(current_user: User):
+    """The teacher ID to restrict reports to, or None for admins."""
+    if current_user.role == UserRole.admin:
+        return None
+    if current_user.role == UserRole.teacher:
+        return current_user.userID
+    raise HTTPException(status_code=403, detail="Access denied.")
+
+def _check_date_range(start: Optional[datetime.date], end: Optional[datetime.date]):
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="The start date must not be after the end date.")
+
+async def _get_report_subject(db: AsyncSession, subject_id: int, current_user: User) -> Subject:
+    teacher_id = _report_scope(current_user)
+    subject = await db.get(Subject, subject_id)
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found.")
+    if teacher_id is not None and subject.teacherID != teacher_id:
+        raise HTTPException(status_code=403, detail="Not authorized.")
+    return subject
+
+
+@router.get("/reports/subject/{subject_id}")
+async def subject_report_endpoint(
+    subject_id: int,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    offset: int = 0,
+    limit: int = report_service.DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_from_cookie)
+):
+    """Per-student attendance (days present, percentage) for a subject over a date range, paginated."""
+    _check_date_range(start, end)
+    subject = await _get_report_subject(db, subject_id, current_user)
+    report = await report_service.get_subject_report(db, subject_id, start, end, offset=offset, limit=limit)
+    return {"subject": subject.subjectName, **report}
+
+@router.get("/reports/subject/{subject_id}/below")
+async def students_below_threshold_endpoint(
+    subject_id: int,
+    threshold: float = config.LOW_ATTENDANCE_THRESHOLD,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    offset: int = 0,
+    limit: int = report_service.DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_from_cookie)
+):
+    """Students whose attendance percentage in the range is below `threshold`, paginated."""
+    _check_date_range(start, end)
+    if not 0 <= threshold <= 100:
+        raise HTTPException(status_code=400, detail="The threshold must be a percentage between 0 and 100.")
+    subject = await _get_report_subject(db, subject_id, current_user)
+    report = await report_service.get_subject_report(db, subject_id, start, end, below=threshold, offset=offset, limit=limit)
+    return {"subject": subject.subjectName, **report}
+
+@router.get("/reports/subject/{subject_id}/daily")
+async def daily_series_endpoint(
+    subject_id: int,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_from_cookie)
+):
+    """Students present per class day over a date range, with running totals and a moving average."""
+    _check_date_range(start, end)
+    subject = await _get_report_subject(db, subject_id, current_user)
+    series = await report_service.get_daily_series(db, subject_id, start, end)
+    return {"subject": subject.subjectName, **series}
+
+@router.get("/reports/student/{roll_number}")
+async def student_report_endpoint(
+    roll_number: str,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_from_cookie)
+):
+    """Attendance of one student per subject over a date range."""
+    _check_date_range(start, end)
+    teacher_id = _report_scope(current_user)
+    student = (await db.execute(
+        select(Student.studentID, Student.name).where(Student.rollNumber == roll_number)
+    )).first()
+    if not student:
+        raise HTTPException(status_code=404, detail=f"Student with Roll Number '{roll_number}' not found.")
+    subjects = await report_service.get_student_report(db, student.studentID, start, end, teacher_id=teacher_id)
+    return {
+        "rollNumber": roll_number, "name": student.name,
+        "start": start.isoformat() if start else None, "end": end.isoformat() if end else None,
+        "subjects": subjects,
+    }
+
+
+@router.get("/export/{fmt}")
+async def export_attendance_endpoint(
+    request: Request,
+    fmt: str,
+    subject_id: Optional[int] = None,
+    roll_number: Optional[str] = None,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    current_user: User = Depends(get_current_user_from_cookie)
+):
+    """
+    Download attendance records as CSV or XLSX, filtered by subject, student roll number
+    and/or date range. Teachers only get the subjects they teach. The file is streamed.
+    """
+    if fmt not in export_service.EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail="Export format must be 'csv' or 'xlsx'.")
+    teacher_id = _report_scope(current_user)
+    _check_date_range(start, end)
+
+    stmt = export_service.build_export_query(subject_id, roll_number, start, end, teacher_id)
+    writer, media_type = export_service.EXPORT_FORMATS[fmt]
+    filename = export_service.export_filename(fmt, subject_id, roll_number, start, end)
+    # A sync iterator: Starlette pulls it in the threadpool, one chunk at a time
+    return StreamingResponse(
+        writer(export_service.iter_export_rows(stmt, read_sessionmaker(request))),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.post("/recognize-frame")
 async def recognize_faces_in_frame(
     image_file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Detects and recognizes faces in a single frame for UI display.
     This endpoint does NOT mark attendance.
     """
+    timings = metrics.StageTimings("/attendance/recognize-frame", attendance_service.DETECTOR_BACKEND)
     try:
-        recognizer = attendance_service.load_recognizer()
-        detector = cv2.CascadeClassifier(str(config.HAAR_CASCADE_PATH))
-        
-        cv2_image = await image_utils.to_cv2_image(image_file)
-        gray = cv2.cvtColor(cv2_image, cv2.COLOR_BGR2GRAY)
-        
-        faces = detector.detectMultiScale(gray, 1.3, 5)
-        
-        results = []
-        for (x, y, w, h) in faces:
-            roll_number_pred, confidence = recognizer.predict(gray[y:y+h, x:x+w])
-            
-            name = "Unknown"
-            if confidence < config.RECOGNITION_CONFIDENCE_THRESHOLD:
-                student = db.query(Student).filter(Student.rollNumber == str(roll_number_pred)).first()
-                if student:
-                    name = student.name
-            
-            results.append({
-                "name": name,
-                "box": [x, y, w, h]
-            })
-            
+        with timings.stage("upload"):
+            contents = await image_file.read()
+        with timings.stage("decode"):
+            cv2_image = image_utils.decode_image(contents)
+        if cv2_image is None:
+            timings.reject("undecodable")
+            return {"results": []}
+
+        predictions = await run_in_threadpool(attendance_service.detect_and_predict, cv2_image, timings)
+
+        names = {}
+        roll_numbers = {roll for _, roll in predictions if roll is not None}
+        if roll_numbers:
+            with timings.stage("db"):
+                rows = await db.execute(select(Student.rollNumber, Student.name).where(Student.rollNumber.in_(roll_numbers)))
+                names = dict(rows.all())
+
+        results = [{"name": names.get(roll, "Unknown"), "box": box} for box, roll in predictions]
         return {"results": results}
     except Exception:
-        return {"results": []}
\ No newline at end of file
+        timings.reject("error")
+        return {"results": []}
+    finally:
+        timings.observe()
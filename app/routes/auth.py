@@ -1,17 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from ..utils.templating import templates
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-import re
 
-from ..database.connection import get_db
+from ..database.connection import get_async_db, writes_data
 from ..services import auth_service
 from ..models.attendance import User, Student, UserRole
 
 # --- FIX: This block MUST come first, right after the imports ---
-templates = Jinja2Templates(directory="app/templates")
-
 router = APIRouter(
     prefix="/auth",
     tags=["Authentication"]
@@ -30,10 +28,10 @@ async def registration_page(request: Request, error: Optional[str] = None):
 
 
 # --- API Logic Routes ---
-@router.post("/register")
+@router.post("/register", dependencies=[Depends(writes_data)])
 async def register_user_submit(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     name: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
@@ -42,14 +40,15 @@ async def register_user_submit(
     studentClass: Optional[str] = Form(None)
 ):
     """Handles submission of the registration form with password and uniqueness validation."""
-    
+    email = auth_service.normalize_email(email)
+
     # Password validation
-    if len(password) < 8 or not re.search("[a-z]", password) or not re.search("[A-Z]", password) or not re.search("[0-9]", password) or not re.search("[!@#$%^&*]", password):
+    if not auth_service.is_strong_password(password):
         error = "Password does not meet the complexity requirements."
         return templates.TemplateResponse("registration.html", {"request": request, "error": error}, status_code=400)
 
     # Check for duplicate email
-    if db.query(User).filter(User.email == email).first():
+    if await auth_service.get_user_by_email(db, email):
         error = "An account with this email already exists."
         return templates.TemplateResponse("registration.html", {"request": request, "error": error}, status_code=400)
 
@@ -57,11 +56,11 @@ async def register_user_submit(
     if role == UserRole.student:
         if not rollNumber:
             raise HTTPException(status_code=400, detail="Roll number is required for students.")
-        if db.query(Student).filter(Student.rollNumber == rollNumber).first():
+        if (await db.execute(select(Student.studentID).where(Student.rollNumber == rollNumber))).first():
             error = f"A student with Roll Number '{rollNumber}' already exists."
             return templates.TemplateResponse("registration.html", {"request": request, "error": error}, status_code=400)
 
-    hashed_password = auth_service.get_password_hash(password)
+    hashed_password = await auth_service.get_password_hash_async(password)
     
     if role == UserRole.student:
         new_user = Student(
@@ -72,7 +71,7 @@ async def register_user_submit(
         new_user = User(name=name, email=email, hashed_password=hashed_password, role=role)
     
     db.add(new_user)
-    db.commit()
+    await db.commit()
     
     return RedirectResponse(url="/auth/login", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -80,16 +79,24 @@ async def register_user_submit(
 @router.post("/login")
 async def login_submit(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     username: str = Form(...),
     password: str = Form(...)
 ):
-    user = db.query(User).filter(User.email == username).first()
-    if not user or not auth_service.verify_password(password, user.hashed_password):
+    user = await auth_service.get_user_by_email(db, username)
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await auth_service.verify_password_async(password, user.hashed_password)
+    if not valid:
         error = "Incorrect email or password. Please try again."
         return templates.TemplateResponse("login.html", {"request": request, "error": error}, status_code=401)
 
-    access_token = auth_service.create_access_token(data={"sub": user.email})
+    # The configured bcrypt cost changed since this hash was made; upgrade it transparently
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
+    access_token = auth_service.create_user_token(user)
     
     response = RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     response.set_cookie(key="access_token", value=f"Bearer {access_token}", httponly=True)
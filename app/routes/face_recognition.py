@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from ..utils.templating import templates
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -9,8 +9,6 @@ from ..services import face_rec_service # Use the OpenCV service
 from ..services.auth_service import get_current_user_from_cookie
 from ..models.attendance import User, Student
 
-templates = Jinja2Templates(directory="app/templates")
-
 router = APIRouter(
     prefix="/face-recognition",
     tags=["Face Recognition"]
@@ -70,7 +68,7 @@ async def get_face_recognition_page(request: Request):
 # ... (rest of the file) ...
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from ..utils.templating import templates
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -79,8 +77,6 @@ from ..services import face_rec_service
 from ..services.auth_service import get_current_user_from_cookie
 from ..models.attendance import User, Student
 
-templates = Jinja2Templates(directory="app/templates")
-
 router = APIRouter(
     prefix="/face-recognition",
     tags=["Face Recognition"]
@@ -113,7 +109,7 @@ async def get_face_recognition_page(request: Request):
 # ... (rest of the file with /register-faces and /train routes) ...
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from ..utils.templating import templates
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -122,8 +118,6 @@ from ..services import face_rec_service # Make sure this is using the OpenCV ser
 from ..services.auth_service import get_current_user_from_cookie
 from ..models.attendance import User, Student
 
-templates = Jinja2Templates(directory="app/templates")
-
 router = APIRouter(
     prefix="/face-recognition",
     tags=["Face Recognition"]
@@ -206,7 +200,6 @@ from ..services import face_rec_service # Point back to the OpenCV service
 from ..services.auth_service import get_current_user_from_cookie
 from ..models.attendance import User, Student
 
-templates = Jinja2Templates(directory="app/templates")
 router = APIRouter(prefix="/face-recognition", tags=["Face Recognition"])
 
 @router.get("/recognize", response_class=HTMLResponse)
@@ -239,7 +232,6 @@ from ..services import face_rec_service
 from ..services.auth_service import get_current_user_from_cookie
 from ..models.attendance import User, Student
 
-templates = Jinja2Templates(directory="app/templates")
 router = APIRouter(prefix="/face-recognition", tags=["Face Recognition"])
 
 
@@ -282,7 +274,6 @@ from ..services import face_rec_service
 from ..services.auth_service import get_current_user_from_cookie
 from ..models.attendance import User, Student
 
-templates = Jinja2Templates(directory="app/templates")
 router = APIRouter(prefix="/face-recognition", tags=["Face Recognition"])
 
 @router.get("/recognize", response_class=HTMLResponse)
@@ -315,35 +306,50 @@ def train_model_endpoint(current_user: User = Depends(get_current_user_from_cook
     if current_user.role.value != 'teacher':
         raise HTTPException(status_code=403, detail="Not authorized.")
     return face_rec_service.train_model()
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request, Header
+from fastapi.responses import HTMLResponse, Response
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from ..database.connection import get_db
-from ..services import face_rec_service
+from ..database.connection import get_db, get_async_db, get_async_read_db
+from ..services import face_rec_service, user_directory_service
 from ..services.auth_service import get_current_user_from_cookie
 from ..models.attendance import User, Student
 
-templates = Jinja2Templates(directory="app/templates")
 router = APIRouter(prefix="/face-recognition", tags=["Face Recognition"])
 
 
+async def ensure_teacher_user(current_user: User = Depends(get_current_user_from_cookie)):
+    if current_user.role.value != 'teacher':
+        raise HTTPException(status_code=403, detail="Not authorized.")
+    return current_user
+
+
 @router.get("/recognize", response_class=HTMLResponse)
 async def get_face_recognition_page(request: Request):
     return templates.TemplateResponse("teacher/face_recognition.html", {"request": request})
 
 
-# --- FIX: Change to async and remove the incorrect response_class ---
-@router.get("/students-for-registration")
-async def get_students_for_registration(db: Session = Depends(get_db)):
+@router.get("/students/search", dependencies=[Depends(ensure_teacher_user)])
+async def search_students(q: str = "", limit: int = user_directory_service.DEFAULT_SEARCH_LIMIT, db: AsyncSession = Depends(get_async_read_db)):
     """
-    Gets a list of all registered students. FastAPI will automatically
-    convert the returned list into a proper JSON response.
+    Typeahead search: students whose name or roll number starts with `q`.
     """
-    students = db.query(Student).order_by(Student.name).all()
-    return [{"roll_number": s.rollNumber, "name": s.name} for s in students]
-# --- END OF FIX ---
+    return await user_directory_service.search_students(db, q, limit)
+
+
+@router.get("/students-for-registration", dependencies=[Depends(ensure_teacher_user)])
+async def get_students_for_registration(db: AsyncSession = Depends(get_async_db), if_none_match: Optional[str] = Header(None)):
+    """
+    Gets a list of all registered students. Prefer /students/search; this full list
+    carries an ETag so clients that do need it can revalidate with If-None-Match.
+    """
+    etag, body = await user_directory_service.get_student_roster(db)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if user_directory_service.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.post("/register-faces")
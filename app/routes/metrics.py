@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..utils import metrics
+
+router = APIRouter(tags=["Monitoring"])
+
+# Content type defined by the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    """
+    Exposes per-stage timings and face counters of this worker for Prometheus scraping.
+    """
+    return PlainTextResponse(metrics.render_latest(), media_type=PROMETHEUS_CONTENT_TYPE)
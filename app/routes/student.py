@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from ..utils.templating import templates
 from sqlalchemy.orm import Session
 
 from ..database.connection import get_db
@@ -20,8 +20,6 @@ router = APIRouter(
     dependencies=[Depends(ensure_student_user)]
 )
 
-templates = Jinja2Templates(directory="app/templates")
-
 # --- NEW STUDENT ROUTES ---
 
 @router.get("/dashboard", response_class=HTMLResponse)
@@ -1,74 +1,63 @@
 from fastapi import APIRouter, Depends, Request, HTTPException, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct, and_
-from collections import defaultdict
+from ..utils.templating import templates
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select
 
-from ..database.connection import get_db
+from ..database.connection import get_db, get_async_db, get_async_read_db, writes_data
 from ..services.auth_service import get_current_user_from_cookie
-from ..models.attendance import User, Teacher, Subject, Student, AttendanceRecord, ClassSchedule, DayOfWeek
+from ..services import attendance_service, report_service, rollup_service, timetable_service
+from ..models.attendance import User, Teacher, Subject, AttendanceRecord, DayOfWeek
 
 # --- FIX: This block MUST come first, right after the imports ---
 router = APIRouter(
     prefix="/teacher",
     tags=["Teacher Dashboard"]
 )
-
-templates = Jinja2Templates(directory="app/templates")
 # --- END OF FIX ---
 
 
+async def get_teacher_with_subjects(db: AsyncSession, user_id: int) -> Teacher:
+    """Loads the teacher with subjects_taught eager-loaded (lazy loads are not possible with AsyncSession)."""
+    result = await db.execute(select(Teacher).options(selectinload(Teacher.subjects_taught)).where(Teacher.userID == user_id))
+    teacher = result.scalars().first()
+    if not teacher: raise HTTPException(status_code=404, detail="Teacher record not found.")
+    return teacher
+
+
 # --- Now, all the routes can be defined below this point ---
 
 @router.get("/my-classes", response_class=HTMLResponse)
-async def get_my_classes_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
+async def get_my_classes_page(request: Request, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user_from_cookie)):
     if current_user.role != 'teacher': raise HTTPException(status_code=403, detail="Access denied.")
-    teacher = db.query(Teacher).filter(Teacher.userID == current_user.userID).first()
-    if not teacher: raise HTTPException(status_code=404, detail="Teacher record not found.")
+    teacher = await get_teacher_with_subjects(db, current_user.userID)
     subjects = teacher.subjects_taught
-    class_data = []
-    for subject in subjects:
-        student_count = db.query(func.count(distinct(AttendanceRecord.studentID))).filter(AttendanceRecord.subjectID == subject.subjectID).scalar() or 0
-        class_data.append({"subject": subject, "student_count": student_count})
+    student_counts = await attendance_service.get_student_counts_by_subject(db, teacher.userID, [s.subjectID for s in subjects])
+    class_data = [{"subject": subject, "student_count": student_counts.get(subject.subjectID, 0)} for subject in subjects]
     return templates.TemplateResponse("teacher/my_classes.html", {"request": request, "user": current_user, "classes": class_data})
 
 @router.get("/attendance-reports", response_class=HTMLResponse)
-async def get_attendance_reports_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
+async def get_attendance_reports_page(request: Request, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user_from_cookie)):
     if current_user.role != 'teacher': raise HTTPException(status_code=403, detail="Access denied.")
-    teacher = db.query(Teacher).filter(Teacher.userID == current_user.userID).first()
-    if not teacher: raise HTTPException(status_code=404, detail="Teacher record not found.")
+    teacher = await get_teacher_with_subjects(db, current_user.userID)
     subjects_taught = teacher.subjects_taught
     return templates.TemplateResponse("teacher/attendance_reports.html", {"request": request, "user": current_user, "subjects": subjects_taught})
 
 @router.get("/timetable", response_class=HTMLResponse)
-async def get_timetable_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
+async def get_timetable_page(request: Request, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user_from_cookie)):
     if current_user.role != 'teacher': raise HTTPException(status_code=403, detail="Access denied.")
-    schedules = db.query(ClassSchedule).join(Subject).filter(Subject.teacherID == current_user.userID).order_by(ClassSchedule.start_time).all()
-    timetable_data = defaultdict(list)
-    for schedule in schedules:
-        timetable_data[schedule.day_of_week.value].append(schedule)
+    timetable_data = await timetable_service.get_teacher_week(db, current_user.userID)
     days_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
     return templates.TemplateResponse("teacher/timetable.html", {"request": request, "user": current_user, "timetable": timetable_data, "days_order": days_order})
 
 @router.get("/class/{subject_id}", response_class=HTMLResponse)
-async def get_class_details_page(request: Request, subject_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
+async def get_class_details_page(request: Request, subject_id: int, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user_from_cookie)):
     if current_user.role != 'teacher': raise HTTPException(status_code=403, detail="Access denied.")
-    subject = db.query(Subject).filter(Subject.subjectID == subject_id).first()
+    subject = await db.get(Subject, subject_id)
     if not subject: raise HTTPException(status_code=404, detail="Class not found.")
     if subject.teacherID != current_user.userID: raise HTTPException(status_code=403, detail="Not authorized.")
-    total_class_days = db.query(func.count(distinct(func.date(AttendanceRecord.timestamp)))).filter(AttendanceRecord.subjectID == subject_id).scalar() or 0
-    enrolled_student_ids_query = db.query(distinct(AttendanceRecord.studentID)).filter(AttendanceRecord.subjectID == subject_id)
-    enrolled_student_ids = [s_id for s_id, in enrolled_student_ids_query.all()]
-    attendance_data = []
-    if enrolled_student_ids:
-        students = db.query(Student).filter(Student.studentID.in_(enrolled_student_ids)).all()
-        for student in students:
-            days_present = db.query(func.count(AttendanceRecord.recordID)).filter(
-                and_(AttendanceRecord.subjectID == subject_id, AttendanceRecord.studentID == student.studentID)
-            ).scalar() or 0
-            percentage = round((days_present / total_class_days) * 100) if total_class_days > 0 else 0
-            attendance_data.append({"student": student, "days_present": days_present, "total_class_days": total_class_days, "percentage": percentage})
+    attendance_data = await attendance_service.get_class_attendance(db, subject_id)
     return templates.TemplateResponse("teacher/class_details.html", {"request": request, "user": current_user, "subject": subject, "attendance_data": attendance_data})
 
 @router.get("/add-class", response_class=HTMLResponse)
@@ -76,7 +65,7 @@ async def get_add_class_page(request: Request, current_user: User = Depends(get_
     if current_user.role != 'teacher': raise HTTPException(status_code=403, detail="Access denied.")
     return templates.TemplateResponse("teacher/add_class.html", {"request": request, "user": current_user})
 
-@router.post("/add-class")
+@router.post("/add-class", dependencies=[Depends(writes_data)])
 async def handle_add_class_form(db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie), subject_name: str = Form(...), subject_description: str = Form(None)):
     if current_user.role != 'teacher': raise HTTPException(status_code=403, detail="Access denied.")
     existing_subject = db.query(Subject).filter(and_(Subject.subjectName == subject_name, Subject.teacherID == current_user.userID)).first()
@@ -93,7 +82,7 @@ async def get_edit_class_page(request: Request, subject_id: int, db: Session = D
     if not subject: raise HTTPException(status_code=404, detail="Class not found or you are not authorized to edit it.")
     return templates.TemplateResponse("teacher/edit_class.html", {"request": request, "user": current_user, "subject": subject})
 
-@router.post("/edit-class/{subject_id}")
+@router.post("/edit-class/{subject_id}", dependencies=[Depends(writes_data)])
 async def handle_edit_class_form(subject_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie), subject_name: str = Form(...), subject_description: str = Form(None)):
     if current_user.role != 'teacher': raise HTTPException(status_code=403, detail="Access denied.")
     subject_to_update = db.query(Subject).filter(Subject.subjectID == subject_id, Subject.teacherID == current_user.userID).first()
@@ -101,16 +90,22 @@ async def handle_edit_class_form(subject_id: int, db: Session = Depends(get_db),
     subject_to_update.subjectName = subject_name
     subject_to_update.description = subject_description
     db.commit()
+    timetable_service.invalidate()
     return RedirectResponse(url="/teacher/my-classes", status_code=303)
 
-@router.post("/delete-class/{subject_id}")
+@router.post("/delete-class/{subject_id}", dependencies=[Depends(writes_data)])
 async def handle_delete_class(subject_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_from_cookie)):
     if current_user.role != 'teacher': raise HTTPException(status_code=403, detail="Access denied.")
     subject_to_delete = db.query(Subject).filter(Subject.subjectID == subject_id, Subject.teacherID == current_user.userID).first()
     if not subject_to_delete: raise HTTPException(status_code=404, detail="Class not found or not authorized.")
     db.query(AttendanceRecord).filter(AttendanceRecord.subjectID == subject_id).delete(synchronize_session=False)
+    for statement in rollup_service.delete_statements(subject_id):
+        db.execute(statement)
     db.delete(subject_to_delete)
     db.commit()
+    attendance_service.invalidate_class_counts(current_user.userID)
+    report_service.invalidate(subject_id)
+    timetable_service.invalidate()
     return RedirectResponse(url="/teacher/my-classes", status_code=303)
 # ... (keep all existing imports and routes) ...
 
@@ -118,16 +113,14 @@ async def handle_delete_class(subject_id: int, db: Session = Depends(get_db), cu
 @router.get("/realtime-attendance", response_class=HTMLResponse)
 async def get_realtime_attendance_page(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user_from_cookie)
 ):
     """Serves the page for real-time, continuous attendance marking."""
     if current_user.role.value != 'teacher':
         raise HTTPException(status_code=403, detail="Access denied.")
 
-    teacher = db.query(Teacher).filter(Teacher.userID == current_user.userID).first()
-    if not teacher:
-        raise HTTPException(status_code=404, detail="Teacher record not found.")
+    teacher = await get_teacher_with_subjects(db, current_user.userID)
 
     # Fetch subjects to populate the dropdown
     subjects = teacher.subjects_taught
@@ -157,7 +150,7 @@ async def get_add_class_page(
         {"request": request, "user": current_user}
     )
 
-@router.post("/add-class")
+@router.post("/add-class", dependencies=[Depends(writes_data)])
 async def handle_add_class_form(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_from_cookie),
@@ -200,16 +193,14 @@ async def handle_add_class_form(
 @router.get("/bulk-attendance", response_class=HTMLResponse)
 async def get_bulk_attendance_page(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user_from_cookie)
 ):
     """Serves the page for marking attendance from a single class photo."""
     if current_user.role.value != 'teacher':
         raise HTTPException(status_code=403, detail="Access denied.")
 
-    teacher = db.query(Teacher).filter(Teacher.userID == current_user.userID).first()
-    if not teacher:
-        raise HTTPException(status_code=404, detail="Teacher record not found.")
+    teacher = await get_teacher_with_subjects(db, current_user.userID)
 
     # Fetch subjects to populate the dropdown
     subjects = teacher.subjects_taught
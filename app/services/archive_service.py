@@ -0,0 +1,295 @@
+import datetime
+import json
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .. import config
+from ..models.attendance import AttendanceRecord
+
+# --- Attendance archive ---
+# Closed terms are moved out of attendance_record into one compressed NumPy file per
+# term (columns: recordID, studentID, subjectID, timestamp, isPresent, date), listed in
+# manifest.json with their date range. Terms, ranges and days present go by each
+# record's marking day (attendance_record.date), as the reports and rollups do.
+# A term stays "pending" in the manifest until its rows are deleted from the database;
+# reports skip pending terms so that their records are not counted twice. Rows are deleted from the database only after
+# the file has been written and read back. The attendance rollups keep counting
+# archived days; reports add archived records whenever a requested range overlaps a term.
+
+MANIFEST_NAME = "manifest.json"
+COLUMNS = ("recordID", "studentID", "subjectID", "timestamp", "isPresent", "date")
+
+record_table = AttendanceRecord.__table__
+
+# numpy is imported on first use so that importing the app stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+_loaded_terms = {}
+_loaded_terms_lock = threading.Lock()
+_manifest_cache = (None, [])
+
+
+def _manifest_path():
+    return config.ARCHIVE_DIR / MANIFEST_NAME
+
+
+def load_manifest() -> list:
+    """Archived terms as dicts (term, start, end, file, rows, archived_at, pending), oldest first."""
+    global _manifest_cache
+    path = _manifest_path()
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return []
+    if _manifest_cache[0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            _manifest_cache = (mtime, json.load(f)["terms"])
+    return [dict(term) for term in _manifest_cache[1]]
+
+
+def _save_manifest(terms: list):
+    config.ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _manifest_path()
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"terms": sorted(terms, key=lambda t: t["start"])}, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _overlaps(term: dict, start: Optional[datetime.date], end: Optional[datetime.date]) -> bool:
+    return (end is None or term["start"] <= end.isoformat()) and (start is None or start.isoformat() <= term["end"])
+
+
+def terms_overlapping(start: Optional[datetime.date], end: Optional[datetime.date]) -> list:
+    """Archived terms in the range whose records have left the database."""
+    return [term for term in load_manifest() if _overlaps(term, start, end) and not term.get("pending")]
+
+
+def pending_terms() -> list:
+    """Archived terms whose records are still being deleted from the database."""
+    return [term for term in load_manifest() if term.get("pending")]
+
+
+def _load_term(term: dict) -> dict:
+    """The columns of an archived term, cached per worker (archive files never change)."""
+    import numpy as np
+
+    path = config.ARCHIVE_DIR / term["file"]
+    key = (str(path), path.stat().st_mtime_ns)
+    with _loaded_terms_lock:
+        columns = _loaded_terms.get(key)
+    if columns is None:
+        with np.load(path) as archive:
+            columns = {name: archive[name] for name in COLUMNS if name in archive.files}
+        if "date" not in columns:
+            # Archived before records had a marking day: use the day of the timestamp
+            columns["date"] = columns["timestamp"].astype("datetime64[D]")
+        with _loaded_terms_lock:
+            _loaded_terms[key] = columns
+    return columns
+
+
+def _day_bounds(start: Optional[datetime.date], end: Optional[datetime.date]):
+    import numpy as np
+
+    lower = np.datetime64(start, "D") if start else None
+    upper = np.datetime64(end, "D") if end else None
+    return lower, upper
+
+
+def days_present(
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    subject_id: Optional[int] = None,
+    student_id: Optional[int] = None,
+    by: str = "studentID",
+) -> dict:
+    """
+    Archived attendance in [start, end] grouped by `by` ("studentID" or "subjectID"):
+    {id: (days present, last timestamp)}. Empty if no term overlaps the range.
+    """
+    terms = terms_overlapping(start, end)
+    if not terms:
+        return {}
+    import numpy as np
+
+    lower, upper = _day_bounds(start, end)
+    keys, stamps, days = [], [], []
+    for term in terms:
+        columns = _load_term(term)
+        mask = np.ones(len(columns["recordID"]), dtype=bool)
+        if subject_id is not None:
+            mask &= columns["subjectID"] == subject_id
+        if student_id is not None:
+            mask &= columns["studentID"] == student_id
+        if lower is not None:
+            mask &= columns["date"] >= lower
+        if upper is not None:
+            mask &= columns["date"] <= upper
+        keys.append(columns[by][mask])
+        stamps.append(columns["timestamp"][mask])
+        days.append(columns["date"][mask])
+    if not keys or not sum(len(k) for k in keys):
+        return {}
+
+    keys = np.concatenate(keys)
+    stamps = np.concatenate(stamps)
+    days = np.concatenate(days).astype(np.int64)
+    # One count per distinct (key, day); older archives may hold several records per day
+    pairs = np.unique(np.stack([keys, days], axis=1), axis=0)
+    unique_keys, counts = np.unique(pairs[:, 0], return_counts=True)
+    order = np.lexsort((stamps, keys))
+    last_index = order[np.searchsorted(keys[order], unique_keys, side="right") - 1]
+    return {
+        int(key): (int(count), stamps[i].astype("datetime64[s]").astype(datetime.datetime))
+        for key, count, i in zip(unique_keys, counts, last_index)
+    }
+
+
+def rollup_rows(subject_id: Optional[int] = None, live_record_ids=()):
+    """
+    Rollup rows for all archived records (optionally one subject), used when the
+    rollups are rebuilt: ([subject_daily_attendance rows], [student_subject_attendance rows]).
+    Records of pending terms listed in live_record_ids are still counted from the database.
+    """
+    import numpy as np
+
+    live_record_ids = np.fromiter(live_record_ids, dtype=np.int64)
+    daily, students = {}, {}
+    for term in load_manifest():
+        columns = _load_term(term)
+        mask = np.ones(len(columns["recordID"]), dtype=bool)
+        if subject_id is not None:
+            mask &= columns["subjectID"] == subject_id
+        if term.get("pending") and len(live_record_ids):
+            mask &= ~np.isin(columns["recordID"], live_record_ids)
+        student_ids = columns["studentID"][mask]
+        subject_ids = columns["subjectID"][mask]
+        day_numbers = columns["date"][mask].astype(np.int64)
+        for student, subject, day in np.unique(np.stack([student_ids, subject_ids, day_numbers], axis=1), axis=0):
+            day = datetime.date(1970, 1, 1) + datetime.timedelta(days=int(day))
+            daily[(int(subject), day)] = daily.get((int(subject), day), 0) + 1
+            count, last = students.get((int(student), int(subject)), (0, day))
+            students[(int(student), int(subject))] = (count + 1, max(last, day))
+    return (
+        [{"subjectID": s, "date": d, "present_count": n} for (s, d), n in daily.items()],
+        [{"studentID": st, "subjectID": s, "present_count": n, "last_present": last} for (st, s), (n, last) in students.items()],
+    )
+
+
+def _term_filename(term: str) -> str:
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in term)
+    return f"attendance_{safe}.npz"
+
+
+def _read_term_rows(db: Session, start: datetime.date, end: datetime.date) -> dict:
+    """Reads the term's records from the database in batches into column arrays."""
+    import numpy as np
+
+    stmt = (
+        select(*[record_table.c[name] for name in COLUMNS])
+        .where(record_table.c.date >= start, record_table.c.date <= end)
+        .order_by(record_table.c.recordID)
+    )
+    chunks = {name: [] for name in COLUMNS}
+    result = db.execute(stmt, execution_options={"yield_per": config.ARCHIVE_BATCH_SIZE})
+    for partition in result.partitions():
+        record_ids, student_ids, subject_ids, stamps, present, dates = zip(*partition)
+        chunks["recordID"].append(np.array(record_ids, dtype=np.int64))
+        chunks["studentID"].append(np.array(student_ids, dtype=np.int64))
+        chunks["subjectID"].append(np.array(subject_ids, dtype=np.int64))
+        chunks["timestamp"].append(np.array([s.replace(tzinfo=None) for s in stamps], dtype="datetime64[s]"))
+        chunks["isPresent"].append(np.array([str(p).lower() == "true" for p in present], dtype=bool))
+        chunks["date"].append(np.array(dates, dtype="datetime64[D]"))
+    empty = {"recordID": np.int64, "studentID": np.int64, "subjectID": np.int64, "timestamp": "datetime64[s]",
+             "isPresent": bool, "date": "datetime64[D]"}
+    return {
+        name: np.concatenate(parts) if parts else np.array([], dtype=empty[name])
+        for name, parts in chunks.items()
+    }
+
+
+def _write_term_file(path, columns: dict):
+    """Writes the archive next to its final name, verifies it, then renames it into place."""
+    import numpy as np
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **columns)
+        f.flush()
+        os.fsync(f.fileno())
+    with np.load(tmp_path) as written:
+        if not np.array_equal(written["recordID"], columns["recordID"]):
+            raise RuntimeError(f"Archive verification failed for {path.name}.")
+    os.replace(tmp_path, path)
+
+
+def _delete_archived(db: Session, record_ids: "np.ndarray", batch_size: int) -> int:
+    """Deletes archived records by ID, committing each batch so locks stay short."""
+    deleted = 0
+    for i in range(0, len(record_ids), batch_size):
+        batch = [int(r) for r in record_ids[i:i + batch_size]]
+        deleted += db.execute(delete(record_table).where(record_table.c.recordID.in_(batch))).rowcount
+        db.commit()
+    return deleted
+
+
+def _finish_term(term: str):
+    """Marks a term as no longer pending once its records are deleted from the database."""
+    terms = load_manifest()
+    for entry in terms:
+        if entry["term"] == term:
+            entry.pop("pending", None)
+    _save_manifest(terms)
+
+
+def archive_term(db: Session, term: str, start: datetime.date, end: datetime.date,
+                 dry_run: bool = False, batch_size: Optional[int] = None) -> dict:
+    """
+    Moves the attendance records of a closed term [start, end] to ARCHIVE_DIR and deletes
+    them from the database. The term is pending in the manifest until the deletion has
+    finished; re-running for a pending term finishes an interrupted deletion.
+    """
+    batch_size = batch_size or config.ARCHIVE_BATCH_SIZE
+    if start > end:
+        raise ValueError("The term start must not be after its end.")
+    if end >= datetime.date.today():
+        raise ValueError("Only closed terms (ending before today) can be archived.")
+
+    terms = load_manifest()
+    existing = next((t for t in terms if t["term"] == term), None)
+    if existing is not None:
+        if (existing["start"], existing["end"]) != (start.isoformat(), end.isoformat()):
+            raise ValueError(f"Term '{term}' is already archived for {existing['start']} to {existing['end']}.")
+        record_ids = _load_term(existing)["recordID"]
+        deleted = 0 if dry_run else _delete_archived(db, record_ids, batch_size)
+        if not dry_run and existing.get("pending"):
+            _finish_term(term)
+        return {"term": term, "rows": existing["rows"], "deleted": deleted, "file": existing["file"], "resumed": True}
+    for other in terms:
+        if _overlaps(other, start, end):
+            raise ValueError(f"The range overlaps archived term '{other['term']}' ({other['start']} to {other['end']}).")
+
+    columns = _read_term_rows(db, start, end)
+    rows = len(columns["recordID"])
+    filename = _term_filename(term)
+    if dry_run or rows == 0:
+        return {"term": term, "rows": rows, "deleted": 0, "file": None if rows == 0 else filename, "resumed": False}
+
+    config.ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    _write_term_file(config.ARCHIVE_DIR / filename, columns)
+    terms.append({
+        "term": term, "start": start.isoformat(), "end": end.isoformat(), "file": filename,
+        "rows": rows, "archived_at": datetime.datetime.now().isoformat(timespec="seconds"), "pending": True,
+    })
+    _save_manifest(terms)
+    deleted = _delete_archived(db, columns["recordID"], batch_size)
+    _finish_term(term)
+    return {"term": term, "rows": rows, "deleted": deleted, "file": filename, "resumed": False}
@@ -1,38 +1,143 @@
-import cv2
 import os
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+import threading
+from typing import TYPE_CHECKING
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from datetime import date
 from fastapi import HTTPException
-import numpy as np
+from fastapi.concurrency import run_in_threadpool
 
 from .. import config
-from ..models.attendance import Student, AttendanceRecord, Subject
+from ..models.attendance import Student, Subject, SubjectDailyAttendance, StudentSubjectAttendance
+from . import model_store, report_service, rollup_service
+from ..utils import metrics
+from ..utils.cache import TTLCache
+from ..utils.image_utils import normalize_face
 
-def load_recognizer():
-    """Loads the trained LBPH recognizer model with proper error handling."""
-    # --- ADDED VALIDATION ---
-    if not os.path.exists(config.TRAINED_MODEL_PATH):
-        print("!!! ERROR: Trained model file not found at:", config.TRAINED_MODEL_PATH)
+# cv2 and numpy are imported on first use so that importing the app stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+# Label used for metrics recorded by this (OpenCV) pipeline
+DETECTOR_BACKEND = "haar"
+
+# Per-teacher student counts for the My Classes page, keyed by teacher ID
+class_counts_cache = TTLCache(ttl_seconds=config.CLASS_COUNTS_CACHE_SECONDS)
+
+def invalidate_class_counts(teacher_id):
+    """Call after attendance for any of this teacher's subjects is written or deleted."""
+    if teacher_id is not None:
+        class_counts_cache.invalidate(teacher_id)
+
+def get_recognizer():
+    """
+    The trained LBPH model, memory-mapped from the shared model store (see model_store),
+    so all workers share one copy. A newly trained model is picked up automatically.
+    A model trained with other face normalization settings is refused until retrained.
+    """
+    try:
+        recognizer = model_store.get_model()
+    except (OSError, ValueError) as e:
+        print(f"!!! ERROR: Could not read the model files. They might be corrupt. Error: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to load the recognition model. It may be corrupt. Please retrain the model."
+        )
+    if recognizer is None:
+        print("!!! ERROR: Trained model not found in:", config.LBPH_MODEL_DIR)
         raise HTTPException(
-            status_code=500, 
+            status_code=500,
             detail="Model not found. Please train the model via the Face Registration page first."
         )
-    
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
-    try:
-        recognizer.read(str(config.TRAINED_MODEL_PATH))
-    except cv2.error as e:
-        print(f"!!! ERROR: OpenCV could not read the model file. It might be corrupt. Error: {e}")
+    problem = model_store.normalization_mismatch(recognizer)
+    if problem:
+        print(f"!!! ERROR: {problem} !!!")
         raise HTTPException(
             status_code=500,
-            detail="Failed to load the recognition model. It may be corrupt. Please retrain the model."
+            detail=f"{problem} Please retrain the model via the Face Registration page."
         )
     return recognizer
 
-def mark_attendance(db: Session, subject: str, image: np.ndarray):
+def recognition_threshold() -> float:
+    """The calibrated threshold of the served model version, else RECOGNITION_CONFIDENCE_THRESHOLD."""
+    if config.USE_CALIBRATED_THRESHOLD:
+        threshold = model_store.calibrated_threshold()
+        if threshold is not None:
+            return threshold
+    return config.RECOGNITION_CONFIDENCE_THRESHOLD
+
+# Cascade classifiers are cheap but not safe to share between threads,
+# so each worker thread keeps its own.
+_thread_local = threading.local()
+
+def get_face_detector():
+    import cv2
+
+    detector = getattr(_thread_local, "detector", None)
+    if detector is None:
+        detector = cv2.CascadeClassifier(str(config.HAAR_CASCADE_PATH))
+        if detector.empty():
+            raise HTTPException(status_code=500, detail="Face detector file is missing from the server.")
+        _thread_local.detector = detector
+    return detector
+
+def warm_up() -> dict:
+    """
+    Loads the detector and recognizer and runs one detection and one prediction on a
+    blank image, so the first real frame does not pay for initialization.
+    Returns the status of each model ("ready", or the reason it is unavailable).
+    """
+    import numpy as np
+
+    status = {}
+    blank = np.zeros((160, 160), dtype=np.uint8)
+    try:
+        get_face_detector().detectMultiScale(blank, 1.3, 5)
+        status["detector"] = "ready"
+    except HTTPException as e:
+        status["detector"] = e.detail
+    try:
+        get_recognizer().predict(normalize_face(blank))
+        status["recognizer"] = "ready"
+    except HTTPException as e:
+        status["recognizer"] = e.detail
+    return status
+
+def detect_and_predict(image: "np.ndarray", timings: metrics.StageTimings):
+    """
+    Detects faces and runs LBPH prediction on a BGR image. This is CPU-bound,
+    so async routes run it in a worker thread.
+    Returns a list of (box, roll_number) where roll_number is None for unknown faces.
+    """
+    import cv2
+
+    with timings.stage("model_load"):
+        recognizer = get_recognizer()
+        detector = get_face_detector()
+
+    with timings.stage("detect"):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = detector.detectMultiScale(gray, 1.3, 5)
+    metrics.FACES_DETECTED.inc(len(faces), endpoint=timings.endpoint, detector=timings.detector)
+
+    results = []
+    threshold = recognition_threshold()
+    with timings.stage("predict"):
+        for (x, y, w, h) in faces:
+            roll_number_pred, confidence = recognizer.predict(normalize_face(gray[y:y+h, x:x+w]))
+            roll_number = str(roll_number_pred) if confidence < threshold else None
+            results.append(([int(x), int(y), int(w), int(h)], roll_number))
+    recognized = sum(1 for _, roll_number in results if roll_number is not None)
+    metrics.FACES_RECOGNIZED.inc(recognized, endpoint=timings.endpoint, detector=timings.detector)
+    return results
+
+async def mark_attendance(db: AsyncSession, subject: str, image: "np.ndarray", timings: metrics.StageTimings = None):
     """Recognizes faces in an image and marks attendance with improved error handling."""
-    subject_obj = db.query(Subject).filter(Subject.subjectName == subject).first()
+    if timings is None:
+        timings = metrics.StageTimings("/attendance/mark", DETECTOR_BACKEND)
+
+    with timings.stage("db"):
+        subject_obj = (await db.execute(select(Subject).where(Subject.subjectName == subject))).scalars().first()
     if not subject_obj:
         raise HTTPException(status_code=404, detail=f"Subject '{subject}' not found.")
     subject_id = subject_obj.subjectID
@@ -42,41 +147,129 @@ def mark_attendance(db: Session, subject: str, image: np.ndarray):
         print("!!! ERROR: Haar Cascade file not found at:", config.HAAR_CASCADE_PATH)
         raise HTTPException(status_code=500, detail="Face detector file is missing from the server.")
 
-    recognizer = load_recognizer()
-    detector = cv2.CascadeClassifier(str(config.HAAR_CASCADE_PATH))
-    
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    faces = detector.detectMultiScale(gray, 1.3, 5)
+    # Detection and prediction would block the event loop, so run them in a worker thread
+    predictions = await run_in_threadpool(detect_and_predict, image, timings)
 
-    if len(faces) == 0:
+    if len(predictions) == 0:
+        timings.reject("no_faces")
         raise HTTPException(status_code=400, detail="No faces were detected in the image.")
 
+    # Unique roll numbers in detection order
+    recognized_rolls = list(dict.fromkeys(roll for _, roll in predictions if roll is not None))
+
     recognized_students = []
     today = date.today()
 
-    for (x, y, w, h) in faces:
-        roll_number_pred, confidence = recognizer.predict(gray[y:y+h, x:x+w])
-
-        if confidence < config.RECOGNITION_CONFIDENCE_THRESHOLD:
-            student = db.query(Student).filter(Student.rollNumber == str(roll_number_pred)).first()
-            if student:
-                existing_record = db.query(AttendanceRecord).filter(
-                    and_(
-                        AttendanceRecord.studentID == student.studentID,
-                        AttendanceRecord.subjectID == subject_id,
-                        func.date(AttendanceRecord.timestamp) == today
-                    )
-                ).first()
-
-                if not existing_record:
-                    attendance_record = AttendanceRecord(studentID=student.studentID, subjectID=subject_id)
-                    db.add(attendance_record)
-                    recognized_students.append({"rollNumber": student.rollNumber, "name": student.name, "status": "Attendance Marked"})
-                else:
-                    recognized_students.append({"rollNumber": student.rollNumber, "name": student.name, "status": "Already Marked Today"})
-    
-    if not recognized_students:
-        raise HTTPException(status_code=404, detail="No known students were recognized with sufficient confidence.")
-        
-    db.commit()
-    return recognized_students
\ No newline at end of file
+    with timings.stage("db"):
+        students_by_roll = {}
+        if recognized_rolls:
+            students = (await db.execute(select(Student).where(Student.rollNumber.in_(recognized_rolls)))).scalars().all()
+            students_by_roll = {student.rollNumber: student for student in students}
+
+        dialect_name = db.get_bind().dialect.name
+        newly_marked = []
+        for roll_number in recognized_rolls:
+            student = students_by_roll.get(roll_number)
+            if not student:
+                continue
+            # A concurrent request marking the same student inserts nothing here
+            inserted = await db.execute(rollup_service.insert_record_statement(dialect_name, student.studentID, subject_id, today))
+            if inserted.rowcount:
+                newly_marked.append(student.studentID)
+                recognized_students.append({"rollNumber": student.rollNumber, "name": student.name, "status": "Attendance Marked"})
+            else:
+                recognized_students.append({"rollNumber": student.rollNumber, "name": student.name, "status": "Already Marked Today"})
+
+        if not recognized_students:
+            timings.reject("no_match")
+            raise HTTPException(status_code=404, detail="No known students were recognized with sufficient confidence.")
+
+        # Keep the rollups in the same transaction as the new records
+        for statement in rollup_service.record_present_statements(dialect_name, subject_id, newly_marked, today):
+            await db.execute(statement)
+        await db.commit()
+    if newly_marked:
+        invalidate_class_counts(subject_obj.teacherID)
+        report_service.invalidate(subject_id, today)
+    return recognized_students
+
+async def get_class_attendance(db: AsyncSession, subject_id: int):
+    """
+    Per-student attendance for a subject, read from the attendance rollups:
+    days present per student, total class days and percentage, joined to student details.
+    The cost depends on class size, not on how many raw records have accumulated.
+    """
+    total_class_days = (
+        select(func.count())
+        .select_from(SubjectDailyAttendance)
+        .where(SubjectDailyAttendance.subjectID == subject_id)
+        .scalar_subquery()
+    )
+    rows = await db.execute(
+        select(Student, StudentSubjectAttendance.present_count, total_class_days.label("total_class_days"))
+        .join(StudentSubjectAttendance, StudentSubjectAttendance.studentID == Student.studentID)
+        .where(StudentSubjectAttendance.subjectID == subject_id)
+        .order_by(Student.name)
+    )
+
+    attendance_data = []
+    for student, present, total in rows.all():
+        percentage = round((present / total) * 100) if total else 0
+        attendance_data.append({"student": student, "days_present": present, "total_class_days": total, "percentage": percentage})
+    return attendance_data
+
+async def get_attendance_summary(db: AsyncSession, subject: str):
+    """
+    Attendance summary for a subject by name, built from the rollups: per-student
+    days present and percentage, plus the number of students present on each class day.
+    Returns None if the subject does not exist or has no attendance yet.
+    """
+    subject_obj = (await db.execute(select(Subject).where(Subject.subjectName == subject))).scalars().first()
+    if not subject_obj:
+        return None
+
+    daily = (await db.execute(
+        select(SubjectDailyAttendance.date, SubjectDailyAttendance.present_count)
+        .where(SubjectDailyAttendance.subjectID == subject_obj.subjectID)
+        .order_by(SubjectDailyAttendance.date)
+    )).all()
+    if not daily:
+        return None
+
+    students = await get_class_attendance(db, subject_obj.subjectID)
+    return {
+        "subject": subject_obj.subjectName,
+        "total_class_days": len(daily),
+        "total_students": len(students),
+        "students": [
+            {
+                "rollNumber": row["student"].rollNumber,
+                "name": row["student"].name,
+                "days_present": row["days_present"],
+                "percentage": row["percentage"],
+            }
+            for row in students
+        ],
+        "daily": [{"date": day.isoformat(), "present": present} for day, present in daily],
+    }
+
+async def get_student_counts_by_subject(db: AsyncSession, teacher_id: int, subject_ids):
+    """
+    Students with attendance per subject, counted from the rollups in one GROUP BY
+    query and cached per teacher until attendance for those subjects is written.
+    """
+    subject_ids = frozenset(subject_ids)
+    cached = class_counts_cache.get(teacher_id)
+    if cached is not None and cached[0] == subject_ids:
+        return cached[1]
+
+    counts = {}
+    if subject_ids:
+        rows = await db.execute(
+            select(StudentSubjectAttendance.subjectID, func.count())
+            .where(StudentSubjectAttendance.subjectID.in_(subject_ids))
+            .group_by(StudentSubjectAttendance.subjectID)
+        )
+        counts = dict(rows.all())
+    class_counts_cache.set(teacher_id, (subject_ids, counts))
+    return counts
@@ -1,13 +1,21 @@
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import event, inspect, select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status, Cookie
 from fastapi.security import OAuth2PasswordBearer
 
-from ..models.attendance import User
-from ..database.connection import get_db
+from .. import config
+from ..models.attendance import User, Student, Teacher, Admin, UserRole
+from ..database.connection import get_db, get_async_db
+from ..utils.cache import TTLCache
 
 # --- Configuration ---
 SECRET_KEY = "a_very_secret_key_change_this_in_production" # Use environment variables for this
@@ -15,11 +23,30 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 # --- Password Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max rounds equal to the configured cost flag any other cost for re-hashing
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__default_rounds=config.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=config.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=config.BCRYPT_ROUNDS,
+)
+
+# bcrypt is deliberately slow; async routes run it here so the event loop keeps serving
+# other requests. The pool size bounds how many hashes run at once on this worker.
+_password_executor = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 # --- JWT Token Handling ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+def normalize_email(email: str) -> str:
+    """The form emails are stored and looked up in: trimmed and lowercased."""
+    return email.strip().lower()
+
+def is_strong_password(password: str) -> bool:
+    """At least 8 characters with a lowercase letter, an uppercase letter, a digit and a symbol."""
+    return (len(password) >= 8 and re.search("[a-z]", password) is not None and re.search("[A-Z]", password) is not None
+            and re.search("[0-9]", password) is not None and re.search("[!@#$%^&*]", password) is not None)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against a hashed one."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -28,6 +55,19 @@ def get_password_hash(password: str) -> str:
     """Hashes a plain password."""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password in the hashing pool. Returns (valid, new_hash), where new_hash
+    is set when the stored hash uses a different cost and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hashes a plain password in the hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, pwd_context.hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Creates a JWT access token."""
     to_encode = data.copy()
@@ -39,6 +79,111 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_user_token(user: User) -> str:
+    """Creates the login token for a user, with identity claims if JWT_IDENTITY_CLAIMS is on."""
+    data = {"sub": user.email}
+    if config.JWT_IDENTITY_CLAIMS:
+        data.update({"uid": user.userID, "role": UserRole(user.role).value, "name": user.name})
+    return create_access_token(data=data)
+
+
+# --- Authenticated identity ---
+# Cookie-authenticated routes only need who the user is and their role, so the
+# dependencies below return a small AuthenticatedUser instead of an ORM object.
+# It is resolved from signed token claims when present, otherwise from a
+# per-worker cache keyed by token subject (email) that falls back to the database.
+
+_ROLE_MODELS = {UserRole.student: Student, UserRole.teacher: Teacher, UserRole.admin: Admin}
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    userID: int
+    email: str
+    name: str
+    role: UserRole
+
+    async def load(self, db: AsyncSession) -> Optional[User]:
+        """Loads the full ORM object (e.g. Teacher) for endpoints that need it."""
+        return await db.get(_ROLE_MODELS.get(self.role, User), self.userID)
+
+user_cache = TTLCache(ttl_seconds=config.AUTH_USER_CACHE_SECONDS)
+
+def invalidate_user(email: str):
+    user_cache.invalidate(email)
+
+def _identity_from_claims(email: str, payload: dict) -> Optional[AuthenticatedUser]:
+    if "uid" not in payload or "role" not in payload:
+        return None
+    try:
+        return AuthenticatedUser(userID=int(payload["uid"]), email=email, name=payload.get("name", ""), role=UserRole(payload["role"]))
+    except (TypeError, ValueError):
+        return None
+
+async def _resolve_identity(token: str, db: AsyncSession) -> Optional[AuthenticatedUser]:
+    """Decodes a token and returns the identity it belongs to, or None."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    email = payload.get("sub")
+    if email is None:
+        return None
+
+    identity = _identity_from_claims(email, payload)
+    if identity is not None:
+        return identity
+
+    identity = user_cache.get(email)
+    if identity is None:
+        row = (await db.execute(
+            select(User.userID, User.email, User.name, User.role).where(User.email == email)
+        )).first()
+        if row is None:
+            return None
+        identity = AuthenticatedUser(userID=row.userID, email=row.email, name=row.name, role=UserRole(row.role))
+        user_cache.set(email, identity)
+    return identity
+
+# Cached identities are dropped once a change to the user is committed, so a
+# concurrent request cannot re-cache the old row before the commit lands.
+_PENDING_INVALIDATIONS = "auth_pending_user_invalidations"
+
+def _queue_user_invalidation(mapper, connection, target):
+    emails = {target.email}
+    emails.update(inspect(target).attrs.email.history.deleted or ())
+    session = inspect(target).session
+    if session is None:
+        for email in emails:
+            invalidate_user(email)
+    else:
+        session.info.setdefault(_PENDING_INVALIDATIONS, set()).update(emails)
+
+event.listen(User, "after_update", _queue_user_invalidation, propagate=True)
+event.listen(User, "after_delete", _queue_user_invalidation, propagate=True)
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_bulk_user_change(orm_execute_state):
+    # query(User).update()/delete() skip the mapper events; forget every cached user instead
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.isa(inspect(User)):
+            orm_execute_state.session.info[_PENDING_INVALIDATIONS] = None
+
+@event.listens_for(Session, "after_commit")
+def _apply_user_invalidations(session):
+    if _PENDING_INVALIDATIONS not in session.info:
+        return
+    emails = session.info.pop(_PENDING_INVALIDATIONS)
+    if emails is None:
+        user_cache.clear()
+    else:
+        for email in emails:
+            invalidate_user(email)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_invalidations(session):
+    session.info.pop(_PENDING_INVALIDATIONS, None)
+
 # This function remains for potential future use with header-based auth
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """Dependency to get the current user from a JWT token in a header."""
@@ -60,11 +205,17 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise credentials_exception
     return user
 
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    """Loads a user by email (normalized) without blocking the event loop."""
+    result = await db.execute(select(User).where(User.email == normalize_email(email)))
+    return result.scalars().first()
+
 # --- NEW FUNCTION: For protected routes using cookies ---
-def get_current_user_from_cookie(access_token: Optional[str] = Cookie(None), db: Session = Depends(get_db)) -> User:
+async def get_current_user_from_cookie(access_token: Optional[str] = Cookie(None), db: AsyncSession = Depends(get_async_db)) -> AuthenticatedUser:
     """
     Dependency to get the current user from the session cookie.
     Raises an exception if the token is invalid or missing, making it suitable for protected routes.
+    Returns an AuthenticatedUser; call its load() if the ORM object is needed.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -75,34 +226,25 @@ def get_current_user_from_cookie(access_token: Optional[str] = Cookie(None), db:
         raise credentials_exception
     try:
         token = access_token.split(" ")[1]
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except (JWTError, IndexError):
+    except IndexError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
+
+    user = await _resolve_identity(token, db)
     if user is None:
         raise credentials_exception
     return user
 
-def try_get_current_user(access_token: Optional[str] = Cookie(None), db: Session = Depends(get_db)) -> Optional[User]:
+async def try_get_current_user(access_token: Optional[str] = Cookie(None), db: AsyncSession = Depends(get_async_db)) -> Optional[AuthenticatedUser]:
     """
     Tries to get the current user from the session cookie.
-    Returns the user object if successful, otherwise returns None.
+    Returns the user identity if successful, otherwise returns None.
     Does not raise an exception for invalid or missing tokens.
     """
     if access_token is None:
         return None
     try:
         token = access_token.split(" ")[1]
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-    except (JWTError, IndexError):
+    except IndexError:
         return None
-    
-    user = db.query(User).filter(User.email == email).first()
-    return user
\ No newline at end of file
+
+    return await _resolve_identity(token, db)
@@ -1,39 +1,59 @@
-import dlib
-import numpy as np
-import pandas as pd
 from sqlalchemy.orm import Session
 from datetime import date
-from sqlalchemy import func, and_
-import cv2
+from typing import TYPE_CHECKING
 import shutil
 import os
 
 from .. import config
-from ..models.attendance import Student, Subject, AttendanceRecord
-
-# --- Load Dlib models once when the service starts ---
-try:
-    detector = dlib.get_frontal_face_detector()
-    predictor = dlib.shape_predictor(str(config.SHAPE_PREDICTOR_PATH))
-    face_reco_model = dlib.face_recognition_model_v1(str(config.FACE_REC_MODEL_PATH))
-except Exception as e:
-    print(f"!!! DLIB MODEL ERROR: {e}. Please ensure model files are in data/dlib_models/ !!!")
-    detector = predictor = face_reco_model = None
-
-# --- Load known face features from CSV ---
-try:
-    features_df = pd.read_csv(config.FACE_FEATURES_CSV_PATH)
-    known_face_features = np.array(features_df.iloc[:, 1:])
-    known_face_roll_numbers = list(features_df.iloc[:, 0])
-except FileNotFoundError:
-    print(f"!!! WARNING: {config.FACE_FEATURES_CSV_PATH} not found. Recognition will not work. !!!")
-    known_face_features = []
-    known_face_roll_numbers = []
+from ..models.attendance import Student, Subject
+from . import attendance_service, report_service, rollup_service
+
+# dlib, pandas, cv2 and numpy are imported on first use so that importing the app stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+# --- Dlib models and known face features, loaded once on first use ---
+_models = None
+_known_faces = None
+
+def _get_models():
+    """(detector, predictor, face_reco_model), or Nones if the models could not be loaded."""
+    global _models
+    if _models is None:
+        try:
+            import dlib
+            _models = (
+                dlib.get_frontal_face_detector(),
+                dlib.shape_predictor(str(config.SHAPE_PREDICTOR_PATH)),
+                dlib.face_recognition_model_v1(str(config.FACE_REC_MODEL_PATH)),
+            )
+        except Exception as e:
+            print(f"!!! DLIB MODEL ERROR: {e}. Please ensure model files are in data/dlib_models/ !!!")
+            _models = (None, None, None)
+    return _models
+
+def _get_known_faces():
+    """(known_face_features, known_face_roll_numbers) from the features CSV."""
+    global _known_faces
+    if _known_faces is None:
+        import numpy as np
+        import pandas as pd
+        try:
+            features_df = pd.read_csv(config.FACE_FEATURES_CSV_PATH)
+            _known_faces = (np.array(features_df.iloc[:, 1:]), list(features_df.iloc[:, 0]))
+        except FileNotFoundError:
+            print(f"!!! WARNING: {config.FACE_FEATURES_CSV_PATH} not found. Recognition will not work. !!!")
+            _known_faces = ([], [])
+    return _known_faces
 
 def return_euclidean_distance(feature_1, feature_2):
+    import numpy as np
     return np.linalg.norm(feature_1 - feature_2)
 
-def register_face_dlib(roll_number: str, name: str, image: np.ndarray):
+def register_face_dlib(roll_number: str, name: str, image: "np.ndarray"):
+    import cv2
+
+    detector = _get_models()[0]
     if not detector:
         raise Exception("Dlib detector not loaded.")
 
@@ -71,6 +91,7 @@ def register_face_dlib(roll_number: str, name: str, image: np.ndarray):
     return {"status": "success", "message": f"Image {new_image_num} saved successfully!", "image_count": new_image_num}
 
 def clear_all_registered_faces():
+    global _known_faces
     faces_dir = config.DATA_DIR / "data_faces_from_camera"
     if os.path.exists(faces_dir):
         shutil.rmtree(faces_dir)
@@ -79,9 +100,16 @@ def clear_all_registered_faces():
         os.remove(config.FACE_FEATURES_CSV_PATH)
 
     os.makedirs(faces_dir, exist_ok=True)
+    _known_faces = None
     return {"message": "All registered faces and features have been cleared."}
 
 def extract_features_to_csv():
+    global _known_faces
+    import cv2
+    import numpy as np
+    import pandas as pd
+
+    detector, predictor, face_reco_model = _get_models()
     if not all([detector, predictor, face_reco_model]):
         raise Exception("Dlib models not loaded.")
 
@@ -115,10 +143,14 @@ def extract_features_to_csv():
 
     df = pd.DataFrame(features_list)
     df.to_csv(config.FACE_FEATURES_CSV_PATH, header=False, index=False)
+    _known_faces = None
     
     return {"message": f"Successfully extracted and saved features for {len(features_list)} students."}
 
-def mark_attendance_dlib(db: Session, subject_name: str, image: np.ndarray):
+def mark_attendance_dlib(db: Session, subject_name: str, image: "np.ndarray"):
+    import numpy as np
+
+    detector, predictor, face_reco_model = _get_models()
     if not all([detector, predictor, face_reco_model]):
         raise Exception("Dlib models are not loaded. Cannot perform recognition.")
 
@@ -131,7 +163,10 @@ def mark_attendance_dlib(db: Session, subject_name: str, image: np.ndarray):
         return {"error": "No faces detected in the image."}
 
     recognized_students = []
+    newly_marked = []
     today = date.today()
+    dialect_name = db.get_bind().dialect.name
+    known_face_features, known_face_roll_numbers = _get_known_faces()
 
     for face in faces:
         shape = predictor(image, face)
@@ -144,25 +179,22 @@ def mark_attendance_dlib(db: Session, subject_name: str, image: np.ndarray):
         
         if distances:
             min_dist_idx = np.argmin(distances)
-            if distances[min_dist_idx] < 0.6:
+            if distances[min_dist_idx] < config.DLIB_DISTANCE_THRESHOLD:
                 recognized_roll = known_face_roll_numbers[min_dist_idx]
                 
                 student = db.query(Student).filter(Student.rollNumber == str(recognized_roll)).first()
                 if student:
-                    existing_record = db.query(AttendanceRecord).filter(
-                        and_(
-                            AttendanceRecord.studentID == student.studentID,
-                            AttendanceRecord.subjectID == subject_obj.subjectID,
-                            func.date(AttendanceRecord.timestamp) == today
-                        )
-                    ).first()
-
-                    if not existing_record:
-                        new_record = AttendanceRecord(studentID=student.studentID, subjectID=subject_obj.subjectID)
-                        db.add(new_record)
+                    inserted = db.execute(rollup_service.insert_record_statement(dialect_name, student.studentID, subject_obj.subjectID, today))
+                    if inserted.rowcount:
+                        newly_marked.append(student.studentID)
                         recognized_students.append({"name": student.name, "rollNumber": student.rollNumber, "status": "Attendance Marked"})
                     else:
                         recognized_students.append({"name": student.name, "rollNumber": student.rollNumber, "status": "Already Marked Today"})
 
+    for statement in rollup_service.record_present_statements(dialect_name, subject_obj.subjectID, newly_marked, today):
+        db.execute(statement)
     db.commit()
+    if newly_marked:
+        attendance_service.invalidate_class_counts(subject_obj.teacherID)
+        report_service.invalidate(subject_obj.subjectID, today)
     return recognized_students
\ No newline at end of file
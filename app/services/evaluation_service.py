@@ -0,0 +1,167 @@
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .. import config
+from . import face_rec_service, model_store
+
+# --- Recognition model evaluation ---
+# The face samples in TRAINING_IMAGE_DIR are split per student: a held-out share of each
+# enrolled student's samples is kept out of training, and a few students are left out
+# entirely to act as strangers. A model is trained on the rest through train_model(),
+# every held-out face is predicted once (timed), and each candidate threshold is scored:
+#   accuracy          held-out faces of enrolled students accepted as the right student
+#   false_accept_rate faces accepted as the wrong student (enrolled or stranger) / all faces
+#   false_reject_rate held-out faces of enrolled students rejected
+# The recommended threshold is the most accurate one within MAX_FALSE_ACCEPT_RATE.
+
+DEFAULT_THRESHOLDS = tuple(range(20, 155, 5))
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def split_samples(image_dir, holdout: float = 0.2, strangers: int = 1, seed: int = 0):
+    """
+    (train, held_out, stranger) lists of (folder, filename, label). Students with a single
+    sample are only trained on. At least two students always stay enrolled.
+    """
+    students = {}
+    for folder in sorted(os.listdir(image_dir)):
+        if not os.path.isdir(os.path.join(image_dir, folder)):
+            continue
+        try:
+            label = int(folder.split("_")[0])
+        except (ValueError, IndexError):
+            continue
+        files = sorted(f for f in os.listdir(os.path.join(image_dir, folder)) if f.endswith(IMAGE_EXTENSIONS))
+        students.setdefault(label, []).extend((folder, f, label) for f in files)
+
+    rng = random.Random(seed)
+    labels = sorted(students)
+    stranger_labels = set(rng.sample(labels, max(0, min(strangers, len(labels) - 2))))
+    train, held_out, stranger = [], [], []
+    for label in labels:
+        samples = students[label]
+        if label in stranger_labels:
+            stranger.extend(samples)
+            continue
+        rng.shuffle(samples)
+        count = max(1, round(len(samples) * holdout)) if len(samples) > 1 else 0
+        held_out.extend(samples[:count])
+        train.extend(samples[count:])
+    return train, held_out, stranger
+
+
+def _score(known: list, strangers: list, threshold: float) -> dict:
+    accepted_right = sum(1 for label, predicted, distance in known if distance < threshold and predicted == label)
+    accepted_wrong = sum(1 for label, predicted, distance in known if distance < threshold and predicted != label)
+    strangers_accepted = sum(1 for _, _, distance in strangers if distance < threshold)
+    return {
+        "threshold": threshold,
+        "accuracy": accepted_right / len(known) if known else 0.0,
+        "false_accept_rate": (accepted_wrong + strangers_accepted) / ((len(known) + len(strangers)) or 1),
+        "false_reject_rate": sum(1 for _, _, distance in known if distance >= threshold) / len(known) if known else 0.0,
+    }
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def evaluate(
+    image_dir=None,
+    holdout: float = 0.2,
+    strangers: int = 1,
+    seed: int = 0,
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+    max_false_accept_rate: Optional[float] = None,
+) -> dict:
+    """Trains on a per-student split of image_dir and reports accuracy, FAR and latency per threshold."""
+    image_dir = Path(image_dir or config.TRAINING_IMAGE_DIR)
+    max_false_accept_rate = config.MAX_FALSE_ACCEPT_RATE if max_false_accept_rate is None else max_false_accept_rate
+    train, held_out, stranger = split_samples(image_dir, holdout, strangers, seed)
+    if not held_out:
+        raise ValueError("Not enough face samples to hold any out for evaluation.")
+
+    with tempfile.TemporaryDirectory(prefix="evaluate_model_") as work_dir:
+        train_dir, model_dir = Path(work_dir) / "train", Path(work_dir) / "model"
+        for folder, filename, _ in train:
+            (train_dir / folder).mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(image_dir / folder / filename, train_dir / folder / filename)
+        started = time.perf_counter()
+        face_rec_service.train_model(image_dir=train_dir, model_dir=model_dir, gate=False)
+        train_seconds = time.perf_counter() - started
+
+        model = model_store.load_model(model_store.current_version(model_dir), model_dir=model_dir)
+        latencies, known, strangers_seen = [], [], []
+        for samples, results in ((held_out, known), (stranger, strangers_seen)):
+            for folder, filename, label in samples:
+                face = face_rec_service.load_face_image(image_dir / folder / filename)
+                started = time.perf_counter()
+                predicted, distance = model.predict(face)
+                latencies.append(time.perf_counter() - started)
+                results.append((label, predicted, distance))
+
+    rows = [_score(known, strangers_seen, threshold) for threshold in thresholds]
+    within_target = [row for row in rows if row["false_accept_rate"] <= max_false_accept_rate]
+    if within_target:
+        # Most accurate; on a tie the stricter (lower) threshold
+        recommended = max(within_target, key=lambda row: (row["accuracy"], -row["threshold"]))
+    else:
+        recommended = min(rows, key=lambda row: (row["false_accept_rate"], -row["accuracy"]))
+    latencies.sort()
+    return {
+        "evaluated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "holdout": holdout,
+        "seed": seed,
+        "train_samples": len(train),
+        "held_out_samples": len(held_out),
+        "stranger_samples": len(stranger),
+        "students": len({label for _, _, label in train + held_out}),
+        "strangers": len({label for _, _, label in stranger}),
+        "train_seconds": round(train_seconds, 3),
+        "latency_ms": {
+            "mean": round(1000 * sum(latencies) / len(latencies), 3),
+            "p50": round(1000 * _percentile(latencies, 0.5), 3),
+            "p95": round(1000 * _percentile(latencies, 0.95), 3),
+        },
+        "max_false_accept_rate": max_false_accept_rate,
+        "meets_target": bool(within_target),
+        "recommended": recommended,
+        "thresholds": rows,
+    }
+
+
+def calibration(report: dict) -> dict:
+    """What is stored with a model version: the recommended threshold and how it scored."""
+    return {
+        "threshold": report["recommended"]["threshold"],
+        "accuracy": report["recommended"]["accuracy"],
+        "false_accept_rate": report["recommended"]["false_accept_rate"],
+        "false_reject_rate": report["recommended"]["false_reject_rate"],
+        "meets_target": report["meets_target"],
+        "latency_ms": report["latency_ms"],
+        "evaluated_at": report["evaluated_at"],
+        "train_samples": report["train_samples"],
+        "held_out_samples": report["held_out_samples"],
+        "stranger_samples": report["stranger_samples"],
+    }
+
+
+def find_regression(report: dict, previous: Optional[dict]) -> Optional[str]:
+    """Why the evaluated model is worse than the last calibrated one, or None."""
+    if not previous:
+        return None
+    accuracy, previous_accuracy = report["recommended"]["accuracy"], previous.get("accuracy", 0.0)
+    if accuracy < previous_accuracy - config.MODEL_REGRESSION_TOLERANCE:
+        return f"held-out accuracy fell from {previous_accuracy:.1%} to {accuracy:.1%}."
+    if previous.get("meets_target") and not report["meets_target"]:
+        return (f"no threshold keeps the false-accept rate within {report['max_false_accept_rate']:.1%} "
+                f"(best: {report['recommended']['false_accept_rate']:.1%}).")
+    return None
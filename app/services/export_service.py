@@ -0,0 +1,111 @@
+import csv
+import datetime
+import io
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from ..database.connection import SessionLocal
+from ..models.attendance import AttendanceRecord, Student, Subject, User
+from ..utils import xlsx_writer
+
+# --- Attendance export ---
+# Rows are joined with student and subject names in SQL and streamed with a
+# server-side cursor (yield_per), so memory stays flat whatever the export size.
+# Each export uses its own session, which lives as long as the response body.
+
+EXPORT_COLUMNS = ("Record ID", "Date", "Time", "Roll Number", "Student", "Class", "Subject", "Present")
+EXPORT_BATCH_SIZE = 1000
+
+# Core tables: joining the Student mapper would pull in its parent user table implicitly
+record_table = AttendanceRecord.__table__
+student_table = Student.__table__
+user_table = User.__table__
+subject_table = Subject.__table__
+
+
+def build_export_query(
+    subject_id: Optional[int] = None,
+    roll_number: Optional[str] = None,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    teacher_id: Optional[int] = None,
+):
+    """Attendance rows matching the filters, oldest first. teacher_id restricts to that teacher's subjects."""
+    stmt = (
+        select(
+            record_table.c.recordID, record_table.c.timestamp, student_table.c.rollNumber,
+            user_table.c.name, student_table.c["class"], subject_table.c.subjectName, record_table.c.isPresent,
+        )
+        .select_from(record_table)
+        .join(student_table, student_table.c.studentID == record_table.c.studentID)
+        .join(user_table, user_table.c.userID == record_table.c.studentID)
+        .join(subject_table, subject_table.c.subjectID == record_table.c.subjectID)
+        .order_by(record_table.c.recordID)
+    )
+    if subject_id is not None:
+        stmt = stmt.where(record_table.c.subjectID == subject_id)
+    if roll_number:
+        stmt = stmt.where(student_table.c.rollNumber == roll_number)
+    if start:
+        stmt = stmt.where(record_table.c.date >= start)
+    if end:
+        stmt = stmt.where(record_table.c.date <= end)
+    if teacher_id is not None:
+        stmt = stmt.where(subject_table.c.teacherID == teacher_id)
+    return stmt
+
+
+def iter_export_rows(stmt, session_factory=SessionLocal) -> Iterator[tuple]:
+    """Streams the rows of an export query in EXPORT_BATCH_SIZE batches from a server-side cursor."""
+    db = session_factory()
+    try:
+        result = db.execute(stmt, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+        for record_id, timestamp, roll_number, name, student_class, subject_name, is_present in result:
+            yield (
+                record_id,
+                timestamp.strftime("%Y-%m-%d") if timestamp else "",
+                timestamp.strftime("%H:%M:%S") if timestamp else "",
+                roll_number, name, student_class or "", subject_name,
+                "Yes" if str(is_present).lower() == "true" else "No",
+            )
+    finally:
+        db.close()
+
+
+def stream_csv(rows: Iterator[tuple]) -> Iterator[bytes]:
+    """Yields the CSV (with header) in chunks of EXPORT_BATCH_SIZE rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_xlsx(rows: Iterator[tuple]) -> Iterator[bytes]:
+    return xlsx_writer.stream_xlsx(EXPORT_COLUMNS, rows, sheet_name="Attendance", rows_per_chunk=EXPORT_BATCH_SIZE)
+
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "xlsx": (stream_xlsx, xlsx_writer.CONTENT_TYPE),
+}
+
+
+def export_filename(fmt: str, subject_id=None, roll_number=None, start=None, end=None) -> str:
+    parts = ["attendance"]
+    if subject_id is not None:
+        parts.append(f"subject{subject_id}")
+    if roll_number:
+        parts.append("".join(c for c in roll_number if c.isalnum() or c in "-_"))
+    if start or end:
+        parts.append(f"{start or ''}_{end or ''}")
+    return "-".join(parts) + f".{fmt}"
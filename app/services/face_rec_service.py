@@ -1,13 +1,20 @@
-import cv2
 import os
-import numpy as np
-from PIL import Image
 from sqlalchemy.orm import Session
 from fastapi import UploadFile, HTTPException
-from typing import List
+from typing import TYPE_CHECKING, List
 
 from .. import config
 from ..models.attendance import Student
+from ..utils import metrics
+from ..utils.image_utils import normalize_face
+from . import model_store
+
+# cv2, numpy and PIL are imported on first use so that importing the app stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+# Label used for metrics recorded by this (OpenCV) pipeline
+DETECTOR_BACKEND = "haar"
 
 def add_student_db(db: Session, roll_number: str, name: str):
     """Checks if a student exists before saving images."""
@@ -20,6 +27,9 @@ def add_student_db(db: Session, roll_number: str, name: str):
 
 async def save_face_images(roll_number: str, name: str, images: List[UploadFile]):
     """Saves face images from uploaded files for a student."""
+    import cv2
+    import numpy as np
+
     student_dir = config.TRAINING_IMAGE_DIR / f"{roll_number}_{name}"
     os.makedirs(student_dir, exist_ok=True)
 
@@ -38,26 +48,61 @@ async def save_face_images(roll_number: str, name: str, images: List[UploadFile]
 
         for (x, y, w, h) in faces:
             sample_num += 1
-            cv2.imwrite(str(student_dir / f"img_face_{sample_num}.jpg"), gray[y:y+h, x:x+w])
+            cv2.imwrite(str(student_dir / f"img_face_{sample_num}.jpg"), normalize_face(gray[y:y+h, x:x+w], equalize=False))
     
     if sample_num == len(os.listdir(student_dir)): # No new faces were added
         raise HTTPException(status_code=400, detail="No faces could be detected in the uploaded images.")
         
     return {"message": f"Successfully saved new face samples for {name}. Total samples: {sample_num}."}
 
-def train_model():
-    """Trains the OpenCV LBPH face recognition model."""
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
+def train_model(image_dir=None, model_dir=None, gate=None, calibration=None):
+    """
+    Trains the LBPH face recognition model from image_dir (default: TRAINING_IMAGE_DIR)
+    and publishes it to model_dir (default: the shared model store the app serves from).
+    With the regression gate (default: TRAINING_REGRESSION_GATE) the training data is
+    evaluated first, a model whose held-out accuracy regressed is not published, and the
+    evaluation is stored as the model's calibration. Without the gate, `calibration`
+    (see evaluation_service) is stored if given.
+    """
+    import numpy as np
+    from ..utils import lbph
+    from . import evaluation_service
+
+    image_dir = image_dir or config.TRAINING_IMAGE_DIR
+    gate = config.TRAINING_REGRESSION_GATE if gate is None else gate
+    timings = metrics.StageTimings("/face-recognition/train", DETECTOR_BACKEND)
     
-    faces, ids = get_images_and_labels(config.TRAINING_IMAGE_DIR)
+    with timings.stage("load_images"):
+        faces, ids = get_images_and_labels(image_dir)
     if not faces or len(set(ids)) < 2:
          raise HTTPException(status_code=400, detail="Training requires face samples from at least two different students.")
+
+    if gate:
+        with timings.stage("evaluate"):
+            evaluation = evaluation_service.evaluate(image_dir)
+        problem = evaluation_service.find_regression(evaluation, model_store.load_calibration(model_dir))
+        if problem:
+            raise HTTPException(status_code=409, detail=f"The new model was not published: {problem}")
+        calibration = evaluation_service.calibration(evaluation)
     
-    recognizer.train(faces, np.array(ids))
-    recognizer.save(str(config.TRAINED_MODEL_PATH))
+    with timings.stage("train"):
+        histograms, totals, scale = lbph.training_arrays(faces)
+        model_store.save_model(histograms, totals, np.array(ids, dtype=np.int64), model_dir=model_dir, info={
+            "histogram_scale": scale,
+            "face_size": config.FACE_SIZE,
+            "equalize_histogram": config.FACE_EQUALIZE_HISTOGRAM,
+        }, calibration=calibration)
+    timings.observe()
 
     return {"message": f"Model trained successfully for {len(set(ids))} users."}
 
+def load_face_image(path) -> "np.ndarray":
+    """A stored face sample as a normalized grayscale array, ready for LBPH."""
+    import numpy as np
+    from PIL import Image
+
+    return normalize_face(np.array(Image.open(path).convert("L"), "uint8"))
+
 def get_images_and_labels(path):
     """Gets images and roll_number from the directory name as the label."""
     image_paths = [os.path.join(path, f) for f in os.listdir(path) if os.path.isdir(os.path.join(path, f))]
@@ -71,16 +116,16 @@ def get_images_and_labels(path):
         
         for file in os.listdir(image_path):
             if file.endswith(('.png', '.jpg', '.jpeg')):
-                full_path = os.path.join(image_path, file)
-                pil_image = Image.open(full_path).convert("L")
-                image_np = np.array(pil_image, "uint8")
-                faces.append(image_np)
+                faces.append(load_face_image(os.path.join(image_path, file)))
                 ids.append(roll_number)
     return faces, ids
 # ... (imports) ...
 
 async def save_face_images(roll_number: str, name: str, images: List[UploadFile]):
     """Saves face images from uploaded files for a student."""
+    import cv2
+    import numpy as np
+
     student_dir = config.TRAINING_IMAGE_DIR / f"{roll_number}_{name}"
     os.makedirs(student_dir, exist_ok=True)
     
@@ -92,30 +137,40 @@ async def save_face_images(roll_number: str, name: str, images: List[UploadFile]
     detector = cv2.CascadeClassifier(str(config.HAAR_CASCADE_PATH))
     sample_num = len(os.listdir(student_dir))
     faces_detected_count = 0
+    timings = metrics.StageTimings("/face-recognition/register-faces", DETECTOR_BACKEND)
 
     for i, image_file in enumerate(images):
-        contents = await image_file.read()
+        with timings.stage("upload"):
+            contents = await image_file.read()
         
         # --- DEBUG: Save the original file ---
         with open(debug_dir / f"original_{roll_number}_{i}.jpg", "wb") as f:
             f.write(contents)
         # --- END DEBUG ---
 
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if img is None: continue
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        faces = detector.detectMultiScale(gray, 1.3, 5)
+        with timings.stage("decode"):
+            nparr = np.frombuffer(contents, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if img is None:
+            timings.reject("undecodable")
+            continue
+
+        with timings.stage("detect"):
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            faces = detector.detectMultiScale(gray, 1.3, 5)
         
         if not np.any(faces):
             print(f"DEBUG: No faces found in image {i} for roll number {roll_number}.") # Debug print
+            timings.reject("no_faces")
             continue
 
         faces_detected_count += len(faces)
-        for (x, y, w, h) in faces:
-            sample_num += 1
-            cv2.imwrite(str(student_dir / f"img_face_{sample_num}.jpg"), gray[y:y+h, x:x+w])
+        metrics.FACES_DETECTED.inc(len(faces), endpoint=timings.endpoint, detector=timings.detector)
+        with timings.stage("save"):
+            for (x, y, w, h) in faces:
+                sample_num += 1
+                cv2.imwrite(str(student_dir / f"img_face_{sample_num}.jpg"), normalize_face(gray[y:y+h, x:x+w], equalize=False))
+    timings.observe()
     
     if faces_detected_count == 0:
         raise HTTPException(status_code=400, detail="No faces could be detected in any of the uploaded images. Please use clearer, well-lit photos.")
@@ -0,0 +1,228 @@
+import csv
+import io
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import IO, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from .. import config
+from ..database.connection import SessionLocal
+from ..models.attendance import Student, Teacher, User, UserRole
+from ..utils.password_hashing import hash_passwords
+from . import stats_service, user_directory_service
+from .auth_service import is_strong_password, normalize_email
+
+# --- Bulk user import ---
+# Reads a CSV row by row (never the whole file), validates each row and imports
+# valid rows in batches: passwords are hashed in a process pool, then each batch is
+# written with a batched INSERT into `user` and into `student`/`teacher` (executemany,
+# which the MySQL driver sends as multi-row INSERT statements), in its own transaction.
+# Every rejected row is reported with its line number.
+
+REQUIRED_COLUMNS = ("role", "name", "email", "password")
+OPTIONAL_COLUMNS = ("rollNumber", "class")
+IMPORT_ROLES = {UserRole.student.value: UserRole.student, UserRole.teacher.value: UserRole.teacher}
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+$")
+
+user_table = User.__table__
+student_table = Student.__table__
+teacher_table = Teacher.__table__
+
+_hash_pool = None
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    """One pool per process, created on first import. Spawned so it is safe from threaded servers."""
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=max(1, config.IMPORT_HASH_PROCESSES),
+                                         mp_context=multiprocessing.get_context("spawn"))
+    return _hash_pool
+
+
+@dataclass
+class ImportReport:
+    dry_run: bool = False
+    rows: int = 0
+    created: int = 0
+    students: int = 0
+    teachers: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line: int, email: str, message: str):
+        self.errors.append({"line": line, "email": email, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "dry_run": self.dry_run, "rows": self.rows, "created": self.created,
+            "students": self.students, "teachers": self.teachers,
+            "failed": len(self.errors), "errors": self.errors,
+        }
+
+    def write_errors_csv(self, f: IO[str]):
+        writer = csv.DictWriter(f, fieldnames=["line", "email", "error"])
+        writer.writeheader()
+        writer.writerows(self.errors)
+
+
+def _clean(row: dict, column: str) -> str:
+    return (row.get(column) or "").strip()
+
+
+def _validate_row(line: int, row: dict, seen_emails: set, seen_rolls: set, report: ImportReport) -> Optional[dict]:
+    """Checks one row on its own and against earlier rows of the file."""
+    email = normalize_email(row.get("email") or "")
+    role = IMPORT_ROLES.get(_clean(row, "role").lower())
+    name = _clean(row, "name")
+    password = row.get("password") or ""
+    roll_number = _clean(row, "rollNumber")
+
+    problems = []
+    if role is None:
+        problems.append("role must be 'student' or 'teacher'")
+    if not name:
+        problems.append("name is required")
+    if not EMAIL_PATTERN.match(email):
+        problems.append("email is not valid")
+    elif email in seen_emails:
+        problems.append("email appears earlier in the file")
+    if not is_strong_password(password):
+        problems.append("password does not meet the complexity requirements")
+    if role == UserRole.student:
+        if not roll_number:
+            problems.append("rollNumber is required for students")
+        elif roll_number in seen_rolls:
+            problems.append("rollNumber appears earlier in the file")
+
+    if problems:
+        report.add_error(line, email, "; ".join(problems))
+        return None
+    seen_emails.add(email)
+    if role == UserRole.student:
+        seen_rolls.add(roll_number)
+    return {
+        "line": line, "role": role, "name": name, "email": email, "password": password,
+        "rollNumber": roll_number if role == UserRole.student else None,
+        "class": _clean(row, "class") or None,
+    }
+
+
+def _hash_batch(passwords: list) -> list:
+    """Hashes the passwords of a batch across the process pool, each with its own salt."""
+    workers = max(1, config.IMPORT_HASH_PROCESSES)
+    chunk = max(1, -(-len(passwords) // workers))
+    chunks = [passwords[i:i + chunk] for i in range(0, len(passwords), chunk)]
+    hashed = []
+    for result in _get_hash_pool().map(hash_passwords, chunks, [config.IMPORT_BCRYPT_ROUNDS] * len(chunks)):
+        hashed.extend(result)
+    return hashed
+
+
+def _import_batch(db: Session, batch: list, report: ImportReport):
+    """Drops rows that clash with existing users, then inserts the rest in one transaction."""
+    existing_emails = set(db.execute(
+        select(user_table.c.email).where(user_table.c.email.in_([r["email"] for r in batch]))
+    ).scalars())
+    rolls = [r["rollNumber"] for r in batch if r["rollNumber"]]
+    existing_rolls = set(db.execute(
+        select(student_table.c.rollNumber).where(student_table.c.rollNumber.in_(rolls))
+    ).scalars()) if rolls else set()
+
+    rows = []
+    for r in batch:
+        if r["email"] in existing_emails:
+            report.add_error(r["line"], r["email"], "a user with this email already exists")
+        elif r["rollNumber"] and r["rollNumber"] in existing_rolls:
+            report.add_error(r["line"], r["email"], "a student with this rollNumber already exists")
+        else:
+            rows.append(r)
+    if not rows:
+        return
+    if report.dry_run:
+        # Counts the rows that would be created
+        report.created += len(rows)
+        report.students += sum(1 for r in rows if r["role"] == UserRole.student)
+        report.teachers += sum(1 for r in rows if r["role"] == UserRole.teacher)
+        return
+
+    hashed = _hash_batch([r["password"] for r in rows])
+    try:
+        db.execute(insert(user_table), [
+            {"name": r["name"], "email": r["email"], "hashed_password": h, "role": r["role"]}
+            for r, h in zip(rows, hashed)
+        ])
+        # Map the generated IDs back by (unique) email
+        ids = dict(db.execute(
+            select(user_table.c.email, user_table.c.userID).where(user_table.c.email.in_([r["email"] for r in rows]))
+        ).all())
+        students = [{"studentID": ids[r["email"]], "rollNumber": r["rollNumber"], "class": r["class"]}
+                    for r in rows if r["role"] == UserRole.student]
+        teachers = [{"teacherID": ids[r["email"]]} for r in rows if r["role"] == UserRole.teacher]
+        if students:
+            db.execute(insert(student_table), students)
+        if teachers:
+            db.execute(insert(teacher_table), teachers)
+        stats_service.apply_deltas(db.connection(), {
+            stats_service.TOTAL_USERS: len(rows),
+            stats_service.ROLE_COUNTERS[UserRole.student]: len(students),
+            stats_service.ROLE_COUNTERS[UserRole.teacher]: len(teachers),
+        })
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        for r in rows:
+            report.add_error(r["line"], r["email"], f"batch failed: {e.__class__.__name__}: {e}")
+        return
+
+    report.created += len(rows)
+    report.students += len(students)
+    report.teachers += len(teachers)
+
+
+def import_users(db: Session, text_stream: IO[str], dry_run: bool = False) -> ImportReport:
+    """
+    Imports students and teachers from CSV text with the columns
+    role, name, email, password and optionally rollNumber, class.
+    With dry_run, rows are validated (including against the database) but nothing is written.
+    """
+    report = ImportReport(dry_run=dry_run)
+    reader = csv.DictReader(text_stream)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        report.add_error(1, "", f"missing column(s): {', '.join(missing)}")
+        return report
+
+    seen_emails, seen_rolls = set(), set()
+    batch = []
+    try:
+        for row in reader:
+            report.rows += 1
+            record = _validate_row(reader.line_num, row, seen_emails, seen_rolls, report)
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= config.IMPORT_BATCH_SIZE:
+                _import_batch(db, batch, report)
+                batch = []
+    except (csv.Error, UnicodeDecodeError) as e:
+        report.add_error(reader.line_num, "", f"could not read the file: {e}")
+    if batch:
+        _import_batch(db, batch, report)
+
+    if report.created and not dry_run:
+        user_directory_service.roster_cache.clear()
+    return report
+
+
+def import_users_from_file(binary_file: IO[bytes], dry_run: bool = False) -> ImportReport:
+    """Runs import_users() on an uploaded (binary) file in its own session."""
+    text_stream = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    db = SessionLocal()
+    try:
+        return import_users(db, text_stream, dry_run=dry_run)
+    finally:
+        db.close()
+        text_stream.detach()
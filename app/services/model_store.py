@@ -0,0 +1,233 @@
+import datetime
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .. import config
+from ..utils import metrics
+
+# --- Shared recognition model ---
+# The trained LBPH data (see utils/lbph.py) is stored as .npy files in one directory per
+# version under LBPH_MODEL_DIR; the CURRENT file names the active version. Workers map the
+# arrays read-only (np.load(mmap_mode="r")), so all workers on a host share the same
+# page-cache pages instead of each holding a private copy of every training histogram.
+# Training writes a complete new version directory, then atomically replaces CURRENT;
+# workers notice the change (one stat per prediction batch) and map the new version.
+# A calibrated threshold is stored inside the version it was evaluated for, so a newly
+# published model never inherits the threshold of the one before it.
+
+# numpy is imported on first use so that importing the app stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+VERSION_FILE = "CURRENT"
+HISTOGRAMS_FILE = "histograms.npy"
+TOTALS_FILE = "totals.npy"
+LABELS_FILE = "labels.npy"
+# How the model was built: histogram_scale (see lbph.training_arrays), face_size, equalize_histogram
+INFO_FILE = "model.json"
+# Recommended threshold of the version and the evaluation behind it (see evaluation_service)
+CALIBRATION_FILE = "calibration.json"
+
+# Versions kept on disk: the active one and the one before it
+KEEP_VERSIONS = 2
+
+# Label used for metrics (the LBPH model serves the OpenCV/Haar pipeline)
+DETECTOR_BACKEND = "haar"
+
+
+class LBPHModel:
+    """A memory-mapped LBPH model; predict() has the same result as OpenCV's recognizer."""
+
+    def __init__(self, version: str, histograms: "np.ndarray", totals: "np.ndarray", labels: "np.ndarray", info: Optional[dict] = None):
+        self.version = version
+        self.histograms = histograms
+        self.totals = totals
+        self.labels = labels
+        self.info = info or {}
+        self.scale = self.info.get("histogram_scale", 1.0)
+
+    def predict(self, gray: "np.ndarray"):
+        from ..utils import lbph
+        return lbph.predict(self.histograms, self.totals, self.labels, gray, self.scale)
+
+
+def _version_file(model_dir=None):
+    return Path(model_dir or config.LBPH_MODEL_DIR) / VERSION_FILE
+
+
+def version_stamp():
+    """Changes whenever a new model is published; None if no model has been trained."""
+    try:
+        stat_result = os.stat(_version_file())
+    except FileNotFoundError:
+        return None
+    return (stat_result.st_ino, stat_result.st_mtime_ns)
+
+
+def current_version(model_dir=None) -> Optional[str]:
+    try:
+        with open(_version_file(model_dir), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_model(version: str, model_dir=None) -> LBPHModel:
+    """Maps a stored model version read-only."""
+    import numpy as np
+
+    version_dir = Path(model_dir or config.LBPH_MODEL_DIR) / version
+    info = None
+    if (version_dir / INFO_FILE).exists():
+        with open(version_dir / INFO_FILE, encoding="utf-8") as f:
+            info = json.load(f)
+    return LBPHModel(
+        version,
+        np.load(version_dir / HISTOGRAMS_FILE, mmap_mode="r"),
+        np.load(version_dir / TOTALS_FILE, mmap_mode="r"),
+        np.load(version_dir / LABELS_FILE, mmap_mode="r"),
+        info,
+    )
+
+
+def _save_array(path, array):
+    import numpy as np
+
+    with open(path, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _save_json(path, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def save_model(histograms: "np.ndarray", totals: "np.ndarray", labels: "np.ndarray", model_dir=None,
+               info: Optional[dict] = None, calibration: Optional[dict] = None) -> str:
+    """
+    Writes a new model version, makes it the current one and returns its name.
+    model_dir defaults to LBPH_MODEL_DIR, the directory the app serves from. Without a
+    calibration the version is served with RECOGNITION_CONFIDENCE_THRESHOLD.
+    """
+    model_dir = Path(model_dir or config.LBPH_MODEL_DIR)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    version = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    tmp_dir = model_dir / f".{version}.tmp"
+    tmp_dir.mkdir()
+    _save_array(tmp_dir / HISTOGRAMS_FILE, histograms)
+    _save_array(tmp_dir / TOTALS_FILE, totals)
+    _save_array(tmp_dir / LABELS_FILE, labels)
+    _save_json(tmp_dir / INFO_FILE, info or {})
+    if calibration is not None:
+        _save_json(tmp_dir / CALIBRATION_FILE, calibration)
+    os.replace(tmp_dir, model_dir / version)
+
+    tmp_file = model_dir / f"{VERSION_FILE}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, _version_file(model_dir))
+    _prune_versions(model_dir, version)
+    return version
+
+
+def _prune_versions(model_dir: Path, current: str):
+    """
+    Deletes old versions. Workers still mapping one keep reading it until they switch:
+    on POSIX a deleted file stays readable while it is mapped.
+    """
+    versions = sorted(p.name for p in model_dir.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for version in versions[:-KEEP_VERSIONS]:
+        if version != current:
+            shutil.rmtree(model_dir / version, ignore_errors=True)
+
+
+def normalization_mismatch(model: LBPHModel) -> Optional[str]:
+    """
+    Why the model cannot be used with the current face normalization, or None. Faces are
+    normalized before prediction, so a model trained on other crops (at another FACE_SIZE,
+    with other equalization, or before normalization existed) would match them wrongly.
+    """
+    trained = (model.info.get("face_size"), model.info.get("equalize_histogram"))
+    if trained == (None, None):
+        return f"Model {model.version} was trained before face crops were normalized."
+    if trained != (config.FACE_SIZE, config.FACE_EQUALIZE_HISTOGRAM):
+        return (f"Model {model.version} was trained with face size {trained[0]} and equalization {trained[1]}, "
+                f"but FACE_SIZE={config.FACE_SIZE} and FACE_EQUALIZE_HISTOGRAM={config.FACE_EQUALIZE_HISTOGRAM}.")
+    return None
+
+
+_model_lock = threading.Lock()
+_model = None
+_model_stamp = None
+
+
+def get_model() -> Optional[LBPHModel]:
+    """The current model, switching to a newly published version when CURRENT changes."""
+    global _model, _model_stamp
+    stamp = version_stamp()
+    if _model is not None and stamp == _model_stamp:
+        return _model
+    with _model_lock:
+        if _model is None or stamp != _model_stamp:
+            version = current_version()
+            _model = load_model(version) if version else None
+            _model_stamp = stamp
+            if _model is not None:
+                metrics.MODEL_RELOADS.inc(detector=DETECTOR_BACKEND)
+        return _model
+
+
+def load_calibration(model_dir=None, version: Optional[str] = None) -> Optional[dict]:
+    """The calibration of a model version (default: the current one), or None."""
+    version = version or current_version(model_dir)
+    if version is None:
+        return None
+    try:
+        with open(Path(model_dir or config.LBPH_MODEL_DIR) / version / CALIBRATION_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_calibration(calibration: dict, model_dir=None, version: Optional[str] = None) -> str:
+    """Stores the calibration of a model version (default: the current one) and returns the version."""
+    model_dir = Path(model_dir or config.LBPH_MODEL_DIR)
+    version = version or current_version(model_dir)
+    if version is None or not (model_dir / version).is_dir():
+        raise ValueError("No trained model to store the calibration with.")
+    tmp_file = model_dir / version / f"{CALIBRATION_FILE}.tmp"
+    _save_json(tmp_file, calibration)
+    os.replace(tmp_file, model_dir / version / CALIBRATION_FILE)
+    return version
+
+
+_calibration_cache = (None, None)
+
+
+def calibrated_threshold() -> Optional[float]:
+    """
+    The recommended threshold of the served model version, or None if that version was
+    not calibrated. Re-read when the model or its calibration changes.
+    """
+    global _calibration_cache
+    model = get_model()
+    if model is None:
+        return None
+    try:
+        stamp = (model.version, os.stat(config.LBPH_MODEL_DIR / model.version / CALIBRATION_FILE).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    if _calibration_cache[0] != stamp:
+        calibration = load_calibration(version=model.version) or {}
+        _calibration_cache = (stamp, calibration.get("threshold"))
+    return _calibration_cache[1]
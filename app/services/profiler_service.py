@@ -0,0 +1,315 @@
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from .. import config
+
+# --- On-demand sampling profiler ---
+# An admin starts a session by writing a small control file. Every worker checks
+# that file (at most once per second, piggybacking on incoming requests) and then
+# samples its own thread stacks until the session's deadline or request budget is
+# reached. Each worker writes a collapsed-stack file ("frame;frame;frame count"),
+# and the download merges them into one flame-graph compatible profile.
+
+PROFILE_DIR = config.DATA_DIR / "profiles"
+CONTROL_FILE = PROFILE_DIR / "session.json"
+
+# Safety limits so a forgotten session cannot hurt a live system
+MAX_DURATION_SECONDS = 300
+MIN_INTERVAL_MS = 5
+DEFAULT_INTERVAL_MS = 10
+MAX_STACK_DEPTH = 128
+KEEP_SESSIONS = 10
+CONTROL_CHECK_SECONDS = 1.0
+
+_lock = threading.Lock()
+_last_control_check = 0.0
+_active = None  # the worker-local _WorkerSession, if any
+_seen_sessions = set()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path_parts = code.co_filename.replace("\\", "/").split("/")
+    location = "/".join(path_parts[-2:])
+    return f"{code.co_name} ({location}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _profile_path(session_id: str, pid: int):
+    return PROFILE_DIR / f"{session_id}.{pid}.folded"
+
+
+def _error_path(session_id: str, pid: int):
+    return PROFILE_DIR / f"{session_id}.{pid}.error"
+
+
+class _PythonSampler(threading.Thread):
+    """Samples every Python thread of this process at a fixed interval."""
+
+    def __init__(self, session_id: str, interval: float):
+        super().__init__(name=f"profiler-{session_id}", daemon=True)
+        self.session_id = session_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        thread_names = {}
+        while not self._stop_event.wait(self.interval):
+            if len(thread_names) != threading.active_count():
+                thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(f"thread {thread_names.get(thread_id, thread_id)}".replace(";", ":"))
+                stack.append(f"worker {os.getpid()}")
+                self.stacks[";".join(reversed(stack))] += 1
+        self._write()
+
+    def _write(self):
+        with open(_profile_path(self.session_id, os.getpid()), "w") as f:
+            for stack, count in self.stacks.items():
+                f.write(f"{stack} {count}\n")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class _NativeSampler:
+    """
+    Runs py-spy against this worker to include native (C extension) frames, e.g. OpenCV.
+    py-spy needs ptrace permission on the worker, which is often denied (ptrace_scope=1,
+    containers). If it exits with an error, the error is saved for the session status
+    and this worker falls back to sampling its Python stacks for the rest of the session.
+    """
+
+    def __init__(self, session_id: str, interval: float, duration: float):
+        self.session_id = session_id
+        self.interval = interval
+        self.fallback = None
+        self._stopped = False
+        self._state_lock = threading.Lock()
+        rate = max(1, int(1 / interval))
+        self.process = subprocess.Popen(
+            ["py-spy", "record", "--pid", str(os.getpid()), "--native", "--nonblocking",
+             "--format", "raw", "--rate", str(rate), "--duration", str(int(duration) + 1),
+             "--output", str(_profile_path(session_id, os.getpid()))],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+
+    def start(self):
+        threading.Thread(target=self._watch, name=f"profiler-{self.session_id}-py-spy", daemon=True).start()
+
+    def _watch(self):
+        stderr = self.process.stderr.read().decode(errors="replace")
+        code = self.process.wait()
+        with self._state_lock:
+            if code == 0 or self._stopped:
+                return
+            lines = [line.strip() for line in stderr.splitlines() if line.strip()]
+            message = lines[-1] if lines else f"py-spy exited with status {code}."
+            print(f"!!! WARNING: Native profiling failed in worker {os.getpid()}: {message} !!!")
+            with open(_error_path(self.session_id, os.getpid()), "w") as f:
+                f.write(f"py-spy exited with status {code}: {message}\n")
+            self.fallback = _PythonSampler(self.session_id, self.interval)
+            self.fallback.start()
+
+    def stop(self):
+        with self._state_lock:
+            self._stopped = True
+            if self.fallback is not None:
+                self.fallback.stop()
+        # py-spy flushes its output when interrupted
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+
+
+class _WorkerSession:
+    def __init__(self, session: dict):
+        self.session_id = session["id"]
+        self.deadline = session["deadline"]
+        self.max_requests = session.get("max_requests")
+        self.requests = 0
+        interval = session["interval_ms"] / 1000
+        remaining = max(0.0, self.deadline - time.time())
+        if session.get("native") and shutil.which("py-spy"):
+            self.sampler = _NativeSampler(self.session_id, interval, remaining)
+        else:
+            self.sampler = _PythonSampler(self.session_id, interval)
+        self.sampler.start()
+
+    def finished(self) -> bool:
+        if time.time() >= self.deadline:
+            return True
+        return self.max_requests is not None and self.requests >= self.max_requests
+
+
+def _read_control() -> Optional[dict]:
+    try:
+        with open(CONTROL_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_control(session: dict):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = CONTROL_FILE.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(session, f)
+    os.replace(tmp_path, CONTROL_FILE)
+
+
+def _stop_local():
+    global _active
+    if _active is not None:
+        _active.sampler.stop()
+        _active = None
+
+
+def on_request():
+    """
+    Called for every request. Counts requests for the active session and, at most once
+    per second, picks up sessions started or stopped by an admin on any worker.
+    """
+    global _last_control_check, _active
+    now = time.monotonic()
+    if _active is None and now - _last_control_check < CONTROL_CHECK_SECONDS:
+        return
+    with _lock:
+        if _active is not None:
+            _active.requests += 1
+            if _active.finished():
+                _stop_local()
+                return
+        if now - _last_control_check < CONTROL_CHECK_SECONDS:
+            return
+        _last_control_check = now
+        session = _read_control()
+        if not session:
+            return
+        if _active is not None and (session["id"] != _active.session_id or session["deadline"] <= time.time()):
+            _stop_local()
+        if _active is None and session["id"] not in _seen_sessions and session["deadline"] > time.time():
+            _seen_sessions.add(session["id"])
+            _active = _WorkerSession(session)
+            # Stop on the deadline even if no further requests arrive
+            timer = threading.Timer(max(0.0, session["deadline"] - time.time()), _expire, args=(session["id"],))
+            timer.daemon = True
+            timer.start()
+
+
+def _expire(session_id: str):
+    with _lock:
+        if _active is not None and _active.session_id == session_id:
+            _stop_local()
+
+
+def _cleanup_old_profiles():
+    session_ids = sorted({p.name.split(".")[0] for pattern in ("*.folded", "*.error") for p in PROFILE_DIR.glob(pattern)})
+    for old_id in session_ids[:-KEEP_SESSIONS]:
+        for pattern in (f"{old_id}.*.folded", f"{old_id}.*.error"):
+            for path in PROFILE_DIR.glob(pattern):
+                path.unlink(missing_ok=True)
+
+
+def _session_errors(session_id: str) -> list:
+    """Errors reported by workers of a session (e.g. py-spy could not attach)."""
+    errors = []
+    for path in sorted(PROFILE_DIR.glob(f"{session_id}.*.error")):
+        with open(path) as f:
+            errors.append({"worker": int(path.name.split(".")[1]), "error": f.read().strip()})
+    return errors
+
+
+def start_session(duration_seconds: float, max_requests: Optional[int] = None,
+                  interval_ms: int = DEFAULT_INTERVAL_MS, native: bool = False) -> dict:
+    """Starts a profiling session on all workers. Only one session may run at a time."""
+    global _last_control_check
+    current = _read_control()
+    if current and current["deadline"] > time.time():
+        raise ValueError("A profiling session is already running.")
+    if duration_seconds <= 0:
+        raise ValueError("Duration must be positive.")
+
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    _cleanup_old_profiles()
+    session = {
+        # Sortable ids so the newest sessions are kept by the cleanup
+        "id": time.strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6],
+        "started_at": time.time(),
+        "deadline": time.time() + min(duration_seconds, MAX_DURATION_SECONDS),
+        "max_requests": max_requests if max_requests and max_requests > 0 else None,
+        "interval_ms": max(MIN_INTERVAL_MS, interval_ms),
+        "native": bool(native),
+    }
+    _write_control(session)
+    # Start on this worker right away
+    _last_control_check = 0.0
+    on_request()
+    return session
+
+
+def stop_session() -> Optional[dict]:
+    """Ends the current session on all workers (each worker stops on its next check)."""
+    session = _read_control()
+    if not session:
+        return None
+    session["deadline"] = min(session["deadline"], time.time())
+    _write_control(session)
+    with _lock:
+        _stop_local()
+    return session
+
+
+def get_status() -> dict:
+    session = _read_control()
+    files = [p for pattern in ("*.folded", "*.error") for p in PROFILE_DIR.glob(pattern)] if PROFILE_DIR.exists() else []
+    sessions = sorted({p.name.split(".")[0] for p in files}, reverse=True)
+    if session:
+        # Native profiling is only on where py-spy is running; workers it failed in are listed
+        session = dict(session, errors=_session_errors(session["id"]))
+        session["native_active"] = session["native"] and shutil.which("py-spy") is not None and not session["errors"]
+    return {
+        "session": session,
+        "running": bool(session and session["deadline"] > time.time()),
+        "py_spy_available": shutil.which("py-spy") is not None,
+        "profiles": [
+            {
+                "id": session_id,
+                "workers": len(list(PROFILE_DIR.glob(f"{session_id}.*.folded"))),
+                "errors": _session_errors(session_id),
+            }
+            for session_id in sessions
+        ],
+    }
+
+
+def collect_profile(session_id: str) -> Optional[str]:
+    """Merges the per-worker collapsed stacks of a session into one profile."""
+    if not session_id.replace("-", "").isalnum():
+        return None
+    paths = list(PROFILE_DIR.glob(f"{session_id}.*.folded"))
+    if not paths:
+        return None
+    merged = Counter()
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack and count.isdigit():
+                    merged[stack] += int(count)
+    return "".join(f"{stack} {count}\n" for stack, count in merged.most_common())
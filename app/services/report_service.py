@@ -0,0 +1,283 @@
+import datetime
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import config
+from ..models.attendance import AttendanceRecord, Student, StudentSubjectAttendance, Subject, SubjectDailyAttendance, User
+from ..utils.cache import TTLCache
+from . import archive_service
+
+# --- Date-range attendance reports ---
+# Computed in SQL: classes held come from the subject_daily_attendance rollup, days
+# present per student from attendance_record grouped over the range (covered by
+# ix_attendance_subject_date_student / ix_attendance_student_date), and totals,
+# running sums and moving averages from window functions. Both count marking days
+# (attendance_record.date), which hold one record per student, subject and day.
+# The roster of a subject is every student who has attended it at least once.
+# Ranges overlapping archived terms also count the archived records (archive_service).
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Subject reports keyed by (subject_id, start, end, kind, *params); a None bound is open-ended.
+# The cache is per worker, so each entry also holds the subject's rollup stamp it was
+# computed from: attendance marked through any worker changes the stamp, and the next
+# request recomputes the report. invalidate() just frees this worker's entries early.
+report_cache = TTLCache(ttl_seconds=config.REPORT_CACHE_SECONDS)
+
+# Core tables: joining the Student mapper would pull in its parent user table implicitly
+student_table = Student.__table__
+user_table = User.__table__
+subject_table = Subject.__table__
+
+
+def invalidate(subject_id: int, day: Optional[datetime.date] = None):
+    """
+    Drops the cached reports of a subject whose range includes `day`
+    (all of the subject's reports when day is None). Call after attendance is written.
+    """
+    def affected(key):
+        if key[0] != subject_id:
+            return False
+        if day is None:
+            return True
+        start, end = key[1], key[2]
+        return (start is None or start <= day) and (end is None or day <= end)
+    report_cache.invalidate_where(affected)
+
+
+async def _rollup_stamp(db: AsyncSession, subject_id: int) -> tuple:
+    """Changes whenever attendance of the subject is marked or its rollups are rebuilt."""
+    return tuple((await db.execute(
+        select(func.count(), func.coalesce(func.sum(SubjectDailyAttendance.present_count), 0))
+        .where(SubjectDailyAttendance.subjectID == subject_id)
+    )).one())
+
+
+def _record_range(start: Optional[datetime.date], end: Optional[datetime.date]) -> list:
+    conditions = []
+    if start:
+        conditions.append(AttendanceRecord.date >= start)
+    if end:
+        conditions.append(AttendanceRecord.date <= end)
+    return conditions
+
+
+def _day_range(start: Optional[datetime.date], end: Optional[datetime.date]) -> list:
+    conditions = []
+    if start:
+        conditions.append(SubjectDailyAttendance.date >= start)
+    if end:
+        conditions.append(SubjectDailyAttendance.date <= end)
+    return conditions
+
+
+def _percentage(present: int, total: int) -> int:
+    return round((present / total) * 100) if total else 0
+
+
+async def _classes_held(db: AsyncSession, subject_id: int, start, end) -> int:
+    return (await db.execute(
+        select(func.count())
+        .select_from(SubjectDailyAttendance)
+        .where(SubjectDailyAttendance.subjectID == subject_id, *_day_range(start, end))
+    )).scalar_one()
+
+
+async def get_subject_report(
+    db: AsyncSession,
+    subject_id: int,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    below: Optional[float] = None,
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> dict:
+    """
+    Per-student attendance for a subject over [start, end], ordered by name and paginated.
+    With `below`, only students whose attendance percentage is under that threshold.
+    """
+    offset = max(0, offset)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    key = (subject_id, start, end, "students", below, offset, limit)
+    stamp = await _rollup_stamp(db, subject_id)
+    cached = report_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    classes_held = await _classes_held(db, subject_id, start, end)
+
+    present = (
+        select(
+            AttendanceRecord.studentID.label("studentID"),
+            func.count().label("days_present"),
+            func.max(AttendanceRecord.timestamp).label("last_present"),
+        )
+        .where(AttendanceRecord.subjectID == subject_id, *_record_range(start, end))
+        .group_by(AttendanceRecord.studentID)
+        .subquery()
+    )
+    days_present = func.coalesce(present.c.days_present, 0)
+    stmt = (
+        select(
+            StudentSubjectAttendance.studentID, student_table.c.rollNumber, user_table.c.name,
+            days_present.label("days_present"), present.c.last_present,
+        )
+        .select_from(StudentSubjectAttendance.__table__)
+        .join(student_table, student_table.c.studentID == StudentSubjectAttendance.studentID)
+        .join(user_table, user_table.c.userID == StudentSubjectAttendance.studentID)
+        .outerjoin(present, present.c.studentID == StudentSubjectAttendance.studentID)
+        .where(StudentSubjectAttendance.subjectID == subject_id)
+        .order_by(user_table.c.name, StudentSubjectAttendance.studentID)
+    )
+
+    archived = archive_service.days_present(start, end, subject_id=subject_id)
+    if not archived:
+        stmt = stmt.add_columns(func.count().over().label("total")).offset(offset).limit(limit)
+        if below is not None:
+            stmt = stmt.where(days_present * 100 < below * classes_held)
+        rows = (await db.execute(stmt)).all()
+        total = rows[0].total if rows else 0
+        students = [(row.rollNumber, row.name, row.days_present, row.last_present) for row in rows]
+    else:
+        # The range covers archived terms: add their days, then filter and paginate here
+        students = []
+        for row in (await db.execute(stmt)).all():
+            archived_days, archived_last = archived.get(row.studentID, (0, None))
+            days = row.days_present + archived_days
+            last_present = max((t for t in (row.last_present, archived_last) if t), default=None)
+            if below is None or days * 100 < below * classes_held:
+                students.append((row.rollNumber, row.name, days, last_present))
+        total = len(students)
+        students = students[offset:offset + limit]
+
+    report = {
+        "subjectID": subject_id,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "classes_held": classes_held,
+        "below": below,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "students": [
+            {
+                "rollNumber": roll_number,
+                "name": name,
+                "days_present": days,
+                "percentage": _percentage(days, classes_held),
+                "last_present": last_present.isoformat() if last_present else None,
+            }
+            for roll_number, name, days, last_present in students
+        ],
+    }
+    report_cache.set(key, (stamp, report))
+    return report
+
+
+async def get_daily_series(
+    db: AsyncSession,
+    subject_id: int,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+) -> dict:
+    """Students present on each class day, with a running total and a 7-class moving average."""
+    key = (subject_id, start, end, "daily")
+    stamp = await _rollup_stamp(db, subject_id)
+    cached = report_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    enrolled = (await db.execute(
+        select(func.count())
+        .select_from(StudentSubjectAttendance)
+        .where(StudentSubjectAttendance.subjectID == subject_id)
+    )).scalar_one()
+    rows = (await db.execute(
+        select(
+            SubjectDailyAttendance.date,
+            SubjectDailyAttendance.present_count,
+            func.sum(SubjectDailyAttendance.present_count).over(order_by=SubjectDailyAttendance.date).label("cumulative"),
+            func.avg(SubjectDailyAttendance.present_count).over(order_by=SubjectDailyAttendance.date, rows=(-6, 0)).label("moving_average"),
+        )
+        .where(SubjectDailyAttendance.subjectID == subject_id, *_day_range(start, end))
+        .order_by(SubjectDailyAttendance.date)
+    )).all()
+
+    series = {
+        "subjectID": subject_id,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "students": enrolled,
+        "days": [
+            {
+                "date": row.date.isoformat(),
+                "present": row.present_count,
+                "percentage": _percentage(row.present_count, enrolled),
+                "cumulative_present": int(row.cumulative),
+                "moving_average_7": round(float(row.moving_average), 2),
+            }
+            for row in rows
+        ],
+    }
+    report_cache.set(key, (stamp, series))
+    return series
+
+
+async def get_student_report(
+    db: AsyncSession,
+    student_id: int,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    teacher_id: Optional[int] = None,
+) -> list:
+    """
+    Per-subject attendance of one student over [start, end]. teacher_id restricts the
+    result to that teacher's subjects. Not cached: it only reads the student's own rows.
+    """
+    student_subjects = select(StudentSubjectAttendance.subjectID).where(StudentSubjectAttendance.studentID == student_id)
+    held = (
+        select(SubjectDailyAttendance.subjectID.label("subjectID"), func.count().label("classes_held"))
+        .where(SubjectDailyAttendance.subjectID.in_(student_subjects), *_day_range(start, end))
+        .group_by(SubjectDailyAttendance.subjectID)
+        .subquery()
+    )
+    present = (
+        select(
+            AttendanceRecord.subjectID.label("subjectID"),
+            func.count().label("days_present"),
+        )
+        .where(AttendanceRecord.studentID == student_id, *_record_range(start, end))
+        .group_by(AttendanceRecord.subjectID)
+        .subquery()
+    )
+    stmt = (
+        select(
+            subject_table.c.subjectID, subject_table.c.subjectName,
+            func.coalesce(present.c.days_present, 0).label("days_present"),
+            func.coalesce(held.c.classes_held, 0).label("classes_held"),
+        )
+        .select_from(StudentSubjectAttendance.__table__)
+        .join(subject_table, subject_table.c.subjectID == StudentSubjectAttendance.subjectID)
+        .outerjoin(held, held.c.subjectID == StudentSubjectAttendance.subjectID)
+        .outerjoin(present, present.c.subjectID == StudentSubjectAttendance.subjectID)
+        .where(StudentSubjectAttendance.studentID == student_id)
+        .order_by(subject_table.c.subjectName)
+    )
+    if teacher_id is not None:
+        stmt = stmt.where(subject_table.c.teacherID == teacher_id)
+
+    archived = archive_service.days_present(start, end, student_id=student_id, by="subjectID")
+    report = []
+    for row in (await db.execute(stmt)).all():
+        days = row.days_present + archived.get(row.subjectID, (0, None))[0]
+        report.append({
+            "subjectID": row.subjectID,
+            "subject": row.subjectName,
+            "days_present": days,
+            "classes_held": row.classes_held,
+            "percentage": _percentage(days, row.classes_held),
+        })
+    return report
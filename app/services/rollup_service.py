@@ -0,0 +1,148 @@
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, true
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models.attendance import AttendanceRecord, Student, StudentSubjectAttendance, Subject, SubjectDailyAttendance
+from . import archive_service
+
+# --- Attendance rollups ---
+# subject_daily_attendance:   one row per (subject, day) with the number of students present
+# student_subject_attendance: one row per (student, subject) with the number of days present
+# Both are incremented by upserts issued in the same transaction as the new
+# attendance_record rows, and can be rebuilt from the raw records at any time.
+
+# Rows per upsert when adding archived terms during a rebuild
+REBUILD_BATCH_SIZE = 1000
+
+_DIALECT_INSERTS = {
+    "mysql": mysql.insert,
+    "mariadb": mysql.insert,
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def _increment(dialect_name: str, model, rows: list, key_columns: tuple, extra_updates: tuple = ()):
+    """Builds an INSERT ... ON DUPLICATE KEY / ON CONFLICT statement that adds present_count."""
+    insert_fn = _DIALECT_INSERTS.get(dialect_name)
+    if insert_fn is None:
+        raise ValueError(f"Attendance rollups do not support the '{dialect_name}' dialect.")
+    table = model.__table__
+    stmt = insert_fn(table).values(rows)
+    if dialect_name in ("mysql", "mariadb"):
+        new = stmt.inserted
+        updates = {"present_count": table.c.present_count + new.present_count}
+        updates.update({name: new[name] for name in extra_updates})
+        return stmt.on_duplicate_key_update(**updates)
+    new = stmt.excluded
+    updates = {"present_count": table.c.present_count + new.present_count}
+    updates.update({name: new[name] for name in extra_updates})
+    return stmt.on_conflict_do_update(index_elements=list(key_columns), set_=updates)
+
+
+def insert_record_statement(dialect_name: str, student_id: int, subject_id: int, day: date):
+    """
+    An INSERT of one attendance record that does nothing if the student is already marked
+    for the subject on that day (unique key on studentID, subjectID, date). Its rowcount
+    is 1 only when the record was inserted, so concurrent marks of the same student count
+    once in the rollups.
+    """
+    insert_fn = _DIALECT_INSERTS.get(dialect_name)
+    if insert_fn is None:
+        raise ValueError(f"Attendance rollups do not support the '{dialect_name}' dialect.")
+    stmt = insert_fn(AttendanceRecord.__table__).values(studentID=student_id, subjectID=subject_id, date=day)
+    if dialect_name in ("mysql", "mariadb"):
+        return stmt.prefix_with("IGNORE")
+    return stmt.on_conflict_do_nothing(index_elements=["studentID", "subjectID", "date"])
+
+
+def record_present_statements(dialect_name: str, subject_id: int, student_ids, day: date) -> list:
+    """
+    Statements that count newly marked students as present for a subject on a day.
+    Execute them in the session that inserts the attendance records, before commit, and
+    only for records that were actually inserted (see insert_record_statement).
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+    if not student_ids:
+        return []
+    return [
+        _increment(
+            dialect_name, SubjectDailyAttendance,
+            [{"subjectID": subject_id, "date": day, "present_count": len(student_ids)}],
+            ("subjectID", "date"),
+        ),
+        _increment(
+            dialect_name, StudentSubjectAttendance,
+            [{"studentID": student_id, "subjectID": subject_id, "present_count": 1, "last_present": day}
+             for student_id in student_ids],
+            ("studentID", "subjectID"),
+            extra_updates=("last_present",),
+        ),
+    ]
+
+
+def delete_statements(subject_id: int) -> list:
+    """Statements that remove a subject's rollups (e.g. when the class is deleted)."""
+    return [
+        delete(SubjectDailyAttendance).where(SubjectDailyAttendance.subjectID == subject_id),
+        delete(StudentSubjectAttendance).where(StudentSubjectAttendance.subjectID == subject_id),
+    ]
+
+
+def rebuild(db: Session, subject_id: Optional[int] = None):
+    """
+    Recomputes the rollups from attendance_record with two grouped INSERT ... SELECT
+    statements, for one subject or all of them, then adds the archived terms.
+    Records are grouped by their marking day (attendance_record.date, the same day live
+    marking counts them for), which holds one record per student, subject and day.
+    The caller commits.
+    """
+    day = AttendanceRecord.date
+    daily_scope, student_scope, record_scope = true(), true(), true()
+    if subject_id is not None:
+        daily_scope = SubjectDailyAttendance.subjectID == subject_id
+        student_scope = StudentSubjectAttendance.subjectID == subject_id
+        record_scope = AttendanceRecord.subjectID == subject_id
+
+    db.execute(delete(SubjectDailyAttendance).where(daily_scope))
+    db.execute(delete(StudentSubjectAttendance).where(student_scope))
+
+    db.execute(insert(SubjectDailyAttendance).from_select(
+        ["subjectID", "date", "present_count"],
+        select(AttendanceRecord.subjectID, day, func.count())
+        .where(record_scope)
+        .group_by(AttendanceRecord.subjectID, day),
+    ))
+    db.execute(insert(StudentSubjectAttendance).from_select(
+        ["studentID", "subjectID", "present_count", "last_present"],
+        select(AttendanceRecord.studentID, AttendanceRecord.subjectID, func.count(), func.max(day))
+        .where(record_scope)
+        .group_by(AttendanceRecord.studentID, AttendanceRecord.subjectID),
+    ))
+
+    # Archived records are no longer in attendance_record; add their counts on top.
+    # last_present is left alone on conflict: live records are always newer.
+    dialect_name = db.get_bind().dialect.name
+    # Records of a term whose deletion has not finished are counted once, from the database
+    live_record_ids = []
+    for term in archive_service.pending_terms():
+        live_record_ids.extend(db.execute(select(AttendanceRecord.recordID).where(
+            AttendanceRecord.date >= date.fromisoformat(term["start"]),
+            AttendanceRecord.date <= date.fromisoformat(term["end"]),
+        )).scalars())
+    archived_daily, archived_students = archive_service.rollup_rows(subject_id, live_record_ids)
+    if archived_daily:
+        # Skip subjects and students deleted since their term was archived
+        subject_ids = set(db.execute(select(Subject.subjectID)).scalars())
+        student_ids = set(db.execute(select(Student.__table__.c.studentID)).scalars())
+        archived_daily = [r for r in archived_daily if r["subjectID"] in subject_ids]
+        archived_students = [r for r in archived_students if r["subjectID"] in subject_ids and r["studentID"] in student_ids]
+    for model, rows, key_columns in (
+        (SubjectDailyAttendance, archived_daily, ("subjectID", "date")),
+        (StudentSubjectAttendance, archived_students, ("studentID", "subjectID")),
+    ):
+        for i in range(0, len(rows), REBUILD_BATCH_SIZE):
+            db.execute(_increment(dialect_name, model, rows[i:i + REBUILD_BATCH_SIZE], key_columns))
@@ -0,0 +1,135 @@
+import asyncio
+from collections import Counter
+from datetime import date
+
+from sqlalchemy import case, event, func, inspect, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .. import config
+from ..database.connection import SessionLocal
+from ..models.attendance import DashboardCounter, SubjectDailyAttendance, User, UserRole
+
+# --- Dashboard counters ---
+# User totals live in the dashboard_counter table. Mapper events collect +1/-1 deltas
+# for every User inserted or deleted, and they are written in the same flush (and so
+# the same transaction) as the rows themselves, so a rollback undoes both.
+# Bulk statements and changes made outside the app are picked up by reconcile().
+# Today's attendance totals come from the subject_daily_attendance rollup.
+
+TOTAL_USERS = "users"
+ROLE_COUNTERS = {UserRole.student: "students", UserRole.teacher: "teachers", UserRole.admin: "admins"}
+
+_PENDING_DELTAS = "stats_pending_deltas"
+
+
+def _user_deltas(target, sign: int):
+    deltas = {TOTAL_USERS: sign}
+    role_counter = ROLE_COUNTERS.get(target.role)
+    if role_counter:
+        deltas[role_counter] = sign
+    return deltas
+
+
+def _queue(target, deltas: dict):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault(_PENDING_DELTAS, Counter()).update(deltas)
+
+
+def _on_user_insert(mapper, connection, target):
+    _queue(target, _user_deltas(target, 1))
+
+
+def _on_user_delete(mapper, connection, target):
+    _queue(target, _user_deltas(target, -1))
+
+
+event.listen(User, "after_insert", _on_user_insert, propagate=True)
+event.listen(User, "after_delete", _on_user_delete, propagate=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _write_pending_deltas(session, flush_context):
+    deltas = session.info.pop(_PENDING_DELTAS, None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def apply_deltas(connection, deltas: dict):
+    """
+    Adds deltas to the counters on the given connection (inside the caller's transaction).
+    Used directly by Core bulk inserts, which bypass the mapper events.
+    """
+    for name, delta in deltas.items():
+        if delta == 0:
+            continue
+        result = connection.execute(
+            update(DashboardCounter).where(DashboardCounter.name == name).values(value=DashboardCounter.value + delta)
+        )
+        if result.rowcount == 0:
+            # First write ever; reconcile() normally creates the rows at startup
+            connection.execute(insert(DashboardCounter).values(name=name, value=max(delta, 0)))
+
+
+def reconcile(db: Session):
+    """
+    Recounts users per role and overwrites the counters in one UPDATE whose new values are
+    subqueries counting the user table, so a user inserted concurrently is either in the
+    count or applies its delta afterwards, never lost in between.
+    """
+    users = User.__table__
+    counts = {TOTAL_USERS: select(func.count()).select_from(users).scalar_subquery()}
+    for role, name in ROLE_COUNTERS.items():
+        counts[name] = select(func.count()).select_from(users).where(users.c.role == role).scalar_subquery()
+
+    # Counters that were never written yet; the UPDATE below sets them
+    existing = {name for (name,) in db.execute(select(DashboardCounter.name))}
+    for name in counts:
+        if name not in existing:
+            db.add(DashboardCounter(name=name, value=0))
+    db.flush()
+
+    db.execute(
+        update(DashboardCounter)
+        .where(DashboardCounter.name.in_(list(counts)))
+        .values(value=case(counts, value=DashboardCounter.name))
+    )
+    values = dict(db.execute(select(DashboardCounter.name, DashboardCounter.value)).all())
+    db.commit()
+    return values
+
+
+def reconcile_now():
+    db = SessionLocal()
+    try:
+        return reconcile(db)
+    except Exception as e:
+        db.rollback()
+        print(f"!!! ERROR: Could not reconcile dashboard counters: {e}")
+    finally:
+        db.close()
+
+
+async def reconcile_periodically():
+    """Background task: reconciles the counters at startup and then every STATS_RECONCILE_SECONDS."""
+    while True:
+        await asyncio.to_thread(reconcile_now)
+        await asyncio.sleep(config.STATS_RECONCILE_SECONDS)
+
+
+async def get_dashboard_stats(db: AsyncSession) -> dict:
+    """Dashboard numbers from the counter and rollup tables; cost does not grow with users or records."""
+    counters = dict((await db.execute(select(DashboardCounter.name, DashboardCounter.value))).all())
+    classes_today, present_today = (await db.execute(
+        select(func.count(), func.coalesce(func.sum(SubjectDailyAttendance.present_count), 0))
+        .where(SubjectDailyAttendance.date == date.today())
+    )).one()
+    return {
+        "total": counters.get(TOTAL_USERS, 0),
+        "students": counters.get(ROLE_COUNTERS[UserRole.student], 0),
+        "teachers": counters.get(ROLE_COUNTERS[UserRole.teacher], 0),
+        "admins": counters.get(ROLE_COUNTERS[UserRole.admin], 0),
+        "classes_today": classes_today,
+        "present_today": present_today,
+    }
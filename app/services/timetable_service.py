@@ -0,0 +1,72 @@
+from collections import defaultdict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload
+
+from .. import config
+from ..models.attendance import ClassSchedule, Subject
+from ..utils.cache import TTLCache
+
+# --- Timetable grids ---
+# The admin grid (day -> period -> slot) and each teacher's week (day -> slots) are
+# built with eager loading in one query and cached as plain dicts, so templates never
+# trigger lazy loads. Call invalidate() after changing schedules or subject assignments.
+
+ADMIN_GRID_KEY = "admin"
+
+grid_cache = TTLCache(ttl_seconds=config.TIMETABLE_CACHE_SECONDS)
+
+
+def invalidate():
+    grid_cache.clear()
+
+
+def _slot(schedule: ClassSchedule, with_teacher: bool = False) -> dict:
+    subject = {"subjectID": schedule.subject.subjectID, "subjectName": schedule.subject.subjectName}
+    if with_teacher:
+        teacher = schedule.subject.teacher
+        subject["teacher"] = {"userID": teacher.userID, "name": teacher.name} if teacher else None
+    return {
+        "scheduleID": schedule.scheduleID,
+        "period": schedule.period,
+        "start_time": schedule.start_time,
+        "end_time": schedule.end_time,
+        "location": schedule.location,
+        "subject": subject,
+    }
+
+
+async def get_admin_grid(db: AsyncSession) -> dict:
+    """Every scheduled slot with its subject and teacher, keyed by day and period."""
+    grid = grid_cache.get(ADMIN_GRID_KEY)
+    if grid is None:
+        schedules = (await db.execute(
+            select(ClassSchedule).options(joinedload(ClassSchedule.subject).joinedload(Subject.teacher))
+        )).scalars().all()
+        grid = defaultdict(dict)
+        for schedule in schedules:
+            grid[schedule.day_of_week.value][schedule.period] = _slot(schedule, with_teacher=True)
+        grid = dict(grid)
+        grid_cache.set(ADMIN_GRID_KEY, grid)
+    return grid
+
+
+async def get_teacher_week(db: AsyncSession, teacher_id: int) -> dict:
+    """A teacher's slots per day, ordered by start time."""
+    key = ("teacher", teacher_id)
+    week = grid_cache.get(key)
+    if week is None:
+        schedules = (await db.execute(
+            select(ClassSchedule)
+            .join(ClassSchedule.subject)
+            .where(Subject.teacherID == teacher_id)
+            .options(contains_eager(ClassSchedule.subject))
+            .order_by(ClassSchedule.start_time)
+        )).scalars().all()
+        week = defaultdict(list)
+        for schedule in schedules:
+            week[schedule.day_of_week.value].append(_slot(schedule))
+        week = dict(week)
+        grid_cache.set(key, week)
+    return week
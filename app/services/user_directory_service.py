@@ -0,0 +1,132 @@
+import hashlib
+import json
+from typing import Optional, Tuple
+
+from sqlalchemy import event, or_, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import config
+from ..models.attendance import Student, User, UserRole
+from ..utils.cache import TTLCache
+
+# Plain tables: selecting from the Student mapper would join user implicitly
+user_table = User.__table__
+student_table = Student.__table__
+
+# --- Admin user directory ---
+# Users are listed in userID order with keyset pagination: each page asks for
+# userID > the last ID seen, so deep pages cost the same as the first one.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+
+
+def _prefix_pattern(prefix: str) -> str:
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+async def list_users(db: AsyncSession, after: int = 0, limit: int = DEFAULT_PAGE_SIZE,
+                     role: Optional[UserRole] = None, q: Optional[str] = None) -> dict:
+    """
+    One page of users with ID greater than `after`, optionally limited to a role and to
+    names, emails or roll numbers starting with `q`. Each prefix is matched by its own
+    indexed range scan; the matching IDs are merged and paginated by userID.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filters = [user_table.c.userID > after]
+    if role is not None:
+        filters.append(user_table.c.role == role)
+
+    q = (q or "").strip()
+    if q:
+        pattern = _prefix_pattern(q)
+        matching = union(
+            select(user_table.c.userID).where(user_table.c.name.like(pattern, escape="\\"), *filters),
+            select(user_table.c.userID).where(user_table.c.email.like(pattern, escape="\\"), *filters),
+            select(user_table.c.userID)
+            .join(student_table, student_table.c.studentID == user_table.c.userID)
+            .where(student_table.c.rollNumber.like(pattern, escape="\\"), *filters),
+        ).subquery()
+        page = select(matching.c.userID).order_by(matching.c.userID).limit(limit + 1).subquery()
+    else:
+        page = select(user_table.c.userID).where(*filters).order_by(user_table.c.userID).limit(limit + 1).subquery()
+
+    # A derived table rather than IN (... LIMIT ...), which MySQL does not support
+    rows = (await db.execute(
+        select(user_table.c.userID, user_table.c.name, user_table.c.email, user_table.c.role, student_table.c.rollNumber)
+        .join(page, page.c.userID == user_table.c.userID)
+        .outerjoin(student_table, student_table.c.studentID == user_table.c.userID)
+        .order_by(user_table.c.userID)
+    )).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "users": [
+            {"userID": row.userID, "name": row.name, "email": row.email,
+             "role": UserRole(row.role).value, "rollNumber": row.rollNumber}
+            for row in rows
+        ],
+        "next_after": rows[-1].userID if has_more else None,
+    }
+
+
+async def search_students(db: AsyncSession, q: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list:
+    """Students whose name or roll number starts with `q` (both indexed), ordered by name."""
+    q = (q or "").strip()
+    if not q:
+        return []
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    pattern = _prefix_pattern(q)
+    rows = (await db.execute(
+        select(student_table.c.rollNumber, user_table.c.name)
+        .join(user_table, user_table.c.userID == student_table.c.studentID)
+        .where(or_(user_table.c.name.like(pattern, escape="\\"), student_table.c.rollNumber.like(pattern, escape="\\")))
+        .order_by(user_table.c.name)
+        .limit(limit)
+    )).all()
+    return [{"roll_number": row.rollNumber, "name": row.name} for row in rows]
+
+
+# --- Full student roster ---
+# Serialized once per worker with a content-hash ETag, so repeat requests can be
+# answered with 304 Not Modified. Any change to a Student drops the cached copy.
+roster_cache = TTLCache(ttl_seconds=config.STUDENT_ROSTER_CACHE_SECONDS, max_entries=1)
+
+def _invalidate_roster(mapper, connection, target):
+    roster_cache.clear()
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(Student, _event, _invalidate_roster, propagate=True)
+
+
+async def get_student_roster(db: AsyncSession) -> Tuple[str, bytes]:
+    """Returns (etag, JSON body) for the list of all students ordered by name."""
+    cached = roster_cache.get("roster")
+    if cached is not None:
+        return cached
+    rows = (await db.execute(
+        select(student_table.c.rollNumber, user_table.c.name)
+        .join(user_table, user_table.c.userID == student_table.c.studentID)
+        .order_by(user_table.c.name)
+    )).all()
+    body = json.dumps([{"roll_number": row.rollNumber, "name": row.name} for row in rows]).encode()
+    # Weak: the gzip middleware may send the body compressed under the same ETag
+    etag = 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    roster_cache.set("roster", (etag, body))
+    return etag, body
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value matches the ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    def opaque(tag):
+        return tag[2:] if tag.startswith("W/") else tag
+    return opaque(etag) in (opaque(tag.strip()) for tag in if_none_match.split(","))
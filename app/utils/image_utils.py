@@ -1,18 +1,51 @@
-import numpy as np
-import cv2
+from typing import TYPE_CHECKING, Optional
 from fastapi import UploadFile
 
-async def to_cv2_image(file: UploadFile) -> np.ndarray:
+from .. import config
+
+# cv2 and numpy are imported on first use so that importing the app stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+def decode_image(contents: bytes) -> "np.ndarray":
     """
-    Converts a FastAPI UploadFile object to a CV2 image (numpy array).
+    Decodes raw image bytes into a CV2 image (numpy array).
+    Returns None if the bytes are not a decodable image.
     """
-    # Read the file content into a byte stream
-    contents = await file.read()
-    
+    import cv2
+    import numpy as np
+
     # Convert byte stream to a numpy array
     nparr = np.frombuffer(contents, np.uint8)
-    
+
     # Decode the numpy array into a CV2 image
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    return img
\ No newline at end of file
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+async def to_cv2_image(file: UploadFile) -> "np.ndarray":
+    """
+    Converts a FastAPI UploadFile object to a CV2 image (numpy array).
+    """
+    # Read the file content into a byte stream
+    contents = await file.read()
+
+    return decode_image(contents)
+
+def normalize_face(gray: "np.ndarray", equalize: Optional[bool] = None) -> "np.ndarray":
+    """
+    Brings a grayscale face crop to the fixed FACE_SIZE x FACE_SIZE square and, if
+    FACE_EQUALIZE_HISTOGRAM (or `equalize`) is set, equalizes its histogram. Every face
+    goes through this before LBPH, in training and recognition alike. Registration
+    stores crops already resized (equalize=False), so the equalization setting can be
+    changed without touching the stored crops; the resize is then a no-op.
+    """
+    import cv2
+
+    if equalize is None:
+        equalize = config.FACE_EQUALIZE_HISTOGRAM
+    size = config.FACE_SIZE
+    if gray.shape[:2] != (size, size):
+        shrinking = gray.shape[0] > size or gray.shape[1] > size
+        gray = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR)
+    if equalize:
+        gray = cv2.equalizeHist(gray)
+    return gray
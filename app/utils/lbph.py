@@ -0,0 +1,124 @@
+import math
+
+import numpy as np
+
+# --- Local Binary Patterns Histograms (LBPH) in NumPy ---
+# Same algorithm and parameters as OpenCV's cv2.face.LBPHFaceRecognizer_create()
+# defaults (radius 1, 8 neighbors, 8x8 grid, chi-square distance), so it produces the
+# same histograms and predictions. Unlike the OpenCV recognizer, the training
+# histograms are a plain array that can be memory-mapped and shared between processes.
+
+RADIUS = 1
+NEIGHBORS = 8
+GRID_X = 8
+GRID_Y = 8
+PATTERNS = 2 ** NEIGHBORS
+HISTOGRAM_SIZE = GRID_X * GRID_Y * PATTERNS
+
+# Training faces compared per step in distances(), bounding the temporary arrays to ~16 MB
+DISTANCE_CHUNK_SAMPLES = 1024
+
+_FLOAT_EPSILON = np.finfo(np.float32).eps
+
+
+def _sample_points():
+    """Bilinear sample offsets and weights of each neighbor, computed as OpenCV does (float32)."""
+    points = []
+    for n in range(NEIGHBORS):
+        x = np.float32(RADIUS * math.cos(2.0 * math.pi * n / NEIGHBORS))
+        y = np.float32(-RADIUS * math.sin(2.0 * math.pi * n / NEIGHBORS))
+        fx, fy = int(math.floor(x)), int(math.floor(y))
+        cx, cy = int(math.ceil(x)), int(math.ceil(y))
+        tx, ty = x - np.float32(fx), y - np.float32(fy)
+        one = np.float32(1)
+        weights = ((one - tx) * (one - ty), tx * (one - ty), (one - tx) * ty, tx * ty)
+        points.append(((fy, fx), (fy, cx), (cy, fx), (cy, cx), weights))
+    return points
+
+
+_POINTS = _sample_points()
+
+
+def lbp_image(gray: np.ndarray) -> np.ndarray:
+    """Extended (circular) LBP codes of a grayscale image, without the 1px border."""
+    src = np.asarray(gray, dtype=np.float32)
+    rows, cols = src.shape
+    if rows <= 2 * RADIUS or cols <= 2 * RADIUS:
+        return np.zeros((0, 0), dtype=np.int32)
+
+    def shifted(dy, dx):
+        return src[RADIUS + dy:rows - RADIUS + dy, RADIUS + dx:cols - RADIUS + dx]
+
+    center = shifted(0, 0)
+    codes = np.zeros(center.shape, dtype=np.int32)
+    for n, (p1, p2, p3, p4, (w1, w2, w3, w4)) in enumerate(_POINTS):
+        t = w1 * shifted(*p1) + w2 * shifted(*p2) + w3 * shifted(*p3) + w4 * shifted(*p4)
+        codes += ((t > center) | (np.abs(t - center) < _FLOAT_EPSILON)).astype(np.int32) << n
+    return codes
+
+
+def spatial_histogram(gray: np.ndarray) -> np.ndarray:
+    """Concatenated, per-cell normalized LBP histograms (float32, HISTOGRAM_SIZE values)."""
+    codes = lbp_image(gray)
+    height, width = codes.shape[0] // GRID_Y, codes.shape[1] // GRID_X
+    if height == 0 or width == 0:
+        return np.zeros(HISTOGRAM_SIZE, dtype=np.float32)
+    cells = codes[:height * GRID_Y, :width * GRID_X].reshape(GRID_Y, height, GRID_X, width)
+    cell_index = np.arange(GRID_Y * GRID_X, dtype=np.int64).reshape(GRID_Y, 1, GRID_X, 1)
+    counts = np.bincount((cell_index * PATTERNS + cells).ravel(), minlength=HISTOGRAM_SIZE)
+    return (counts.astype(np.float32) / np.float32(height * width))
+
+
+def _cell_pixels(shape) -> int:
+    rows, cols = shape[0] - 2 * RADIUS, shape[1] - 2 * RADIUS
+    return max(0, rows // GRID_Y) * max(0, cols // GRID_X)
+
+
+def training_arrays(faces) -> tuple:
+    """
+    Training data for distances()/predict(): (histograms, totals, scale).
+    The histograms of all faces are stored bin-major (HISTOGRAM_SIZE x faces) so a query's
+    non-zero bins are contiguous rows; totals is each histogram's sum. When all faces have
+    the same size (normalized crops) and a cell has at most 255 pixels, the histograms are
+    kept as 8-bit pixel counts, a quarter of the float32 size; multiplying by `scale`
+    (1 / pixels per cell) gives the normalized values back exactly.
+    """
+    histograms = np.stack([spatial_histogram(face) for face in faces], axis=1)
+    totals = histograms.sum(axis=0, dtype=np.float64)
+    shapes = {face.shape for face in faces}
+    cell_pixels = _cell_pixels(next(iter(shapes))) if len(shapes) == 1 else 0
+    if 0 < cell_pixels <= 255:
+        return np.rint(histograms * cell_pixels).astype(np.uint8), totals, 1.0 / cell_pixels
+    return histograms, totals, 1.0
+
+
+def distances(histograms: np.ndarray, totals: np.ndarray, query: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    """
+    Chi-square distance (OpenCV HISTCMP_CHISQR_ALT) from the query to each training histogram:
+    2 * sum((h - q)^2 / (h + q)). Where q is 0 a term is just h, so only the query's
+    non-zero bins are compared bin by bin; the rest comes from the histogram totals.
+    """
+    bins = np.flatnonzero(query)
+    query = np.asarray(query, dtype=np.float32)[bins][:, None]
+    samples = histograms.shape[1]
+    result = np.empty(samples, dtype=np.float64)
+    for start in range(0, samples, DISTANCE_CHUNK_SAMPLES):
+        end = min(start + DISTANCE_CHUNK_SAMPLES, samples)
+        compared = histograms[bins, start:end].astype(np.float32, copy=False)
+        if scale != 1.0:
+            compared *= np.float32(scale)
+        rest = totals[start:end] - compared.sum(axis=0, dtype=np.float64)
+        diff = compared - query
+        diff *= diff
+        diff /= compared + query
+        result[start:end] = 2.0 * (rest + diff.sum(axis=0, dtype=np.float64))
+    return result
+
+
+def predict(histograms: np.ndarray, totals: np.ndarray, labels: np.ndarray, gray: np.ndarray, scale: float = 1.0):
+    """(label, distance) of the nearest training histogram, or (-1, inf) without training data."""
+    if len(labels) == 0:
+        return -1, float("inf")
+    all_distances = distances(histograms, totals, spatial_histogram(gray), scale)
+    nearest = int(np.argmin(all_distances))
+    return int(labels[nearest]), float(all_distances[nearest])
@@ -0,0 +1,189 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# --- In-process metrics registry ---
+# Metrics live in the worker process and are rendered in the Prometheus text
+# format by the /metrics route. Recording a sample is a dict lookup and a few
+# additions under a lock, so the instrumentation can stay on under full load.
+
+# Bucket upper bounds (seconds) sized for the per-stage cost of one frame
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels: dict):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. faces detected."""
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, e.g. connections checked out."""
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """A distribution of observed values in cumulative buckets, e.g. stage latency."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., +Inf count], sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', repr(float(bound))))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def render_latest() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Attendance hot path metrics ---
+STAGE_SECONDS = Histogram(
+    "smart_presence_stage_seconds",
+    "Time spent in each processing stage of a frame.",
+    ("endpoint", "detector", "stage"),
+)
+FACES_DETECTED = Counter(
+    "smart_presence_faces_detected_total",
+    "Faces found by the detector.",
+    ("endpoint", "detector"),
+)
+FACES_RECOGNIZED = Counter(
+    "smart_presence_faces_recognized_total",
+    "Detected faces matched to a known student with sufficient confidence.",
+    ("endpoint", "detector"),
+)
+FRAMES_REJECTED = Counter(
+    "smart_presence_frames_rejected_total",
+    "Frames that could not be processed, by reason.",
+    ("endpoint", "detector", "reason"),
+)
+MODEL_RELOADS = Counter(
+    "smart_presence_model_reloads_total",
+    "Times the recognition model was read from disk.",
+    ("detector",),
+)
+
+
+class StageTimings:
+    """
+    Accumulates per-stage wall time for one request and records each stage once.
+    A stage may be entered several times (e.g. interleaved DB queries); its total is observed.
+    """
+
+    def __init__(self, endpoint: str, detector: str):
+        self.endpoint = endpoint
+        self.detector = detector
+        self._started = time.perf_counter()
+        self._stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages[name] = self._stages.get(name, 0.0) + (time.perf_counter() - start)
+
+    def reject(self, reason: str):
+        FRAMES_REJECTED.inc(endpoint=self.endpoint, detector=self.detector, reason=reason)
+
+    def observe(self):
+        """Records every accumulated stage plus the request total."""
+        for name, elapsed in self._stages.items():
+            STAGE_SECONDS.observe(elapsed, endpoint=self.endpoint, detector=self.detector, stage=name)
+        STAGE_SECONDS.observe(time.perf_counter() - self._started, endpoint=self.endpoint, detector=self.detector, stage="total")
@@ -0,0 +1,9 @@
+from passlib.hash import bcrypt
+
+# Worker function for process pools. This module only imports passlib so that
+# spawned worker processes start quickly.
+
+def hash_passwords(passwords: list, rounds: int) -> list:
+    """Hashes a chunk of passwords with bcrypt at the given cost."""
+    hasher = bcrypt.using(rounds=rounds)
+    return [hasher.hash(password) for password in passwords]
@@ -0,0 +1,70 @@
+import mimetypes
+import stat
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+# --- Static file serving ---
+# StaticFiles with a Cache-Control header and, when the client accepts it, a
+# precompressed .br / .gz copy of the file (written by build_static.py) in place
+# of the original. Nothing is compressed per request.
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows `encoding`: listed by name, or through "*",
+    with a non-zero quality ("gzip;q=0" refuses gzip).
+    """
+    qualities = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        name = name.strip()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    return qualities.get(encoding, qualities.get("*", 0.0)) > 0
+
+
+class CachedStaticFiles(StaticFiles):
+    def __init__(self, *args, cache_control: str = IMMUTABLE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await self._precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = self.cache_control
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _precompressed_response(self, path: str, scope: Scope):
+        if scope["method"] not in ("GET", "HEAD"):
+            return None
+        accepted = Headers(scope=scope).get("accept-encoding", "")
+        for encoding, suffix in ENCODINGS:
+            if not accepts_encoding(accepted, encoding):
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            response.headers["Content-Type"] = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response.headers["Content-Encoding"] = encoding
+            return response
+        return None
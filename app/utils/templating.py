@@ -0,0 +1,43 @@
+import json
+import threading
+
+from fastapi.templating import Jinja2Templates
+
+from .. import config
+
+# --- Shared Jinja2 templates ---
+# Every route module renders through this instance so template helpers are defined once.
+# asset_url("images/landing.gif") returns the content-hashed URL written by build_static.py
+# (served with immutable caching), or the plain /static URL when the assets are not built.
+
+MANIFEST_NAME = "manifest.json"
+
+_manifest_lock = threading.Lock()
+_manifest_cache = (None, {})
+
+
+def load_asset_manifest() -> dict:
+    """Source path -> hashed path under STATIC_BUILD_DIR; reloaded when the build changes."""
+    global _manifest_cache
+    path = config.STATIC_BUILD_DIR / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _manifest_cache[0] != mtime:
+        with _manifest_lock:
+            with open(path, encoding="utf-8") as f:
+                _manifest_cache = (mtime, json.load(f)["assets"])
+    return _manifest_cache[1]
+
+
+def asset_url(path: str) -> str:
+    path = path.lstrip("/")
+    hashed = load_asset_manifest().get(path)
+    if hashed:
+        return f"/static/build/{hashed}"
+    return f"/static/{path}"
+
+
+templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["asset_url"] = asset_url
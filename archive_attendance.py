@@ -0,0 +1,68 @@
+import argparse
+import datetime
+import sys
+import time
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from sqlalchemy.orm import Session
+from app.database.connection import SessionLocal
+from app.services import archive_service
+
+def archive_attendance():
+    """
+    Command-line script to move a closed term's attendance records out of the database
+    into a compressed archive file. Reports keep including archived terms.
+    """
+    parser = argparse.ArgumentParser(description="Archive the attendance records of a closed term.")
+    parser.add_argument("--term", help="Term name, e.g. 2024-25-sem1.")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="First day of the term (YYYY-MM-DD).")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="Last day of the term (YYYY-MM-DD).")
+    parser.add_argument("--batch-size", type=int, help="Rows deleted per transaction (default: ARCHIVE_BATCH_SIZE).")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the records that would be archived.")
+    parser.add_argument("--list", action="store_true", help="List the archived terms and exit.")
+    args = parser.parse_args()
+
+    print("--- Archive Attendance ---")
+
+    if args.list:
+        terms = archive_service.load_manifest()
+        if not terms:
+            print("\nNo terms have been archived yet.")
+        for term in terms:
+            pending = " (pending: re-run to finish deleting its records from the database)" if term.get("pending") else ""
+            print(f"{term['term']}: {term['start']} to {term['end']}, {term['rows']} records in {term['file']}{pending}")
+        return
+
+    if not (args.term and args.start and args.end):
+        parser.error("--term, --start and --end are required.")
+
+    db: Session = SessionLocal()
+    started = time.perf_counter()
+    try:
+        result = archive_service.archive_term(db, args.term, args.start, args.end,
+                                              dry_run=args.dry_run, batch_size=args.batch_size)
+    except ValueError as e:
+        print(f"\n❌ Error: {e}")
+        return
+    except Exception as e:
+        print(f"\n❌ An unexpected error occurred: {e}")
+        db.rollback()
+        return
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+
+    if args.dry_run:
+        print(f"\n{result['rows']} records would be archived for term '{args.term}'.")
+    elif result["rows"] == 0:
+        print(f"\nNo attendance records between {args.start} and {args.end}; nothing to archive.")
+    elif result["resumed"]:
+        print(f"\n✅ Term '{args.term}' was already archived; deleted {result['deleted']} remaining records in {elapsed:.1f}s.")
+    else:
+        print(f"\n✅ Success! Archived {result['rows']} records to {result['file']} "
+              f"and deleted {result['deleted']} from the database in {elapsed:.1f}s.")
+
+if __name__ == "__main__":
+    archive_attendance()
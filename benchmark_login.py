@@ -0,0 +1,154 @@
+import argparse
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from load_test import percentile, spawn_server
+
+BENCH_PASSWORD = "Bench!Passw0rd"
+PROBE_ENDPOINT = "/auth/login"
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def seed_users(database_url: str, count: int):
+    """Creates bench users (sharing one password hash) in a local (e.g. SQLite) database."""
+    os.environ["DATABASE_URL"] = database_url
+    from app.database.connection import SessionLocal, engine
+    from app.models.attendance import Base, Teacher, User
+    from app.services.auth_service import get_password_hash
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        existing = {email for (email,) in db.query(User.email).filter(User.email.like("bench%@example.com"))}
+        hashed_password = get_password_hash(BENCH_PASSWORD)
+        for i in range(count):
+            email = f"bench{i}@example.com"
+            if email not in existing:
+                db.add(Teacher(name=f"Bench User {i}", email=email, hashed_password=hashed_password))
+        db.commit()
+    finally:
+        db.close()
+
+
+def login(base_url: str, email: str, timeout: float) -> bool:
+    body = urllib.parse.urlencode({"username": email, "password": BENCH_PASSWORD}).encode()
+    request = urllib.request.Request(base_url + "/auth/login", data=body, method="POST")
+    try:
+        _opener.open(request, timeout=timeout).read()
+    except urllib.error.HTTPError as e:
+        # A successful login answers with a 303 redirect
+        return e.code == 303
+    except Exception:
+        return False
+    return False
+
+
+def probe(base_url: str, timeout: float) -> bool:
+    try:
+        urllib.request.urlopen(base_url + PROBE_ENDPOINT, timeout=timeout).read()
+        return True
+    except Exception:
+        return False
+
+
+def run_level(args, concurrency: int):
+    """
+    Fires logins from `concurrency` clients for the step duration while a separate
+    client keeps requesting a cheap page, to show whether logins stall the worker.
+    """
+    deadline = time.monotonic() + args.duration
+    login_latencies, probe_latencies = [], []
+    failures = [0]
+    lock = threading.Lock()
+    counter = [0]
+
+    def login_client():
+        while time.monotonic() < deadline:
+            with lock:
+                email = f"bench{counter[0] % args.users}@example.com"
+                counter[0] += 1
+            start = time.monotonic()
+            ok = login(args.base_url, email, args.timeout)
+            with lock:
+                login_latencies.append(time.monotonic() - start)
+                if not ok:
+                    failures[0] += 1
+
+    def probe_client():
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            probe(args.base_url, args.timeout)
+            probe_latencies.append(time.monotonic() - start)
+            time.sleep(0.05)
+
+    with ThreadPoolExecutor(max_workers=concurrency + 1) as pool:
+        pool.submit(probe_client)
+        for _ in range(concurrency):
+            pool.submit(login_client)
+
+    login_latencies.sort()
+    probe_latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "logins": len(login_latencies),
+        "logins_per_s": round(len(login_latencies) / args.duration, 2),
+        "failures": failures[0],
+        "login_p50_ms": round(percentile(login_latencies, 50) * 1000, 1),
+        "login_p95_ms": round(percentile(login_latencies, 95) * 1000, 1),
+        "probe_p50_ms": round(percentile(probe_latencies, 50) * 1000, 1),
+        "probe_p95_ms": round(percentile(probe_latencies, 95) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures login throughput and the latency of other requests under concurrent logins.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Server to test (ignored with --spawn).")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="Comma-separated numbers of concurrent login clients.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run each level.")
+    parser.add_argument("--users", type=int, default=50, help="Number of bench users to log in as.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+    parser.add_argument("--database-url", default="sqlite:///data/loadtest.db", help="Database used with --seed/--spawn.")
+    parser.add_argument("--seed", action="store_true", help="Create the bench users in --database-url first.")
+    parser.add_argument("--spawn", action="store_true", help="Start a local uvicorn server against --database-url.")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn.")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn.")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_users(args.database_url, args.users)
+
+    server = spawn_server(args) if args.spawn else None
+
+    print(f"--- Login benchmark against {args.base_url} ---")
+    print("BCRYPT_ROUNDS and PASSWORD_HASH_WORKERS are read by the server from its environment.")
+    try:
+        for concurrency in [int(n) for n in args.concurrency.split(",") if n.strip()]:
+            row = run_level(args, concurrency)
+            print(f"{row['concurrency']:>4} clients  {row['logins_per_s']:>8} logins/s  "
+                  f"login p50 {row['login_p50_ms']:>8} ms  p95 {row['login_p95_ms']:>8} ms  "
+                  f"other requests p50 {row['probe_p50_ms']:>7} ms  p95 {row['probe_p95_ms']:>7} ms  "
+                  f"failures {row['failures']}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
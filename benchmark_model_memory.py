@@ -0,0 +1,133 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from app import config
+
+
+def memory_kb():
+    """(RSS, PSS) of this process in kB. PSS splits shared pages between the processes
+    mapping them; it is only available on Linux (None elsewhere)."""
+    rss = pss = None
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except FileNotFoundError:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss, pss
+
+
+def worker(mode, model_path, probe, loaded, done, results):
+    """One stand-in uvicorn worker: loads the model, predicts once, reports its memory."""
+    import cv2
+    from app.services import model_store
+
+    before = memory_kb()
+    if mode == "opencv":
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(model_path)
+    else:
+        recognizer = model_store.load_model(model_store.current_version(model_path), model_dir=model_path)
+    recognizer.predict(probe)
+    # Measure once every worker holds the model, so shared pages are split between all of them
+    loaded.wait()
+    results.put((os.getpid(), before, memory_kb()))
+    done.wait()
+
+
+def run_mode(mode, model_path, probe, workers):
+    context = multiprocessing.get_context("spawn")
+    loaded, done = context.Barrier(workers), context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, model_path, probe, loaded, done, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get(timeout=300) for _ in processes]
+    done.wait()
+    for process in processes:
+        process.join()
+
+    print(f"\n{mode}: {workers} worker(s)")
+    print(f"{'pid':>8} {'RSS before':>11} {'RSS after':>10} {'PSS after':>10}   (MB)")
+    total_rss = total_pss = 0
+    for pid, (rss_before, _), (rss_after, pss_after) in rows:
+        total_rss += rss_after
+        total_pss += pss_after or 0
+        pss = f"{pss_after / 1024:10.1f}" if pss_after is not None else f"{'n/a':>10}"
+        print(f"{pid:>8} {rss_before / 1024:11.1f} {rss_after / 1024:10.1f} {pss}")
+    print(f"{'total':>8} {'':>11} {total_rss / 1024:10.1f} {total_pss / 1024 if total_pss else float('nan'):10.1f}")
+
+
+def benchmark_model_memory():
+    """
+    Command-line script comparing the per-worker memory of the former OpenCV LBPH
+    recognizer (a private copy of the model in every worker) with the memory-mapped model
+    store (one copy in the page cache shared by all workers). Both models are trained from
+    data/TrainingImage; --repeat tiles the samples to simulate a larger enrollment.
+    Also checks that both give the same predictions.
+    """
+    parser = argparse.ArgumentParser(description="Per-worker memory of the recognition model.")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes per run.")
+    parser.add_argument("--repeat", type=int, default=1, help="Use the training samples this many times.")
+    args = parser.parse_args()
+
+    print("--- Recognition Model Memory Benchmark ---")
+    import cv2
+    import numpy as np
+    from app.services import face_rec_service, model_store
+    from app.utils import lbph
+
+    faces, ids = face_rec_service.get_images_and_labels(config.TRAINING_IMAGE_DIR)
+    if len(set(ids)) < 2:
+        print("\n❌ Error: data/TrainingImage needs face samples of at least two students.")
+        return
+    faces, ids = faces * args.repeat, ids * args.repeat
+    work_dir = tempfile.mkdtemp(prefix="model_memory_")
+    try:
+        started = time.perf_counter()
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.train(faces, np.array(ids))
+        yml_path = os.path.join(work_dir, "Trainner.yml")
+        recognizer.save(yml_path)
+        opencv_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        histograms, totals, scale = lbph.training_arrays(faces)
+        model_store.save_model(histograms, totals, np.array(ids, dtype=np.int64), model_dir=work_dir, info={"histogram_scale": scale})
+        store_seconds = time.perf_counter() - started
+        store_bytes = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(work_dir) for f in files) - os.path.getsize(yml_path)
+        print(f"\n{len(faces)} training samples. OpenCV model: {os.path.getsize(yml_path) / 2**20:.1f} MB in {opencv_seconds:.1f}s; "
+              f"model store: {store_bytes / 2**20:.1f} MB in {store_seconds:.1f}s.")
+
+        shared = model_store.load_model(model_store.current_version(work_dir), model_dir=work_dir)
+        checked = faces[:200]
+        matches, max_difference = 0, 0.0
+        for face in checked:
+            expected, got = recognizer.predict(face), shared.predict(face)
+            matches += expected[0] == got[0]
+            max_difference = max(max_difference, abs(expected[1] - got[1]))
+        print(f"Predictions: {matches}/{len(checked)} labels match OpenCV, largest distance difference {max_difference:.2e}.")
+
+        probe = faces[0]
+        run_mode("opencv", yml_path, probe, args.workers)
+        run_mode("mmap", work_dir, probe, args.workers)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n✅ Done. RSS counts shared pages in every worker; PSS shows each worker's share.")
+
+
+if __name__ == "__main__":
+    benchmark_model_memory()
@@ -0,0 +1,87 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from app import config
+from app.utils.templating import MANIFEST_NAME
+
+# Text formats worth compressing; images and fonts are already compressed
+COMPRESSIBLE = {".css", ".js", ".mjs", ".json", ".map", ".svg", ".html", ".txt", ".xml", ".ico"}
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip copies are written without it
+    brotli = None
+
+def _hashed_name(relative_path: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest}{ext}"
+
+def _write_if_smaller(path: str, data: bytes, original_size: int) -> bool:
+    if len(data) >= original_size * 0.9:
+        return False
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+def build_static():
+    """
+    Command-line script to build the static assets for production: copies every file in
+    app/static to app/static/build under a content-hashed name, writes gzip (and brotli, if
+    installed) copies of text assets, and a manifest read by the asset_url() template helper.
+    Hashed files from earlier builds are kept so cached pages can still load them.
+    """
+    parser = argparse.ArgumentParser(description="Build content-hashed, precompressed static assets.")
+    parser.add_argument("--clean", action="store_true", help="Delete earlier builds first.")
+    args = parser.parse_args()
+
+    print("--- Build Static Assets ---")
+    source_dir, build_dir = config.STATIC_DIR, config.STATIC_BUILD_DIR
+    if args.clean and build_dir.exists():
+        shutil.rmtree(build_dir)
+
+    manifest, compressed = {}, 0
+    try:
+        for dirpath, dirnames, filenames in os.walk(source_dir):
+            dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != str(build_dir)]
+            for filename in sorted(filenames):
+                source = os.path.join(dirpath, filename)
+                relative = os.path.relpath(source, source_dir).replace(os.sep, "/")
+                with open(source, "rb") as f:
+                    data = f.read()
+                hashed = _hashed_name(relative, data)
+                target = build_dir / hashed
+                target.parent.mkdir(parents=True, exist_ok=True)
+                if not target.exists():
+                    shutil.copy2(source, target)
+                if os.path.splitext(filename)[1].lower() in COMPRESSIBLE:
+                    compressed += _write_if_smaller(f"{target}.gz", gzip.compress(data, compresslevel=9, mtime=0), len(data))
+                    if brotli is not None:
+                        compressed += _write_if_smaller(f"{target}.br", brotli.compress(data), len(data))
+                manifest[relative] = hashed
+                print(f"{relative} -> {hashed}")
+
+        build_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = build_dir / MANIFEST_NAME
+        tmp_path = manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"assets": manifest}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+    except Exception as e:
+        print(f"\n❌ An unexpected error occurred: {e}")
+        return
+
+    if brotli is None:
+        print("\n(brotli is not installed: only gzip copies were written)")
+    print(f"\n✅ Success! {len(manifest)} asset(s) built, {compressed} precompressed file(s) written to {build_dir}.")
+
+if __name__ == "__main__":
+    build_static()
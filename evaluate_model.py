@@ -0,0 +1,85 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from fastapi import HTTPException
+from app import config
+from app.services import evaluation_service, face_rec_service, model_store
+
+def _thresholds(value: str):
+    return [float(t) for t in value.split(",") if t.strip()]
+
+def evaluate_model():
+    """
+    Command-line script to evaluate the recognition model on a per-student split of
+    data/TrainingImage: accuracy, false-accept rate and per-face predict latency for each
+    threshold, and a recommended threshold. --write stores the recommendation with the
+    served model version (the app then uses it); --publish instead retrains the served model
+    on all samples and publishes it with the recommendation, unless the evaluation regressed
+    against the served model's calibration.
+    """
+    parser = argparse.ArgumentParser(description="Evaluate the face recognition model and calibrate its threshold.")
+    parser.add_argument("--image-dir", type=Path, default=config.TRAINING_IMAGE_DIR, help="Default: data/TrainingImage.")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of each student's samples held out (default 0.2).")
+    parser.add_argument("--strangers", type=int, default=1, help="Students left out of training to test false accepts.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random split.")
+    parser.add_argument("--thresholds", type=_thresholds, help="Comma-separated thresholds (default 20,25,...,150).")
+    parser.add_argument("--max-far", type=float, help="Highest acceptable false-accept rate (default MAX_FALSE_ACCEPT_RATE).")
+    parser.add_argument("--write", action="store_true", help="Store the recommended threshold with the served model.")
+    parser.add_argument("--publish", action="store_true", help="Also retrain and publish the served model, unless it regressed.")
+    parser.add_argument("--force", action="store_true", help="With --publish, publish even if the evaluation regressed.")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON.")
+    args = parser.parse_args()
+
+    print("--- Evaluate Recognition Model ---")
+    try:
+        report = evaluation_service.evaluate(
+            image_dir=args.image_dir, holdout=args.holdout, strangers=args.strangers, seed=args.seed,
+            thresholds=args.thresholds or evaluation_service.DEFAULT_THRESHOLDS,
+            max_false_accept_rate=args.max_far,
+        )
+    except (ValueError, HTTPException) as e:
+        print(f"\n❌ Error: {getattr(e, 'detail', e)}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"\nTrained on {report['train_samples']} samples of {report['students']} students in {report['train_seconds']:.1f}s; "
+              f"held out {report['held_out_samples']} samples and {report['stranger_samples']} of {report['strangers']} stranger(s).")
+        latency = report["latency_ms"]
+        print(f"Predict latency per face: mean {latency['mean']:.2f} ms, p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms.\n")
+        print(f"{'threshold':>9} {'accuracy':>9} {'FAR':>7} {'FRR':>7}")
+        for row in report["thresholds"]:
+            marker = "  <- recommended" if row is report["recommended"] else ""
+            print(f"{row['threshold']:>9g} {row['accuracy']:>9.1%} {row['false_accept_rate']:>7.1%} {row['false_reject_rate']:>7.1%}{marker}")
+
+    recommended = report["recommended"]
+    if not report["meets_target"]:
+        print(f"\n⚠️ No threshold keeps the false-accept rate within {report['max_false_accept_rate']:.1%}; "
+              f"recommending the lowest one ({recommended['false_accept_rate']:.1%}).")
+    print(f"\nRecommended threshold: {recommended['threshold']:g} "
+          f"(current: {model_store.calibrated_threshold() or config.RECOGNITION_CONFIDENCE_THRESHOLD:g})")
+
+    if args.publish:
+        problem = evaluation_service.find_regression(report, model_store.load_calibration())
+        if problem and not args.force:
+            print(f"\n❌ Not published: {problem} Use --force to publish anyway.")
+            sys.exit(1)
+        result = face_rec_service.train_model(image_dir=args.image_dir, gate=False,
+                                              calibration=evaluation_service.calibration(report))
+        print(f"\n✅ {result['message']} Published with threshold {recommended['threshold']:g}.")
+    elif args.write:
+        try:
+            version = model_store.save_calibration(evaluation_service.calibration(report))
+        except ValueError as e:
+            print(f"\n❌ Error: {e} Train the model first, or use --publish.")
+            sys.exit(1)
+        print(f"\n✅ Threshold {recommended['threshold']:g} stored with model {version}.")
+
+if __name__ == "__main__":
+    evaluate_model()
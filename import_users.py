@@ -0,0 +1,50 @@
+import argparse
+import sys
+import time
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from sqlalchemy.orm import Session
+from app.database.connection import SessionLocal
+from app.services import import_service
+
+def import_users():
+    """
+    Command-line script to bulk-import students and teachers from a CSV file with the
+    columns role, name, email, password and optionally rollNumber, class.
+    Passwords are hashed at IMPORT_BCRYPT_ROUNDS and re-hashed at BCRYPT_ROUNDS on each
+    user's first login.
+    """
+    parser = argparse.ArgumentParser(description="Bulk-import students and teachers from a CSV file.")
+    parser.add_argument("csv_file", help="CSV file to import.")
+    parser.add_argument("--report", default="import_errors.csv", help="Where to write the per-row error report.")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only; do not create any users.")
+    args = parser.parse_args()
+
+    print("--- Bulk Import Users ---")
+
+    db: Session = SessionLocal()
+    start = time.perf_counter()
+    try:
+        with open(args.csv_file, newline="", encoding="utf-8-sig") as f:
+            report = import_service.import_users(db, f, dry_run=args.dry_run)
+    except OSError as e:
+        print(f"\n❌ Error: Could not read '{args.csv_file}': {e}")
+        return
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+
+    verb = "would be created" if args.dry_run else "created"
+    print(f"\nRead {report.rows} rows in {elapsed:.1f}s: {report.created} users {verb} "
+          f"({report.students} students, {report.teachers} teachers), {len(report.errors)} rejected.")
+    if report.errors:
+        with open(args.report, "w", newline="") as f:
+            report.write_errors_csv(f)
+        print(f"❌ Rejected rows were written to {args.report}")
+    else:
+        print("✅ Success! Every row was imported." if not args.dry_run else "✅ Every row is valid.")
+
+if __name__ == "__main__":
+    import_users()
@@ -0,0 +1,268 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+REALTIME_TEMPLATE = Path("app/templates/teacher/realtime_attendance.html")
+
+# Fallbacks if the constants can no longer be found in the template
+DEFAULT_UI_UPDATE_FREQUENCY_MS = 200
+DEFAULT_MARKING_FREQUENCY_MS = 5000
+
+RECOGNIZE_ENDPOINT = "/attendance/recognize-frame"
+MARK_ENDPOINT = "/attendance/mark"
+
+
+def read_browser_frequencies(template_path: Path = REALTIME_TEMPLATE):
+    """
+    Reads UI_UPDATE_FREQUENCY and MARKING_FREQUENCY (ms) from the realtime page
+    so the load generator keeps replaying what the browser actually does.
+    """
+    ui_ms, marking_ms = DEFAULT_UI_UPDATE_FREQUENCY_MS, DEFAULT_MARKING_FREQUENCY_MS
+    try:
+        source = template_path.read_text(encoding="utf-8")
+    except OSError:
+        return ui_ms, marking_ms
+    match = re.search(r"UI_UPDATE_FREQUENCY\s*=\s*(\d+)", source)
+    if match:
+        ui_ms = int(match.group(1))
+    match = re.search(r"MARKING_FREQUENCY\s*=\s*(\d+)", source)
+    if match:
+        marking_ms = int(match.group(1))
+    return ui_ms, marking_ms
+
+
+def load_frames(frames_dir: Path):
+    """Loads the JPEG frames that virtual webcams will send."""
+    frames = [p.read_bytes() for p in sorted(frames_dir.glob("*.jp*g"))]
+    if not frames:
+        raise SystemExit(f"❌ Error: No .jpg frames found in '{frames_dir}'.")
+    return frames
+
+
+def encode_multipart(fields: dict, image: bytes):
+    """Builds the same multipart body the browser's FormData produces."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image_file"; filename="blob"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'.encode() + image + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class StepResults:
+    """Thread-safe collection of request outcomes for one concurrency step."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {RECOGNIZE_ENDPOINT: [], MARK_ENDPOINT: []}
+
+    def record(self, endpoint: str, latency: float, outcome: str):
+        with self._lock:
+            self.samples[endpoint].append((latency, outcome))
+
+
+def send_frame(base_url: str, endpoint: str, fields: dict, image: bytes, timeout: float):
+    """
+    Posts one frame and classifies the outcome:
+    'ok' (2xx), 'rejected' (4xx, e.g. no faces / no known student) or 'error' (5xx, timeouts).
+    """
+    body, content_type = encode_multipart(fields, image)
+    request = urllib.request.Request(base_url + endpoint, data=body, method="POST",
+                                     headers={"Content-Type": content_type})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return "ok"
+    except urllib.error.HTTPError as e:
+        return "rejected" if e.code < 500 else "error"
+    except Exception:
+        return "error"
+
+
+def run_step(args, classrooms: int, frames, ui_ms: int, marking_ms: int) -> StepResults:
+    """
+    Runs N virtual classrooms for one step. Requests are fired on a fixed schedule
+    like the browser's setInterval (open loop), and latency is measured from the
+    scheduled send time so server-side queueing is not hidden.
+    """
+    results = StepResults()
+    deadline = time.monotonic() + args.step_duration
+    frame_cycle = itertools.cycle(frames)
+    frame_lock = threading.Lock()
+
+    def next_frame():
+        with frame_lock:
+            return next(frame_cycle)
+
+    def fire(endpoint, fields, scheduled):
+        outcome = send_frame(args.base_url, endpoint, fields, next_frame(), args.timeout)
+        results.record(endpoint, time.monotonic() - scheduled, outcome)
+
+    # Each classroom has a UI loop and a marking loop, started at a random phase
+    schedule = []
+    start = time.monotonic()
+    for _ in range(classrooms):
+        schedule.append([start + random.uniform(0, ui_ms / 1000), ui_ms / 1000, RECOGNIZE_ENDPOINT, {}])
+        schedule.append([start + random.uniform(0, marking_ms / 1000), marking_ms / 1000, MARK_ENDPOINT, {"subject": args.subject}])
+
+    max_workers = max(4, classrooms * args.max_in_flight)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            entry = min(schedule, key=lambda e: e[0])
+            if entry[0] >= deadline:
+                break
+            delay = entry[0] - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, entry[2], entry[3], entry[0])
+            entry[0] += entry[1]
+    return results
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(label: str, classrooms: int, duration: float, results: StepResults):
+    """Turns raw samples into one saturation-curve row per endpoint."""
+    rows = []
+    for endpoint, samples in results.samples.items():
+        latencies = sorted(latency for latency, _ in samples)
+        total = len(samples)
+        errors = sum(1 for _, outcome in samples if outcome == "error")
+        rejected = sum(1 for _, outcome in samples if outcome == "rejected")
+        rows.append({
+            "label": label,
+            "classrooms": classrooms,
+            "endpoint": endpoint,
+            "requests": total,
+            "throughput_rps": round(total / duration, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round((latencies[-1] if latencies else 0) * 1000, 1),
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "rejected_rate": round(rejected / total, 4) if total else 0.0,
+        })
+    return rows
+
+
+def seed_database(database_url: str, subject: str):
+    """Creates the schema and the subject used by the marking loop in a local (e.g. SQLite) database."""
+    os.environ["DATABASE_URL"] = database_url
+    from app.database.connection import SessionLocal, engine
+    from app.models.attendance import Base, Subject
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not db.query(Subject).filter(Subject.subjectName == subject).first():
+            db.add(Subject(subjectName=subject, description="Load test subject"))
+            db.commit()
+    finally:
+        db.close()
+
+
+def spawn_server(args):
+    """Starts a local uvicorn instance against the given database and waits until it answers."""
+    env = dict(os.environ, DATABASE_URL=args.database_url)
+    host, port = "127.0.0.1", str(args.port)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", port,
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=env,
+    )
+    args.base_url = f"http://{host}:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(args.base_url + "/metrics", timeout=1).read()
+            return process
+        except Exception:
+            if process.poll() is not None:
+                raise SystemExit("❌ Error: The server exited during startup.")
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("❌ Error: The server did not come up in time.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulates concurrent realtime attendance classrooms and reports a saturation curve.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Server to test (ignored with --spawn).")
+    parser.add_argument("--subject", default="Load Test 101", help="Subject name sent to /attendance/mark.")
+    parser.add_argument("--classrooms", default="1,2,4,8,16", help="Comma-separated concurrency steps.")
+    parser.add_argument("--step-duration", type=float, default=30.0, help="Seconds to run each step.")
+    parser.add_argument("--frames-dir", default="data/debug_uploads", help="Directory of .jpg frames to replay.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Client threads per classroom for overlapping requests.")
+    parser.add_argument("--label", default="local", help="Release label written to every output row.")
+    parser.add_argument("--output", default="saturation.csv", help="CSV file for the saturation curve.")
+    parser.add_argument("--database-url", default="sqlite:///data/loadtest.db", help="Database used with --seed/--spawn.")
+    parser.add_argument("--seed", action="store_true", help="Create the schema and subject in --database-url first.")
+    parser.add_argument("--spawn", action="store_true", help="Start a local uvicorn server against --database-url.")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn.")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn.")
+    args = parser.parse_args()
+
+    ui_ms, marking_ms = read_browser_frequencies()
+    frames = load_frames(Path(args.frames_dir))
+    steps = [int(n) for n in args.classrooms.split(",") if n.strip()]
+
+    if args.seed:
+        seed_database(args.database_url, args.subject)
+
+    server = spawn_server(args) if args.spawn else None
+
+    print(f"--- Load test '{args.label}' against {args.base_url} ---")
+    print(f"Browser cadence: recognize-frame every {ui_ms} ms, mark every {marking_ms} ms; {len(frames)} frames.")
+    all_rows = []
+    try:
+        for classrooms in steps:
+            results = run_step(args, classrooms, frames, ui_ms, marking_ms)
+            rows = summarize(args.label, classrooms, args.step_duration, results)
+            all_rows.extend(rows)
+            for row in rows:
+                print(f"{row['classrooms']:>4} classrooms  {row['endpoint']:<28} {row['throughput_rps']:>8} req/s  "
+                      f"p50 {row['p50_ms']:>8} ms  p95 {row['p95_ms']:>8} ms  p99 {row['p99_ms']:>8} ms  "
+                      f"errors {row['error_rate']:.2%}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(all_rows[0].keys()) if all_rows else ["label"])
+        writer.writeheader()
+        writer.writerows(all_rows)
+    with open(Path(args.output).with_suffix(".json"), "w") as f:
+        json.dump({"label": args.label, "ui_update_ms": ui_ms, "marking_ms": marking_ms, "steps": all_rows}, f, indent=2)
+    print(f"\n✅ Saturation curve written to {args.output} (and .json). Compare files across releases by 'label'.")
+
+
+if __name__ == "__main__":
+    main()
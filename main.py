@@ -1,28 +1,84 @@
 from fastapi import FastAPI, Request, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 from sqlalchemy.orm import Session
 from typing import Optional
+import asyncio
+import gzip
 import os
 
-from app.database import connection
+from app.database import connection, query_stats
 from app.models import attendance as models
-from app.routes import attendance, face_recognition, auth, teacher, admin, student
+from app.routes import attendance, face_recognition, auth, teacher, admin, student, metrics
 from app.services.auth_service import try_get_current_user, get_current_user_from_cookie
-from app.config import HAAR_CASCADE_PATH
+from app.services import attendance_service, profiler_service, stats_service
+from app.config import (
+    AUTO_CREATE_TABLES, GZIP_LEVEL, GZIP_MIN_SIZE, HAAR_CASCADE_PATH, SQL_DEBUG_HEADERS,
+    STATIC_BUILD_DIR, STATIC_CACHE_SECONDS, STATIC_DIR,
+)
+from app.utils.static_files import CachedStaticFiles, accepts_encoding
+from app.utils.templating import templates
 
 # Initialize the FastAPI app
 app = FastAPI(title="Smart Presence")
 
-# Create all database tables based on the models
-models.Base.metadata.create_all(bind=connection.engine)
+# The schema is created by `python migrate.py`, not on every boot
+if AUTO_CREATE_TABLES or connection.IN_MEMORY_DATABASE:
+    models.Base.metadata.create_all(bind=connection.engine)
+
+# Set once the startup warm-up has finished (see /ready)
+app.state.ready = False
+app.state.warm_up = {}
 
 # Mount the static files directory to serve images, css, etc.
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# Content-hashed copies from build_static.py (referenced via asset_url) never change, so
+# browsers cache them for a year; the plain files are cached for STATIC_CACHE_SECONDS.
+app.mount("/static/build", CachedStaticFiles(directory=STATIC_BUILD_DIR, check_dir=False), name="static_build")
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIR, cache_control=f"public, max-age={STATIC_CACHE_SECONDS}"), name="static")
+
+# Let every worker pick up admin-started profiling sessions
+@app.middleware("http")
+async def profiler_middleware(request: Request, call_next):
+    profiler_service.on_request()
+    return await call_next(request)
+
+# Count SQL statements and DB time per request (headers in development, metrics always)
+@app.middleware("http")
+async def query_stats_middleware(request: Request, call_next):
+    stats = query_stats.begin_request(request.scope)
+    response = await call_next(request)
+    response.body_iterator = query_stats.observe_after_body(response.body_iterator, stats)
+    if SQL_DEBUG_HEADERS:
+        # Sent before the body, so queries of a streamed body are only in the metrics
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-ms"] = f"{stats.seconds * 1000:.1f}"
+    return response
 
-# Initialize Jinja2 templates
-templates = Jinja2Templates(directory="app/templates")
+# After a successful write (routes depending on writes_data), send this browser's reads
+# to the primary for a while
+@app.middleware("http")
+async def read_your_writes_middleware(request: Request, call_next):
+    response = await call_next(request)
+    if connection.READ_REPLICA_ENABLED and getattr(request.state, "writes_data", False) and response.status_code < 400:
+        connection.mark_recent_write(response)
+    return response
+
+# Gzip JSON responses of at least GZIP_MIN_SIZE bytes (reports, searches) for clients that accept it
+@app.middleware("http")
+async def gzip_json_middleware(request: Request, call_next):
+    response = await call_next(request)
+    if (not accepts_encoding(request.headers.get("accept-encoding", ""), "gzip")
+            or not response.headers.get("content-type", "").startswith("application/json")
+            or "content-encoding" in response.headers):
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = [(k, v) for k, v in response.raw_headers if k != b"content-length"]
+    if len(body) >= GZIP_MIN_SIZE:
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers += [(b"content-encoding", b"gzip"), (b"vary", b"Accept-Encoding")]
+    buffered = Response(content=body, status_code=response.status_code)
+    buffered.raw_headers = headers + [(b"content-length", str(len(body)).encode())]
+    return buffered
 
 # --- Include all the application routers ---
 app.include_router(auth.router)
@@ -31,6 +87,7 @@ app.include_router(teacher.router)
 app.include_router(student.router)
 app.include_router(face_recognition.router)
 app.include_router(attendance.router)
+app.include_router(metrics.router)
 
 
 # --- Main application routes ---
@@ -59,11 +116,37 @@ async def dashboard(request: Request, current_user: models.User = Depends(get_cu
     else:
         raise HTTPException(status_code=403, detail="Unknown user role. Access denied.")
 
+@app.get("/ready")
+async def readiness():
+    """
+    Readiness probe: 503 until this worker has finished warming up its models, and for
+    good if the warm-up failed. Models that are unavailable (e.g. not trained yet) are
+    reported, not fatal.
+    """
+    body = {"ready": app.state.ready, "models": app.state.warm_up}
+    return JSONResponse(body, status_code=200 if app.state.ready else 503)
+
+async def warm_up_models():
+    """
+    Loads the detector and recognizer (importing OpenCV) off the event loop. If that
+    fails (e.g. OpenCV cannot be imported), the worker stays not ready with the error.
+    """
+    try:
+        app.state.warm_up = await run_in_threadpool(attendance_service.warm_up)
+    except Exception as e:
+        print(f"!!! ERROR: Model warm-up failed: {e}")
+        app.state.warm_up = {"error": str(e)}
+        return
+    app.state.ready = True
+
 @app.on_event("startup")
 async def startup_event():
     """
-    Checks for the Haar Cascade file on application startup.
+    Checks for the Haar Cascade file on application startup, starts the periodic
+    reconciliation of the dashboard counters and warms up the recognition models.
     """
+    app.state.stats_reconcile_task = asyncio.create_task(stats_service.reconcile_periodically())
+    app.state.warm_up_task = asyncio.create_task(warm_up_models())
     if not os.path.exists(HAAR_CASCADE_PATH):
         print("="*80)
         print(f"!! WARNING: Haar Cascade file not found !!")
@@ -0,0 +1,131 @@
+import sys
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from sqlalchemy import Date, MetaData, Table, delete, func, inspect, select, text, update
+from app.database.connection import SessionLocal, engine
+from app.models.attendance import AttendanceRecord, Base, StudentSubjectAttendance, User
+from app.services import rollup_service
+from app.services.auth_service import normalize_email
+from add_indexes import add_indexes
+
+def upgrade_attendance_records() -> int:
+    """
+    Adds attendance_record.date to databases created before it existed, fills it from the
+    timestamp, and deletes duplicate records of a student, subject and day (keeping the
+    first) so the unique key on them can be created. Returns the number of deleted rows.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns(AttendanceRecord.__tablename__)}
+    with engine.begin() as connection:
+        if "date" not in columns:
+            quote = engine.dialect.identifier_preparer.quote
+            connection.execute(text(
+                f"ALTER TABLE {quote(AttendanceRecord.__tablename__)} ADD COLUMN {quote('date')} {Date().compile(dialect=engine.dialect)}"
+            ))
+            print("Added attendance_record.date.")
+        connection.execute(
+            update(AttendanceRecord).where(AttendanceRecord.date.is_(None)).values(date=func.date(AttendanceRecord.timestamp))
+        )
+        first_records = (
+            select(func.min(AttendanceRecord.recordID).label("recordID"))
+            .group_by(AttendanceRecord.studentID, AttendanceRecord.subjectID, AttendanceRecord.date)
+            .subquery()
+        )
+        return connection.execute(
+            delete(AttendanceRecord).where(AttendanceRecord.recordID.not_in(select(first_records.c.recordID)))
+        ).rowcount
+
+# Indexes dropped from the models, replaced by ones on attendance_record.date
+REPLACED_INDEXES = {AttendanceRecord.__tablename__: ("ix_attendance_subject_time_student", "ix_attendance_student_time")}
+
+def drop_replaced_indexes() -> list:
+    """Drops indexes the models no longer declare. Returns their names."""
+    dropped = []
+    for table_name, names in REPLACED_INDEXES.items():
+        # Reflected separately so the models' metadata does not pick up the old indexes
+        table = Table(table_name, MetaData(), autoload_with=engine)
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in names:
+                index.drop(bind=engine)
+                dropped.append(index.name)
+    return dropped
+
+def backfill_rollups(force: bool = False) -> bool:
+    """
+    Builds the attendance rollups from the records when they are empty but records exist
+    (databases from before the rollups), or always with force. Returns whether it ran.
+    """
+    db = SessionLocal()
+    try:
+        if not force:
+            has_records = db.execute(select(AttendanceRecord.recordID).limit(1)).first() is not None
+            has_rollups = db.execute(select(StudentSubjectAttendance.studentID).limit(1)).first() is not None
+            if has_rollups or not has_records:
+                return False
+        rollup_service.rebuild(db)
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+def normalize_user_emails() -> list:
+    """
+    Stores existing emails normalized (trimmed, lowercase) as the app now looks them up.
+    An email whose normalized form belongs to another account is left alone and returned.
+    """
+    clashes = []
+    with engine.begin() as connection:
+        rows = connection.execute(select(User.userID, User.email)).all()
+        taken = {email for _, email in rows}
+        for user_id, email in rows:
+            normalized = normalize_email(email)
+            if normalized == email:
+                continue
+            if normalized in taken:
+                clashes.append(email)
+                continue
+            connection.execute(update(User).where(User.userID == user_id).values(email=normalized))
+            taken.discard(email)
+            taken.add(normalized)
+    return clashes
+
+def migrate():
+    """
+    Command-line script to bring the database schema up to date: creates missing tables,
+    upgrades older attendance records and builds their rollups, normalizes user emails,
+    drops replaced indexes, then creates missing indexes. The app no longer does this at
+    startup; run it when deploying.
+    """
+    print("--- Migrate Database Schema ---")
+
+    try:
+        existing = set(inspect(engine).get_table_names())
+        missing = [table.name for table in Base.metadata.sorted_tables if table.name not in existing]
+        Base.metadata.create_all(bind=engine)
+        duplicates = upgrade_attendance_records()
+        email_clashes = normalize_user_emails()
+        # Deleted duplicates were counted in the rollups, so rebuild them
+        rebuilt = backfill_rollups(force=bool(duplicates))
+        dropped = drop_replaced_indexes()
+    except Exception as e:
+        print(f"\n❌ An unexpected error occurred: {e}")
+        return
+
+    if missing:
+        print(f"\n✅ Created {len(missing)} table(s): {', '.join(missing)}")
+    else:
+        print("\n✅ All tables already exist.")
+    if duplicates:
+        print(f"Deleted {duplicates} duplicate attendance record(s) of a student, subject and day.")
+    if rebuilt:
+        print("Built the attendance rollups from the attendance records.")
+    if dropped:
+        print(f"Dropped replaced index(es): {', '.join(dropped)}")
+    for email in email_clashes:
+        print(f"⚠️ Not normalized: '{email}' differs only in case from another account's email. Please merge them.")
+    print()
+    add_indexes()
+
+if __name__ == "__main__":
+    migrate()
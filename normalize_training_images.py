@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from app import config
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def normalize_training_images():
+    """
+    One-off command-line script to resize the face crops saved before normalization
+    (at whatever size the detector box had) to FACE_SIZE x FACE_SIZE, in place.
+    Crops that already have the size are left alone, so it is safe to run again.
+    Retrain the model afterwards.
+    """
+    parser = argparse.ArgumentParser(description="Resize existing training face crops to FACE_SIZE.")
+    parser.add_argument("--image-dir", type=Path, default=config.TRAINING_IMAGE_DIR, help="Default: data/TrainingImage.")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the crops that would be resized.")
+    args = parser.parse_args()
+
+    print("--- Normalize Training Face Crops ---")
+    import cv2
+    from app.utils.image_utils import normalize_face
+
+    resized = unchanged = failed = 0
+    bytes_before = bytes_after = 0
+    for folder in sorted(os.listdir(args.image_dir)):
+        folder_path = args.image_dir / folder
+        if not folder_path.is_dir():
+            continue
+        for filename in sorted(os.listdir(folder_path)):
+            if not filename.endswith(IMAGE_EXTENSIONS):
+                continue
+            path = folder_path / filename
+            size = path.stat().st_size
+            bytes_before += size
+            gray = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                print(f"❌ Could not read {path}")
+                failed += 1
+                bytes_after += size
+                continue
+            if gray.shape == (config.FACE_SIZE, config.FACE_SIZE):
+                unchanged += 1
+                bytes_after += size
+                continue
+            resized += 1
+            if args.dry_run:
+                continue
+            # Write next to the original, then swap it in, so an interruption never leaves a broken crop
+            tmp_path = path.with_name(f".{path.stem}.tmp{path.suffix}")
+            if not cv2.imwrite(str(tmp_path), normalize_face(gray, equalize=False)):
+                print(f"❌ Could not write {tmp_path}")
+                failed += 1
+                continue
+            os.replace(tmp_path, path)
+            bytes_after += path.stat().st_size
+
+    if args.dry_run:
+        print(f"\n{resized} crop(s) would be resized to {config.FACE_SIZE}x{config.FACE_SIZE}; {unchanged} already are.")
+        return
+    print(f"\n✅ Success! Resized {resized} crop(s) to {config.FACE_SIZE}x{config.FACE_SIZE} "
+          f"({unchanged} already were, {failed} failed). "
+          f"Size on disk: {bytes_before / 1024:.0f} KB -> {bytes_after / 1024:.0f} KB.")
+    if resized:
+        print("Retrain the recognition model so it uses the normalized crops.")
+
+if __name__ == "__main__":
+    normalize_training_images()
@@ -0,0 +1,52 @@
+import argparse
+import sys
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from sqlalchemy.orm import Session
+from app.database.connection import SessionLocal, engine
+from app.models.attendance import Subject, SubjectDailyAttendance, StudentSubjectAttendance
+from app.services import rollup_service
+
+def rebuild_rollups():
+    """
+    Command-line script to (re)build the attendance rollup tables from attendance_record.
+    migrate.py builds them on upgrade; run this whenever records were written outside the app.
+    """
+    parser = argparse.ArgumentParser(description="Rebuild the attendance rollup tables from the raw attendance records.")
+    parser.add_argument("--subject", help="Only rebuild this subject (by name). Defaults to all subjects.")
+    args = parser.parse_args()
+
+    print("--- Rebuild Attendance Rollups ---")
+
+    # Make sure the rollup tables exist on databases created before they were added
+    SubjectDailyAttendance.__table__.create(bind=engine, checkfirst=True)
+    StudentSubjectAttendance.__table__.create(bind=engine, checkfirst=True)
+
+    db: Session = SessionLocal()
+    try:
+        subject_id = None
+        if args.subject:
+            subject = db.query(Subject).filter(Subject.subjectName == args.subject).first()
+            if not subject:
+                print(f"\n❌ Error: Subject '{args.subject}' not found.")
+                return
+            subject_id = subject.subjectID
+
+        rollup_service.rebuild(db, subject_id=subject_id)
+        db.commit()
+
+        days = db.query(SubjectDailyAttendance).count()
+        students = db.query(StudentSubjectAttendance).count()
+        scope = f"subject '{args.subject}'" if args.subject else "all subjects"
+        print(f"\n✅ Success! Rebuilt rollups for {scope}: {days} class-day rows, {students} student rows in total.")
+
+    except Exception as e:
+        print(f"\n❌ An unexpected error occurred: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_rollups()
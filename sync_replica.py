@@ -0,0 +1,50 @@
+import argparse
+import sqlite3
+import sys
+import time
+
+# We need to add the project root to the path to allow imports from 'app'
+sys.path.append('.')
+
+from sqlalchemy.engine import make_url
+from app import config
+
+def _sqlite_path(database_url: str, name: str) -> str:
+    url = make_url(database_url or "")
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise ValueError(f"{name} must point to a SQLite file (sqlite:///path/to/file.db).")
+    return url.database
+
+def sync_replica():
+    """
+    Command-line script that stands in for replication when testing the read replica
+    locally with two SQLite files: copies DATABASE_URL onto READ_DATABASE_URL, once or
+    every --interval seconds (which also simulates replication lag).
+    """
+    parser = argparse.ArgumentParser(description="Copy the primary SQLite database onto the read replica file.")
+    parser.add_argument("--interval", type=float, help="Keep copying every N seconds.")
+    args = parser.parse_args()
+
+    print("--- Sync SQLite Read Replica ---")
+    try:
+        primary_path = _sqlite_path(config.DATABASE_URL, "DATABASE_URL")
+        replica_path = _sqlite_path(config.READ_DATABASE_URL, "READ_DATABASE_URL")
+    except ValueError as e:
+        print(f"\n❌ Error: {e}")
+        return
+
+    while True:
+        primary = sqlite3.connect(primary_path)
+        replica = sqlite3.connect(replica_path)
+        try:
+            primary.backup(replica)
+        finally:
+            replica.close()
+            primary.close()
+        print(f"✅ Copied {primary_path} -> {replica_path} at {time.strftime('%H:%M:%S')}")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    sync_replica()
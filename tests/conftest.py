@@ -0,0 +1,75 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The tests run against a fresh in-memory SQLite database (the app creates its tables)
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ.pop("ASYNC_READ_DATABASE_URL", None)
+
+# We need to add the project root to the path to allow imports from 'app' and 'main'
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient
+
+import main
+from app.database.connection import SessionLocal
+from app.models.attendance import Base, Student, Subject, Teacher
+from app.services import attendance_service, auth_service, report_service, timetable_service, user_directory_service
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        # Empty every table and the per-worker caches, so each test starts from scratch
+        with SessionLocal() as cleanup:
+            for table in reversed(Base.metadata.sorted_tables):
+                cleanup.execute(table.delete())
+            cleanup.commit()
+        for cache in (attendance_service.class_counts_cache, auth_service.user_cache, report_service.report_cache,
+                      timetable_service.grid_cache, user_directory_service.roster_cache):
+            cache.clear()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # The periodic counter reconciliation would write to the database while a test runs
+    async def no_reconcile():
+        pass
+    monkeypatch.setattr(main.stats_service, "reconcile_periodically", no_reconcile)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def log_in(client: TestClient, user):
+    client.cookies.set("access_token", f"Bearer {auth_service.create_user_token(user)}")
+
+
+def add_teacher(db, email: str = "teacher@example.com") -> Teacher:
+    teacher = Teacher(name="Teacher", email=email, hashed_password="x")
+    db.add(teacher)
+    db.commit()
+    return teacher
+
+
+def add_subject(db, teacher: Teacher, name: str) -> Subject:
+    subject = Subject(subjectName=name, teacherID=teacher.userID)
+    db.add(subject)
+    db.commit()
+    return subject
+
+
+def add_students(db, count: int, prefix: str = "s") -> list:
+    students = [
+        Student(name=f"Student {prefix}{i}", email=f"{prefix}{i}@example.com", hashed_password="x", rollNumber=f"{prefix}{i}")
+        for i in range(count)
+    ]
+    db.add_all(students)
+    db.commit()
+    return students
@@ -0,0 +1,38 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app.utils.static_files import CachedStaticFiles, accepts_encoding
+
+
+@pytest.mark.parametrize("header, encoding, accepted", [
+    ("gzip, deflate, br", "gzip", True),
+    ("GZIP;Q=0.5", "gzip", True),
+    ("*", "br", True),
+    ("gzip;q=0", "gzip", False),
+    ("br;q=0, gzip", "br", False),
+    ("gzip;q=0, *", "gzip", False),
+    ("*;q=0", "gzip", False),
+    ("x-gzip", "gzip", False),
+    ("", "gzip", False),
+])
+def test_accepts_encoding(header, encoding, accepted):
+    assert accepts_encoding(header, encoding) is accepted
+
+
+def test_static_files_skip_refused_precompressed_copies(tmp_path):
+    body = b"body { color: red; }" * 50
+    (tmp_path / "site.css").write_bytes(body)
+    (tmp_path / "site.css.gz").write_bytes(gzip.compress(body))
+    (tmp_path / "site.css.br").write_bytes(b"not really brotli")
+    client = TestClient(Starlette(routes=[Mount("/static", CachedStaticFiles(directory=tmp_path))]))
+
+    response = client.get("/static/site.css", headers={"Accept-Encoding": "br;q=0, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+
+    response = client.get("/static/site.css", headers={"Accept-Encoding": "br;q=0, gzip;q=0"})
+    assert "content-encoding" not in response.headers
+    assert response.content == body
@@ -0,0 +1,53 @@
+import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app import config
+from app.models.attendance import AttendanceRecord, StudentSubjectAttendance
+from app.services import archive_service, rollup_service
+
+from conftest import add_students, add_subject, add_teacher
+
+TERM_START, TERM_END = datetime.date(2025, 9, 1), datetime.date(2025, 9, 30)
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_DIR", tmp_path)
+    return tmp_path
+
+
+def test_a_term_is_pending_until_its_records_are_deleted(db, archive_dir, monkeypatch):
+    subject = add_subject(db, add_teacher(db), "Math")
+    students = add_students(db, 3)
+    db.add_all(
+        AttendanceRecord(studentID=student.studentID, subjectID=subject.subjectID, date=TERM_START,
+                         timestamp=datetime.datetime.combine(TERM_START, datetime.time(9)))
+        for student in students
+    )
+    db.commit()
+
+    def interrupted(db, record_ids, batch_size):
+        raise KeyboardInterrupt
+    delete_archived = archive_service._delete_archived
+    monkeypatch.setattr(archive_service, "_delete_archived", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        archive_service.archive_term(db, "T1", TERM_START, TERM_END)
+    monkeypatch.setattr(archive_service, "_delete_archived", delete_archived)
+
+    # The records are still in the database: reports and rebuilds count them once
+    assert [term["pending"] for term in archive_service.load_manifest()] == [True]
+    assert archive_service.days_present(TERM_START, TERM_END, subject_id=subject.subjectID) == {}
+    rollup_service.rebuild(db)
+    db.commit()
+    assert db.execute(select(func.sum(StudentSubjectAttendance.present_count))).scalar_one() == 3
+
+    result = archive_service.archive_term(db, "T1", TERM_START, TERM_END)
+
+    assert (result["resumed"], result["deleted"]) == (True, 3)
+    assert "pending" not in archive_service.load_manifest()[0]
+    assert sorted(days for days, _ in archive_service.days_present(TERM_START, TERM_END, subject_id=subject.subjectID).values()) == [1, 1, 1]
+    rollup_service.rebuild(db)
+    db.commit()
+    assert db.execute(select(func.sum(StudentSubjectAttendance.present_count))).scalar_one() == 3
@@ -0,0 +1,54 @@
+import datetime
+
+from sqlalchemy import select
+
+from app.models.attendance import AttendanceRecord, StudentSubjectAttendance, SubjectDailyAttendance
+from app.services import rollup_service
+
+from conftest import add_students, add_subject, add_teacher, log_in
+
+MARKED_ON = datetime.date(2026, 9, 1)
+# Marked just before local midnight on a host ahead of UTC: the database clock is a day behind
+DB_TIMESTAMP = datetime.datetime(2026, 8, 31, 22, 30)
+
+
+def _marked_near_midnight(db, students: int = 2):
+    """A subject whose students were marked on MARKED_ON, with timestamps on the previous (UTC) day."""
+    subject = add_subject(db, add_teacher(db), "Math")
+    enrolled = add_students(db, students)
+    db.add_all(
+        AttendanceRecord(studentID=student.studentID, subjectID=subject.subjectID, date=MARKED_ON, timestamp=DB_TIMESTAMP)
+        for student in enrolled
+    )
+    db.commit()
+    return subject, enrolled
+
+
+def test_rebuild_counts_records_on_their_marking_day(db):
+    subject, enrolled = _marked_near_midnight(db)
+
+    rollup_service.rebuild(db)
+    db.commit()
+
+    assert db.execute(select(SubjectDailyAttendance.date, SubjectDailyAttendance.present_count)).all() == [(MARKED_ON, 2)]
+    assert db.execute(
+        select(StudentSubjectAttendance.present_count, StudentSubjectAttendance.last_present)
+    ).all() == [(1, MARKED_ON)] * len(enrolled)
+
+
+def test_reports_count_days_present_on_the_marking_day(db, client):
+    subject, enrolled = _marked_near_midnight(db)
+    rollup_service.rebuild(db)
+    db.commit()
+    log_in(client, subject.teacher)
+    day = MARKED_ON.isoformat()
+
+    response = client.get(f"/attendance/reports/subject/{subject.subjectID}", params={"start": day, "end": day})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["classes_held"] == 1
+    assert [(s["days_present"], s["percentage"]) for s in report["students"]] == [(1, 100)] * len(enrolled)
+
+    response = client.get(f"/attendance/reports/student/{enrolled[0].rollNumber}", params={"start": day, "end": day})
+    assert response.status_code == 200
+    assert [(s["days_present"], s["classes_held"]) for s in response.json()["subjects"]] == [(1, 1)]
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from app import config
+from app.services import attendance_service, model_store
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LBPH_MODEL_DIR", tmp_path)
+    return tmp_path
+
+
+def _publish(calibration=None) -> str:
+    histograms = np.zeros((4, 2), dtype=np.uint8)
+    return model_store.save_model(histograms, np.zeros(2), np.array([1, 2], dtype=np.int64), calibration=calibration)
+
+
+def test_a_new_model_does_not_inherit_the_previous_threshold(model_dir):
+    calibrated = _publish({"threshold": 42.0})
+    assert attendance_service.recognition_threshold() == 42.0
+
+    _publish()
+    assert model_store.load_calibration() is None
+    assert attendance_service.recognition_threshold() == config.RECOGNITION_CONFIDENCE_THRESHOLD
+    assert model_store.load_calibration(version=calibrated) == {"threshold": 42.0}
+
+
+def test_calibration_is_stored_with_the_current_version(model_dir):
+    with pytest.raises(ValueError):
+        model_store.save_calibration({"threshold": 30.0})
+
+    version = _publish()
+    assert model_store.save_calibration({"threshold": 30.0}) == version
+    assert attendance_service.recognition_threshold() == 30.0
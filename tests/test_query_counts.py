@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+
+from app.database.query_stats import query_budget
+from app.models.attendance import AttendanceRecord
+from app.services import rollup_service
+
+from conftest import add_students, add_subject, add_teacher, log_in
+
+# Statements per page, whatever the class size (the first one loads the logged-in user)
+MY_CLASSES_BUDGET = 4
+CLASS_DETAILS_BUDGET = 3
+
+
+def _class_with_attendance(db, students: int, days: int = 3):
+    """A teacher with two subjects; every student attended the first one on each of `days` days."""
+    teacher = add_teacher(db)
+    subject = add_subject(db, teacher, "Math")
+    add_subject(db, teacher, "Physics")
+    enrolled = add_students(db, students)
+    for day in range(days):
+        date = datetime.date(2026, 9, 1) + datetime.timedelta(days=day)
+        db.add_all(
+            AttendanceRecord(studentID=student.studentID, subjectID=subject.subjectID,
+                             timestamp=datetime.datetime.combine(date, datetime.time(9)), date=date)
+            for student in enrolled
+        )
+    db.commit()
+    rollup_service.rebuild(db)
+    db.commit()
+    return teacher, subject
+
+
+@pytest.mark.parametrize("students", [1, 40])
+def test_my_classes_query_count_does_not_grow_with_students(db, client, students):
+    teacher, _ = _class_with_attendance(db, students)
+    log_in(client, teacher)
+
+    with query_budget(MY_CLASSES_BUDGET, "GET /teacher/my-classes") as statements:
+        response = client.get("/teacher/my-classes")
+
+    assert response.status_code == 200
+    assert len(statements) == MY_CLASSES_BUDGET
+
+
+@pytest.mark.parametrize("students", [1, 40])
+def test_class_details_query_count_does_not_grow_with_students(db, client, students):
+    teacher, subject = _class_with_attendance(db, students)
+    log_in(client, teacher)
+    url = f"/teacher/class/{subject.subjectID}"
+
+    with query_budget(CLASS_DETAILS_BUDGET, "GET /teacher/class/{subject_id}") as statements:
+        response = client.get(url)
+
+    assert response.status_code == 200
+    assert len(statements) == CLASS_DETAILS_BUDGET
+    # Every student attended all 3 class days
+    assert response.text.count("<td>3 / 3</td>") == students
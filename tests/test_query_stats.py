@@ -0,0 +1,60 @@
+import datetime
+
+import pytest
+from sqlalchemy import select, text
+
+from app.database import query_stats
+from app.database.query_stats import QueryBudgetExceeded, query_budget
+from app.models.attendance import AttendanceRecord, Student
+
+from conftest import add_students, add_subject, add_teacher, log_in
+
+EXPORT_ROUTE = "/attendance/export/{fmt}"
+
+
+def _queries_observed(route: str) -> float:
+    """Sum of the per-request statement counts recorded for a route so far."""
+    state = query_stats.DB_QUERIES_PER_REQUEST._values.get((route,))
+    return state[1] if state else 0
+
+
+def test_query_budget_lists_the_statements_when_exceeded(db):
+    with pytest.raises(QueryBudgetExceeded) as excinfo:
+        with query_budget(1, "two selects"):
+            db.execute(text("SELECT 1"))
+            db.execute(select(Student.rollNumber))
+
+    message = str(excinfo.value)
+    assert "two selects ran 2 queries (budget 1)" in message
+    assert "1. (" in message and "SELECT 1" in message
+    assert "2. (" in message and "rollNumber" in message
+
+
+def test_query_budget_passes_within_budget(db):
+    with query_budget(2) as statements:
+        db.execute(text("SELECT 1"))
+
+    assert [sql for sql, _ in statements] == ["SELECT 1"]
+
+
+def test_streamed_export_queries_count_for_the_request(db, client):
+    teacher = add_teacher(db)
+    subject = add_subject(db, teacher, "Math")
+    day = datetime.date(2026, 9, 1)
+    db.add_all(
+        AttendanceRecord(studentID=student.studentID, subjectID=subject.subjectID, date=day,
+                         timestamp=datetime.datetime.combine(day, datetime.time(9)))
+        for student in add_students(db, 5)
+    )
+    db.commit()
+    log_in(client, teacher)
+    before = _queries_observed(EXPORT_ROUTE)
+
+    with query_budget(2, "GET /attendance/export/csv") as statements:
+        response = client.get("/attendance/export/csv")
+
+    assert response.status_code == 200
+    assert response.text.count("Math") == 5
+    # The export SELECT runs while the body streams, after the endpoint returned
+    assert any("attendance_record" in sql for sql, _ in statements)
+    assert _queries_observed(EXPORT_ROUTE) - before == len(statements)
@@ -0,0 +1,32 @@
+import datetime
+
+from app.models.attendance import AttendanceRecord
+from app.services import rollup_service
+
+from conftest import add_students, add_subject, add_teacher, log_in
+
+DAY = datetime.date(2026, 9, 1)
+
+
+def _mark(db, subject, students):
+    """Marks attendance as another worker would: this worker's report cache is not invalidated."""
+    db.add_all(AttendanceRecord(studentID=s.studentID, subjectID=subject.subjectID, date=DAY) for s in students)
+    for statement in rollup_service.record_present_statements(
+        db.get_bind().dialect.name, subject.subjectID, [s.studentID for s in students], DAY
+    ):
+        db.execute(statement)
+    db.commit()
+
+
+def test_cached_report_is_recomputed_after_attendance_marked_elsewhere(db, client):
+    subject = add_subject(db, add_teacher(db), "Math")
+    first, second = add_students(db, 2)
+    _mark(db, subject, [first])
+    log_in(client, subject.teacher)
+    url = f"/attendance/reports/subject/{subject.subjectID}/daily"
+
+    assert [d["present"] for d in client.get(url).json()["days"]] == [1]
+
+    _mark(db, subject, [second])
+
+    assert [d["present"] for d in client.get(url).json()["days"]] == [2]